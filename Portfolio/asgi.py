@@ -9,8 +9,22 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Portfolio.settings')
 
-application = get_asgi_application()
+
+class PortfolioASGIHandler(ASGIHandler):
+    # Под ASGI restapi обслуживается async представлениями
+    # из Portfolio/asgi_urls.py, под WSGI — обычными ViewSet.
+    urlconf = 'Portfolio.asgi_urls'
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+# То же, что get_asgi_application(), но с собственным обработчиком.
+django.setup(set_prefix=False)
+application = PortfolioASGIHandler()
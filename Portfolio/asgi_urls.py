@@ -0,0 +1,30 @@
+"""
+URLconf для ASGI (см. Portfolio/asgi.py).
+
+Маршруты list/detail restapi обслуживаются нативными async
+представлениями, остальные маршруты совпадают с Portfolio.urls.
+"""
+
+from django.urls import URLPattern
+from rest_framework import viewsets
+
+from restapi.async_views import AsyncViewSetAdapter
+
+from .urls import router, urlpatterns as sync_urlpatterns
+
+
+def async_urlpatterns(router):
+    patterns = []
+    for pattern in router.urls:
+        callback = pattern.callback
+        # Async путь повторяет поведение ModelViewSet; остальные ViewSet
+        # (например, загрузки) обслуживаются синхронно.
+        if not hasattr(callback, 'actions') or \
+                not issubclass(callback.cls, viewsets.ModelViewSet):
+            continue
+        view = AsyncViewSetAdapter(callback).as_view()
+        patterns.append(URLPattern(pattern.pattern, view, pattern.default_args, pattern.name))
+    return patterns
+
+
+urlpatterns = async_urlpatterns(router) + sync_urlpatterns
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'restapi.middleware.ProfilingMiddleware',
+    'restapi.middleware.ServerTimingMiddleware',
+    'restapi.middleware.MetricsMiddleware',
+    'restapi.middleware.ReplicaPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,6 +65,12 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Курсорная пагинация включается клиентом через ?cursor= или ?page_size=,
+# без этих параметров списки отдаются целиком.
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'restapi.pagination.KeysetPagination',
+}
+
 ROOT_URLCONF = 'Portfolio.urls'
 
 TEMPLATES = [
@@ -80,17 +91,89 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'Portfolio.wsgi.application'
 
+# При DEBUG graphene-django по умолчанию подключает DjangoDebugMiddleware.
+# Поля _debug в схеме нет, а middleware оборачивает курсоры всех баз
+# (включая реплику) и не снимает обертку.
+GRAPHENE = {
+    'MIDDLEWARE': [],
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite в режиме для продакшена (restapi/db/sqlite3): WAL, PRAGMA при
+# подключении, BEGIN IMMEDIATE и очередь записей (restapi/writes.py),
+# которая объединяет параллельные мелкие записи в одну транзакцию.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'restapi.db.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединения переиспользуются между запросами.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Ожидание блокировки записи, секунды (busy_timeout).
+            'timeout': 20,
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=20000;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+            'write_queue': {
+                'MAX_BATCH': 100,
+                # Сколько писатель ждет попутных записей, секунды.
+                'WINDOW': 0.002,
+            },
+        },
     }
 }
 
+# Чтение из реплик, запись в default (restapi/db/routers.py). Пустой
+# список реплик — все запросы идут в default.
+DATABASE_ROUTERS = ['restapi.db.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+
+# После записи клиент еще столько секунд читает из default (cookie),
+# чтобы видеть свои изменения, пока реплики догоняют.
+REPLICA_PIN_SECONDS = 15
+REPLICA_PIN_COOKIE = 'db_pin'
+
+# Та же база SQLite, открытая только на чтение, выступает репликой
+# (попытка записи в нее завершится ошибкой). Чтения в нее идут, только
+# если она указана в DATABASE_REPLICAS; в тестах это зеркало default.
+DATABASES['replica'] = {
+    'ENGINE': 'restapi.db.sqlite3',
+    'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+    'OPTIONS': {'timeout': 20, 'init_command': 'PRAGMA mmap_size=268435456;'},
+    'TEST': {'MIRROR': 'default'},
+}
+# DATABASE_REPLICAS = ['replica']
+
+# Реплика PostgreSQL:
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.postgresql',
+#     'NAME': '',
+#     'USER': '',
+#     'PASSWORD': '',
+#     'HOST': 'replica.localhost',
+#     'PORT': '5432',
+#     'TEST': {'MIRROR': 'default'},
+# }
+# DATABASE_REPLICAS = ['replica']
+
+# SQLite с настройками по умолчанию:
+# DATABASES = {
+#     'default': {
+#         'ENGINE': 'django.db.backends.sqlite3',
+#         'NAME': BASE_DIR / 'db.sqlite3',
+#     }
+# }
+
 # DATABASES = {
 #     'default': {
 #         'ENGINE': 'django.db.backends.postgresql',
@@ -103,6 +186,129 @@ DATABASES = {
 # }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# Алиас 'api' хранит отрендеренные GET-ответы restapi (restapi/cache.py).
+# Записи сбрасываются сигналами post_save/post_delete.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Кэш ответов API и поколения для его сброса (restapi/cache.py) должны
+    # быть общими для всех воркеров: с LocMemCache запись в одном процессе
+    # не сбросила бы кэш остальных. Для нескольких машин — Redis/Memcached.
+    'api': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'api',
+        'TIMEOUT': 300,
+    },
+}
+
+# Кэш в памяти процесса годится только для одного воркера:
+# CACHES['api'] = {
+#     'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+#     'LOCATION': 'api-responses',
+#     'TIMEOUT': 300,
+# }
+
+API_CACHE_ALIAS = 'api'
+
+# Тесты работают с кэшем 'api' во временном каталоге (Portfolio/test_runner.py).
+TEST_RUNNER = 'Portfolio.test_runner.TestRunner'
+
+
+# GraphQL persisted queries (graphapi/persisted.py).
+# ALLOWLIST — путь к JSON {"<sha256>": "<query>"} или списку запросов;
+# при REJECT_UNLISTED = True выполняются только запросы из allow-list.
+GRAPHQL_PERSISTED_QUERIES = {
+    'CACHE_SIZE': 512,
+    'ALLOWLIST': None,
+    'REJECT_UNLISTED': False,
+}
+
+# Статический анализ стоимости GraphQL-запросов (graphapi/cost.py).
+# Вес поля задается как 'Тип.поле', размер списка умножает стоимость вложенных полей.
+GRAPHQL_QUERY_COST = {
+    'MAX_COST': 5000,
+    'MAX_DEPTH': 10,
+    'DEFAULT_LIST_SIZE': 100,
+    'FIELD_COSTS': {
+        'Query.contact': 5,
+        'Query.projects': 2,
+    },
+    'LIST_SIZES': {
+        'Query.me': 1,
+        'Query.pricing': 20,
+        'ProjectType.imageVariants': 6,
+        'Query.skillSummary': 26,
+    },
+    'BUDGET': None,
+    'BUDGET_WINDOW': 60,
+    # Счетчики бюджета — в общем для воркеров кэше (None — кэш ответов API).
+    'BUDGET_CACHE': None,
+}
+
+
+# Время запросов к DRF и GraphQL по этапам (restapi/timing.py): заголовок
+# Server-Timing и строка в журнале restapi.timing. NPLUSONE_THRESHOLD —
+# сколько одинаковых по форме SQL за запрос считать N+1 (None — не проверять).
+REQUEST_TIMING = {
+    'ENABLED': True,
+    'HEADER': True,
+    'LOG': True,
+    'NPLUSONE_THRESHOLD': 10,
+}
+
+
+# Статистический профилировщик запросов к DRF и GraphQL (restapi/profiling.py).
+# Сотрудник включает его для своего запроса заголовком X-Profile: 1 или
+# параметром ?profile; SAMPLE_RATE — доля остальных запросов, которые
+# профилируются сами. Последние KEEP профилей доступны в админке.
+REQUEST_PROFILING = {
+    'SAMPLE_RATE': 0.0,
+    'INTERVAL': 0.005,
+    'KEEP': 100,
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': 'profile',
+}
+
+
+# Метрики Prometheus на /metrics (restapi/metrics.py). Без DIR значения
+# хранятся в памяти процесса. Для нескольких воркеров на одной машине
+# задайте DIR: каждый воркер пишет в свой mmap-файл, /metrics складывает
+# их. Каталог нужно очищать перед запуском сервера, иначе счетчики
+# продолжатся с прошлого запуска. /metrics открыт сотрудникам, сборщику с
+# Bearer-токеном TOKEN и адресам из ALLOWED_IPS.
+METRICS = {
+    'DIR': None,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    'MAX_OPERATIONS': 100,
+    'TOKEN': None,
+    'ALLOWED_IPS': (),
+}
+
+# METRICS['DIR'] = BASE_DIR / 'metrics'
+
+
+# Быстрое чтение GET list/retrieve (restapi/fastpath.py): строки через
+# values_list() и план полей вместо экземпляров моделей и обхода полей
+# сериализатора. Ответы те же; ENABLED = False возвращает обычный путь DRF
+# (например, чтобы сравнить оба пути командой benchmark --no-fast-read).
+FAST_READ = {
+    'ENABLED': True,
+}
+
+
+# Потоковые списки (restapi/streaming.py): ?stream=1 отдает JSON массив,
+# Accept: application/x-ndjson — NDJSON. Строки читаются из базы и
+# отправляются кусками по CHUNK_SIZE, память не зависит от размера таблицы.
+STREAMING_RESPONSES = {
+    'CHUNK_SIZE': 500,
+    'QUERY_PARAM': 'stream',
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -142,6 +348,51 @@ STATIC_URL = 'static/'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Отдача медиафайлов (restapi/media.py): Range/206, строгие ETag, Cache-Control.
+# Маршрут MEDIA_URL подключен и без DEBUG, пока ENABLED не выключен.
+MEDIA_SERVING = {
+    # False, если /media/ отдает веб-сервер и маршрут Django не нужен.
+    'ENABLED': True,
+    'BACKEND': 'django',
+    'MAX_AGE': 3600,
+}
+
+# За nginx отдачу файла можно передать ему:
+# MEDIA_SERVING = {
+#     'BACKEND': 'x-accel',
+#     # location /protected-media/ { internal; alias /path/to/media/; }
+#     'ACCEL_PREFIX': '/protected-media/',
+#     'MAX_AGE': 3600,
+# }
+
+# Возобновляемые загрузки Project.file (restapi/uploads.py). Каталог должен
+# быть на той же файловой системе, что и MEDIA_ROOT, чтобы готовый файл
+# переносился без копирования.
+RESUMABLE_UPLOADS = {
+    'DIR': BASE_DIR / 'uploads',
+    'MAX_SIZE': 5 * 1024 ** 3,
+    'EXPIRE_AFTER': timedelta(days=1),
+}
+
+# Производные Project.image: уменьшенные копии и заглушка генерируются
+# в фоновом пуле после загрузки и сохраняются рядом с оригиналом.
+PROJECT_IMAGE_DERIVATIVES = {
+    'WIDTHS': [320, 640, 1280],
+    # AVIF используется, только если Pillow собран с его поддержкой.
+    'FORMATS': ['avif', 'webp'],
+    'QUALITY': 80,
+    'PLACEHOLDER_WIDTH': 16,
+    'WORKERS': 2,
+    # Кодирование в отдельных процессах:
+    # 'PROCESSES': 2,
+    'PROCESSES': 0,
+}
+
+# Сколько лучших навыков хранится в сводке каждой категории
+# (restapi/summaries.py, /skill-summary/). После изменения выполните
+# manage.py rebuild_skill_summary.
+SKILL_SUMMARY_TOP = 5
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,27 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Тесты очищают кэш ответов API (get_api_cache().clear()), поэтому на
+    время прогона он переносится во временный каталог: кэш рабочей копии
+    в BASE_DIR/cache/api остается нетронутым.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.api_cache_dir = tempfile.mkdtemp(prefix='api-cache-')
+        caches = {**settings.CACHES,
+                  'api': {**settings.CACHES['api'], 'LOCATION': self.api_cache_dir}}
+        self.api_cache_settings = override_settings(CACHES=caches)
+        self.api_cache_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.api_cache_settings.disable()
+        shutil.rmtree(self.api_cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
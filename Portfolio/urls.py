@@ -1,18 +1,24 @@
-from django.conf.urls.static import static
+import re
+
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 
-from rest_framework import permissions, routers
+from rest_framework import permissions
+from restapi.media import get_media_settings, serve_media
+from restapi.metrics import metrics_view
+from restapi.routers import BulkRouter
 from restapi.views import (
     MeViewSet,
     ProjectViewSet,
     PricingViewSet,
     SkillViewSet,
-    ContactViewSet
+    SkillCategorySummaryViewSet,
+    ContactViewSet,
+    UploadViewSet,
 )
 
 schema_view = get_schema_view(
@@ -37,13 +43,15 @@ schema_view = get_schema_view(
 )
 
 
-router = routers.DefaultRouter()
+router = BulkRouter()
 
 router.register(r'me', MeViewSet)
 router.register(r'projects', ProjectViewSet)
 router.register(r'pricings', PricingViewSet)
 router.register(r'skills', SkillViewSet)
+router.register(r'skill-summary', SkillCategorySummaryViewSet)
 router.register(r'contacts', ContactViewSet)
+router.register(r'uploads', UploadViewSet)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
@@ -58,7 +66,17 @@ urlpatterns = [
     path('redoc/', include('django.contrib.admindocs.urls')),
     
     path('graphql/', include('graphapi.urls')),
+
+    # Метрики Prometheus (restapi/metrics.py, METRICS в settings.py).
+    path('metrics', metrics_view, name='metrics'),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, 
-                      document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Медиафайлы отдаются с поддержкой Range и кэширующих заголовков
+# (см. restapi/media.py и MEDIA_SERVING в settings.py) и без DEBUG:
+# в режиме 'django' байты передает FileResponse (sendfile у WSGI-сервера),
+# в 'x-accel' / 'x-sendfile' — фронт-прокси. Если файлы отдает веб-сервер
+# напрямую, маршрут выключается через MEDIA_SERVING['ENABLED'].
+if get_media_settings()['ENABLED']:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media),
+    ]
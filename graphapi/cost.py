@@ -0,0 +1,175 @@
+import logging
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import caches
+from graphql import (
+    FieldNode,
+    FragmentDefinitionNode,
+    FragmentSpreadNode,
+    GraphQLError,
+    InlineFragmentNode,
+    get_named_type,
+    get_nullable_type,
+    get_operation_ast,
+    is_list_type,
+    is_leaf_type,
+)
+
+logger = logging.getLogger('graphapi.cost')
+
+
+def get_cost_settings():
+    options = {
+        # Максимальная стоимость и глубина одной операции (None — без лимита).
+        'MAX_COST': 5000,
+        'MAX_DEPTH': 10,
+        # Стоимость поля объектного типа и скалярного поля по умолчанию.
+        'OBJECT_COST': 1,
+        'SCALAR_COST': 0,
+        # Ожидаемое число элементов в списке, если для поля не задано иное.
+        'DEFAULT_LIST_SIZE': 100,
+        # Переопределения вида {'Query.projects': 5, 'ProjectType.description': 1}.
+        'FIELD_COSTS': {},
+        'LIST_SIZES': {},
+        # Бюджет стоимости на пользователя/IP за окно в секундах (None — выключено).
+        'BUDGET': None,
+        'BUDGET_WINDOW': 60,
+        # Алиас кэша для счетчиков бюджета. Он должен быть общим для всех
+        # воркеров (по умолчанию кэш ответов API, см. API_CACHE_ALIAS),
+        # иначе каждый процесс считал бы свой бюджет.
+        'BUDGET_CACHE': None,
+    }
+    options.update(getattr(settings, 'GRAPHQL_QUERY_COST', {}))
+    return options
+
+
+@dataclass
+class QueryCost:
+    cost: int
+    depth: int
+
+
+class CostAnalyzer:
+    """
+    Статический анализ стоимости операции по провалидированному AST.
+
+    Стоимость поля умножается на произведение ожидаемых размеров всех
+    списков над ним (включая его собственный), поэтому алиасы (`a: projects`, `b: projects`)
+    и вложенные списки учитываются честно. Поля интроспекции не
+    учитываются, чтобы GraphiQL продолжал работать.
+    """
+
+    def __init__(self, schema, options=None):
+        self.schema = schema
+        self.options = options or get_cost_settings()
+
+    def analyze(self, document, operation_name=None):
+        operation = get_operation_ast(document, operation_name)
+        if operation is None:
+            return QueryCost(cost=0, depth=0)
+
+        self.fragments = {
+            definition.name.value: definition
+            for definition in document.definitions
+            if isinstance(definition, FragmentDefinitionNode)
+        }
+        root_type = self.schema.get_root_type(operation.operation)
+        return self._selection_set(operation.selection_set, root_type, 1, 0)
+
+    def _selection_set(self, selection_set, parent_type, multiplier, depth):
+        total = QueryCost(cost=0, depth=depth)
+        for selection in selection_set.selections:
+            if isinstance(selection, FieldNode):
+                child = self._field(selection, parent_type, multiplier, depth)
+            elif isinstance(selection, InlineFragmentNode):
+                fragment_type = parent_type
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value)
+                child = self._selection_set(selection.selection_set, fragment_type, multiplier, depth)
+            elif isinstance(selection, FragmentSpreadNode):
+                fragment = self.fragments[selection.name.value]
+                fragment_type = self.schema.get_type(fragment.type_condition.name.value)
+                child = self._selection_set(fragment.selection_set, fragment_type, multiplier, depth)
+            else:
+                continue
+            total.cost += child.cost
+            total.depth = max(total.depth, child.depth)
+        return total
+
+    def _field(self, node, parent_type, multiplier, depth):
+        name = node.name.value
+        if name.startswith('__'):
+            return QueryCost(cost=0, depth=depth)
+
+        field = parent_type.fields[name]
+        coordinate = f'{parent_type.name}.{name}'
+        field_type = get_nullable_type(field.type)
+
+        default_cost = self.options['SCALAR_COST'] if is_leaf_type(get_named_type(field_type)) \
+            else self.options['OBJECT_COST']
+        # Поле-список стоит столько, сколько строк оно может загрузить.
+        if is_list_type(field_type):
+            multiplier *= self.options['LIST_SIZES'].get(
+                coordinate, self.options['DEFAULT_LIST_SIZE'])
+        cost = multiplier * self.options['FIELD_COSTS'].get(coordinate, default_cost)
+
+        if node.selection_set is None:
+            return QueryCost(cost=cost, depth=depth + 1)
+
+        child = self._selection_set(
+            node.selection_set, get_named_type(field_type), multiplier, depth + 1)
+        return QueryCost(cost=cost + child.cost, depth=child.depth)
+
+
+def check_query_cost(schema, document, operation_name, request):
+    """
+    Считает стоимость операции и проверяет лимиты. Результат сохраняется
+    в request.graphql_cost и пишется в лог `graphapi.cost`.
+    Возвращает GraphQLError, если запрос нужно отклонить.
+    """
+    options = get_cost_settings()
+    result = CostAnalyzer(schema, options).analyze(document, operation_name)
+    request.graphql_cost = result
+
+    user = getattr(request, 'user', None)
+    caller = f'user:{user.pk}' if user is not None and user.is_authenticated \
+        else f'ip:{request.META.get("REMOTE_ADDR", "")}'
+    logger.info('graphql cost=%s depth=%s operation=%s caller=%s',
+                result.cost, result.depth, operation_name, caller)
+
+    if options['MAX_DEPTH'] is not None and result.depth > options['MAX_DEPTH']:
+        return GraphQLError(
+            f'Глубина запроса {result.depth} превышает допустимую ({options["MAX_DEPTH"]}).')
+    if options['MAX_COST'] is not None and result.cost > options['MAX_COST']:
+        return GraphQLError(
+            f'Стоимость запроса {result.cost} превышает допустимую ({options["MAX_COST"]}).')
+
+    if options['BUDGET'] is not None:
+        spent = spend_budget(caller, result.cost, options)
+        if spent > options['BUDGET']:
+            return GraphQLError(
+                'Превышен бюджет стоимости запросов, повторите позже.',
+                extensions={'code': 'THROTTLED'})
+    return None
+
+
+def spend_budget(caller, cost, options):
+    """
+    Добавляет стоимость к счетчику вызывающего за текущее окно и
+    возвращает потраченное. Окно фиксированное (номер окна в ключе), так
+    как incr у части бэкендов (FileBasedCache) сбрасывает время жизни
+    ключа.
+    """
+    alias = options['BUDGET_CACHE'] or getattr(settings, 'API_CACHE_ALIAS', 'api')
+    budget_cache = caches[alias]
+    window = options['BUDGET_WINDOW']
+    key = f'graphql-budget:{caller}:{int(time.time() // window)}'
+    budget_cache.add(key, 0, timeout=window)
+    try:
+        return budget_cache.incr(key, cost)
+    except ValueError:
+        # Ключ истек между add и incr.
+        budget_cache.set(key, cost, timeout=window)
+        return cost
@@ -1,6 +1,8 @@
+import graphene
 from graphene_django import DjangoObjectType
 
-from restapi.models import Me, Project, Pricing, Skill, Contact
+from restapi.images import variant_urls
+from restapi.models import Me, Project, Pricing, Skill, SkillCategorySummary, Contact
 
 
 class MeType(DjangoObjectType):
@@ -8,12 +10,32 @@ class MeType(DjangoObjectType):
         model = Me
 
 
+class ImageVariantType(graphene.ObjectType):
+    url = graphene.String(required=True)
+    width = graphene.Int(required=True)
+    height = graphene.Int(required=True)
+    format = graphene.String(required=True)
+    content_type = graphene.String()
+
+
 class ProjectType(DjangoObjectType):
+    image_variants = graphene.List(graphene.NonNull(ImageVariantType))
+    image_placeholder = graphene.String()
+
     class Meta:
         model = Project
+        exclude = ('image_derivatives',)
+
+    def resolve_image_variants(self, info):
+        return variant_urls(self)['variants']
+
+    def resolve_image_placeholder(self, info):
+        return variant_urls(self)['placeholder']
 
 
 class PricingType(DjangoObjectType):
+    total_cost = graphene.Decimal()
+
     class Meta:
         model = Pricing
 
@@ -23,6 +45,19 @@ class SkillType(DjangoObjectType):
         model = Skill
 
 
+class TopSkillType(graphene.ObjectType):
+    id = graphene.ID(required=True)
+    name = graphene.String(required=True)
+    percentage = graphene.Int(required=True)
+
+
+class SkillCategorySummaryType(DjangoObjectType):
+    top_skills = graphene.List(graphene.NonNull(TopSkillType))
+
+    class Meta:
+        model = SkillCategorySummary
+
+
 class ContactType(DjangoObjectType):
     class Meta:
         model = Contact
\ No newline at end of file
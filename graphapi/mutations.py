@@ -2,6 +2,7 @@ import graphene
 from graphql import GraphQLError
 
 from restapi.models import Me, Project, Pricing, Skill, Contact
+from restapi.writes import run_write
 from .modeltypes import (
     MeType,
     ProjectType,
@@ -9,6 +10,7 @@ from .modeltypes import (
     SkillType,
     ContactType,
 )
+from .updates import partial_update
 
 
 class CreateMe(graphene.Mutation):
@@ -40,7 +42,7 @@ class CreateMe(graphene.Mutation):
             education=kwargs.get('education'),
             work_history=kwargs.get('work_history'),
         )
-        me.save()
+        run_write(me.save)
         return CreateMe(me=me)
 
 
@@ -60,47 +62,11 @@ class UpdateMe(graphene.Mutation):
         
     me = graphene.Field(MeType)
     
-    def mutate(self, info, id, 
-        first_name=None, last_name=None,
-        email=None, phone=None,
-        instagram=None, github=None,
-        linkedin=None, telegram=None,
-        education=None, work_history=None
-        ):
-        
-        me = Me.objects.get(id=id)
-        
-        if first_name:
-            me.first_name = first_name
-            
-        if last_name:
-            me.last_name = last_name
-        
-        if email:
-            me.email = email
-            
-        if phone:
-            me.phone = phone
-        
-        if instagram:
-            me.instagram = instagram
-        
-        if github:
-            me.github = github
-        
-        if linkedin:
-            me.linkedin = linkedin
-        
-        if telegram:
-            me.telegram = telegram
-        
-        if education:
-            me.education = education
-        
-        if work_history:
-            me.work_history = work_history
-        
-        me.save()
+    def mutate(self, info, id, **kwargs):
+        # Как и раньше, пустые значения поля не меняют.
+        kwargs = {name: value for name, value in kwargs.items() if value}
+        me = partial_update(Me, id, kwargs,
+            f"Информация о себе с идентификатором {id} не существует.")
         return UpdateMe(me=me)
     
 
@@ -112,7 +78,7 @@ class DeleteMe(graphene.Mutation):
     
     def mutate(self, info, id):
         me = Me.objects.get(id=id)
-        me.delete()
+        run_write(me.delete)
         return DeleteMe(success=True)
     
 
@@ -136,8 +102,8 @@ class CreateProject(graphene.Mutation):
         project = Project(
             title=title,
             description=description,
-            start_date=start_data,
-            end_date=kwargs.get('end_date'),
+            start_data=start_data,
+            end_data=kwargs.get('end_data'),
             url=kwargs.get('url'),
             repository=kwargs.get('repository'),
             technologies_used=kwargs.get('technologies_used'),
@@ -149,7 +115,7 @@ class CreateProject(graphene.Mutation):
         if kwargs.get('image'):
             project.image = kwargs['image']
 
-        project.save()
+        run_write(project.save)
         return CreateProject(project=project)
     
 
@@ -160,8 +126,10 @@ class UpdateProject(graphene.Mutation):
         image = graphene.String()
         title = graphene.String()
         description = graphene.String()
-        start_date = graphene.Date()
-        end_date = graphene.Date()
+        start_data = graphene.Date()
+        end_data = graphene.Date()
+        start_date = graphene.Date(deprecation_reason="Используйте startData.")
+        end_date = graphene.Date(deprecation_reason="Используйте endData.")
         url = graphene.String()
         repository = graphene.String()
         technologies_used = graphene.String()
@@ -169,26 +137,19 @@ class UpdateProject(graphene.Mutation):
     project = graphene.Field(ProjectType)
 
     def mutate(self, info, project_id, **kwargs):
-        try:
-            project = Project.objects.get(pk=project_id)
-        except Project.DoesNotExist:
-            raise GraphQLError(f"Проект с идентификатором {project_id} не существует.")
-
-        if kwargs.get('file'):
-            project.file = kwargs['file']
-
-        if kwargs.get('image'):
-            project.image = kwargs['image']
-
-        project.title = kwargs.get('title', project.title)
-        project.description = kwargs.get('description', project.description)
-        project.start_data = kwargs.get('start_data', project.start_data)
-        project.end_data = kwargs.get('end_data', project.end_data)
-        project.url = kwargs.get('url', project.url)
-        project.repository = kwargs.get('repository', project.repository)
-        project.technologies_used = kwargs.get('technologies_used', project.technologies_used)
-
-        project.save()
+        # Старые имена аргументов startDate/endDate соответствуют
+        # полям модели start_data/end_data.
+        if 'start_date' in kwargs:
+            kwargs.setdefault('start_data', kwargs.pop('start_date'))
+        if 'end_date' in kwargs:
+            kwargs.setdefault('end_data', kwargs.pop('end_date'))
+        # Файл и изображение, как и раньше, меняются только непустым значением.
+        for name in ('file', 'image'):
+            if not kwargs.get(name):
+                kwargs.pop(name, None)
+
+        project = partial_update(Project, project_id, kwargs,
+            f"Проект с идентификатором {project_id} не существует.")
 
         return UpdateProject(project=project)
 
@@ -205,7 +166,7 @@ class DeleteProject(graphene.Mutation):
         except Project.DoesNotExist:
             raise GraphQLError(f"Проект с идентификатором {id} не существует.")
         
-        project.delete()
+        run_write(project.delete)
 
         return DeleteProject(success=True)
     
@@ -225,7 +186,7 @@ class CreateSkill(graphene.Mutation):
             percentage=percentage,
         )
 
-        skill.save()
+        run_write(skill.save)
 
         return CreateSkill(skill=skill)
 
@@ -240,17 +201,9 @@ class UpdateSkill(graphene.Mutation):
     skill = graphene.Field(SkillType)
 
     def mutate(self, info, skill_id, **kwargs):
-        try:
-            skill = Skill.objects.get(pk=skill_id)
-        except Skill.DoesNotExist:
-            raise GraphQLError(f"Навык с идентификатором {skill_id} не существует.")
-
-        # Обновляем поля, если они предоставлены
-        skill.category = kwargs.get('category', skill.category)
-        skill.name = kwargs.get('name', skill.name)
-        skill.percentage = kwargs.get('percentage', skill.percentage)
-
-        skill.save()
+        # Обновляем только переданные поля одним UPDATE
+        skill = partial_update(Skill, skill_id, kwargs,
+            f"Навык с идентификатором {skill_id} не существует.")
 
         return UpdateSkill(skill=skill)
 
@@ -267,7 +220,7 @@ class DeleteSkill(graphene.Mutation):
         except Skill.DoesNotExist:
             raise GraphQLError(f"Навык с идентификатором {skill_id} не существует.")
 
-        skill.delete()
+        run_write(skill.delete)
 
         return DeleteSkill(success=True)
 
@@ -289,7 +242,7 @@ class CreatePricing(graphene.Mutation):
             estimated_hours=estimated_hours,
         )
 
-        pricing.save()
+        run_write(pricing.save)
 
         return CreatePricing(pricing=pricing)
     
@@ -305,18 +258,9 @@ class UpdatePricing(graphene.Mutation):
     pricing = graphene.Field(PricingType)
 
     def mutate(self, info, pricing_id, **kwargs):
-        try:
-            pricing = Pricing.objects.get(pk=pricing_id)
-        except Pricing.DoesNotExist:
-            raise GraphQLError(f"Ценообразование с идентификатором {pricing_id} не существует.")
-
-        # Обновляем поля, если они предоставлены
-        pricing.service = kwargs.get('service', pricing.service)
-        pricing.description = kwargs.get('description', pricing.description)
-        pricing.rate_per_hour = kwargs.get('rate_per_hour', pricing.rate_per_hour)
-        pricing.estimated_hours = kwargs.get('estimated_hours', pricing.estimated_hours)
-
-        pricing.save()
+        # Обновляем только переданные поля одним UPDATE
+        pricing = partial_update(Pricing, pricing_id, kwargs,
+            f"Ценообразование с идентификатором {pricing_id} не существует.")
 
         return UpdatePricing(pricing=pricing)
 
@@ -333,7 +277,7 @@ class DeletePricing(graphene.Mutation):
         except Pricing.DoesNotExist:
             raise GraphQLError(f"Ценообразование с идентификатором {pricing_id} не существует.")
 
-        pricing.delete()
+        run_write(pricing.delete)
 
         return DeletePricing(success=True)
 
@@ -355,7 +299,7 @@ class CreateContact(graphene.Mutation):
             message=message,
         )
 
-        contact.save()
+        run_write(contact.save)
 
         return CreateContact(contact=contact)
 
@@ -371,18 +315,9 @@ class UpdateContact(graphene.Mutation):
     contact = graphene.Field(ContactType)
 
     def mutate(self, info, contact_id, **kwargs):
-        try:
-            contact = Contact.objects.get(pk=contact_id)
-        except Contact.DoesNotExist:
-            raise GraphQLError(f"Контакт с идентификатором {contact_id} не существует.")
-
-        # Обновляем поля, если они предоставлены
-        contact.name = kwargs.get('name', contact.name)
-        contact.email = kwargs.get('email', contact.email)
-        contact.subject = kwargs.get('subject', contact.subject)
-        contact.message = kwargs.get('message', contact.message)
-
-        contact.save()
+        # Обновляем только переданные поля одним UPDATE
+        contact = partial_update(Contact, contact_id, kwargs,
+            f"Контакт с идентификатором {contact_id} не существует.")
 
         return UpdateContact(contact=contact)
     
@@ -400,7 +335,7 @@ class DeleteContact(graphene.Mutation):
         except Contact.DoesNotExist:
             raise GraphQLError(f"Контакт с идентификатором {contact_id} не существует.")
 
-        contact.delete()
+        run_write(contact.delete)
 
         return DeleteContact(success=True)
     
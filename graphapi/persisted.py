@@ -0,0 +1,191 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import graphene
+from django.conf import settings
+from django.http import HttpResponseBadRequest
+from graphene.types.schema import normalize_execute_kwargs
+from graphene_django.views import HttpError
+from graphql import ExecutionResult, GraphQLError, execute, parse, validate
+from restapi.metrics import record_cache
+
+
+PERSISTED_QUERY_NOT_FOUND = 'PersistedQueryNotFound'
+
+
+def query_hash(query):
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def get_persisted_settings():
+    options = {
+        'CACHE_SIZE': 512,
+        'ALLOWLIST': None,
+        'REJECT_UNLISTED': False,
+    }
+    options.update(getattr(settings, 'GRAPHQL_PERSISTED_QUERIES', {}))
+    return options
+
+
+def load_allowlist(path):
+    """
+    Загружает allow-list из JSON-файла вида {"<sha256>": "<query>"}.
+    Хэши пересчитываются, чтобы файл не мог подменить текст запроса.
+    """
+    if not path:
+        return None
+    with open(path, encoding='utf-8') as allowlist_file:
+        queries = json.load(allowlist_file)
+    if isinstance(queries, list):
+        queries = {query_hash(query): query for query in queries}
+    for key, query in queries.items():
+        if query_hash(query) != key:
+            raise ValueError(f'Хэш {key} в {path} не совпадает с текстом запроса.')
+    return queries
+
+
+class DocumentCache:
+    """
+    Потокобезопасный LRU разобранных и провалидированных документов.
+    Ключ — sha256 текста запроса; запись — (текст, документ, ошибки
+    валидации), чтобы невалидный запрос тоже не разбирался повторно.
+    """
+
+    def __init__(self, schema, maxsize=512):
+        self.schema = schema
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get_or_parse(self, key, query):
+        entry = self.get(key)
+        record_cache('graphql_documents', entry is not None)
+        if entry is not None:
+            return entry
+
+        try:
+            document = parse(query)
+        except GraphQLError as error:
+            entry = (query, None, [error])
+        else:
+            entry = (query, document, validate(self.schema.graphql_schema, document))
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class PersistedQueries:
+    """
+    Persisted queries в духе Apollo APQ: клиент может прислать только хэш
+    (`id` или `extensions.persistedQuery.sha256Hash`), а сервер возьмет
+    документ из кэша или allow-list.
+    """
+
+    def __init__(self, schema, cache_size=512, allowlist=None, reject_unlisted=False):
+        self.documents = DocumentCache(schema, cache_size)
+        self.allowlist = allowlist
+        self.reject_unlisted = reject_unlisted
+
+    @classmethod
+    def from_settings(cls, schema):
+        options = get_persisted_settings()
+        return cls(
+            schema,
+            cache_size=options['CACHE_SIZE'],
+            allowlist=load_allowlist(options['ALLOWLIST']),
+            reject_unlisted=options['REJECT_UNLISTED'],
+        )
+
+    def resolve(self, query, key=None):
+        """
+        Возвращает (query, document, errors) для запроса. Исключение
+        GraphQLError означает, что запрос отклонен до разбора.
+        """
+        if key is None:
+            if not query:
+                raise GraphQLError('Не передан текст запроса.')
+            key = query_hash(query)
+        elif query and query_hash(query) != key:
+            raise GraphQLError('Хэш persisted query не совпадает с текстом запроса.')
+
+        if self.allowlist is not None and key in self.allowlist:
+            query = self.allowlist[key]
+        elif self.reject_unlisted:
+            raise GraphQLError('Разрешены только запросы из allow-list.')
+
+        if not query:
+            entry = self.documents.get(key)
+            if entry is None:
+                raise GraphQLError(PERSISTED_QUERY_NOT_FOUND)
+            return entry
+
+        return self.documents.get_or_parse(key, query)
+
+
+class PersistedQuerySchema(graphene.Schema):
+    """
+    Схема с кэшем persisted queries. Представление (graphapi/urls.py)
+    берет документ из кэша само и передает его в graphql.execute;
+    Schema.execute для остальных вызовов (скрипты, тесты) тоже выполняет
+    документ из кэша вместо того, чтобы разбирать и валидировать текст
+    запроса (graphql_sync).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.persisted_queries = PersistedQueries.from_settings(self)
+
+    def execute(self, source, **kwargs):
+        documents = self.persisted_queries.documents
+        key = query_hash(source)
+        # Представление уже положило документ в кэш (PersistedQueries.resolve),
+        # поэтому обращение не учитывается в метриках второй раз.
+        _, document, errors = documents.get(key) or documents.get_or_parse(key, source)
+        if errors:
+            return ExecutionResult(data=None, errors=errors)
+        return execute(self.graphql_schema, document, **normalize_execute_kwargs(kwargs))
+
+
+def get_persisted_hash(request, data):
+    """
+    Достает хэш persisted query из параметра `id` или из
+    `extensions.persistedQuery.sha256Hash` (GET или тело запроса).
+    """
+    key = request.GET.get('id') or data.get('id')
+    if key:
+        if not isinstance(key, str):
+            raise HttpError(HttpResponseBadRequest('Параметр id должен быть строкой.'))
+        return key
+
+    extensions = request.GET.get('extensions') or data.get('extensions')
+    if isinstance(extensions, str):
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            return None
+    if not isinstance(extensions, dict):
+        return None
+    persisted = extensions.get('persistedQuery')
+    if persisted is None:
+        return None
+    if not isinstance(persisted, dict) or not isinstance(persisted.get('sha256Hash'), str):
+        raise HttpError(HttpResponseBadRequest(
+            'extensions.persistedQuery должен быть объектом со строкой sha256Hash.'))
+    return persisted['sha256Hash']
@@ -0,0 +1,52 @@
+from graphene.utils.str_converters import to_snake_case
+from graphql.language import FieldNode, FragmentSpreadNode, InlineFragmentNode
+
+from restapi.sparse import COMPUTED_FIELDS
+
+
+def selected_fields(info):
+    """
+    Возвращает имена полей (в snake_case), запрошенных у текущего поля,
+    с учетом фрагментов и inline-фрагментов.
+    """
+    names = set()
+    for field_node in info.field_nodes:
+        if field_node.selection_set is not None:
+            _collect(field_node.selection_set, info.fragments, names)
+    return names
+
+
+def _collect(selection_set, fragments, names):
+    for selection in selection_set.selections:
+        if isinstance(selection, FieldNode):
+            names.add(to_snake_case(selection.name.value))
+        elif isinstance(selection, InlineFragmentNode):
+            _collect(selection.selection_set, fragments, names)
+        elif isinstance(selection, FragmentSpreadNode):
+            fragment = fragments.get(selection.name.value)
+            if fragment is not None:
+                _collect(fragment.selection_set, fragments, names)
+
+
+def project(queryset, info):
+    """
+    Загружает из базы только те колонки, которые запрошены в selection set.
+
+    Если запрошено поле, не являющееся колонкой модели (например, вычисляемое
+    в резолвере), проекция не применяется, чтобы не получить N+1 запросов
+    на отложенные поля.
+    """
+    names = selected_fields(info) - {'__typename'}
+    if not names:
+        return queryset
+
+    computed = COMPUTED_FIELDS.get(queryset.model._meta.label, {})
+    for name in names & computed.keys():
+        names = names - {name} | set(computed[name])
+
+    columns = {
+        field.name for field in queryset.model._meta.concrete_fields
+    }
+    if not names <= columns:
+        return queryset
+    return queryset.only(*names)
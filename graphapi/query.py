@@ -1,32 +1,40 @@
 import graphene
 
-from restapi.models import Me, Project, Pricing, Skill, Contact
+from restapi.models import Me, Project, Pricing, Skill, SkillCategorySummary, Contact
 from .modeltypes import (
     MeType,
     ProjectType,
     PricingType,
     SkillType,
+    SkillCategorySummaryType,
     ContactType,
 )
+from .projection import project
 
 class Query(graphene.ObjectType):
     me = graphene.List(MeType)
     projects = graphene.List(ProjectType)
     pricing = graphene.List(PricingType)
     skills = graphene.List(SkillType)
+    skill_summary = graphene.List(SkillCategorySummaryType)
     contact = graphene.List(ContactType)
 
+    # Резолверы выбирают только колонки из selection set запроса,
+    # чтобы не тянуть большие TextField, которые клиент не просил.
     def resolve_me(self, info):
-        return Me.objects.all()
+        return project(Me.objects.all(), info)
 
     def resolve_projects(self, info):
-        return Project.objects.all()
+        return project(Project.objects.all(), info)
 
     def resolve_pricing(self, info):
-        return Pricing.objects.all()
+        return project(Pricing.objects.all(), info)
 
     def resolve_skills(self, info):
-        return Skill.objects.all()
+        return project(Skill.objects.all(), info)
+
+    def resolve_skill_summary(self, info):
+        return project(SkillCategorySummary.objects.order_by('category'), info)
 
     def resolve_contact(self, info):
-        return Contact.objects.all()
\ No newline at end of file
+        return project(Contact.objects.all(), info)
\ No newline at end of file
@@ -1,6 +1,6 @@
-import graphene
 from .query import Query
 from .mutations import Mutation
+from .persisted import PersistedQuerySchema
 
-schema = graphene.Schema(query=Query, mutation=Mutation,
+schema = PersistedQuerySchema(query=Query, mutation=Mutation,
     auto_camelcase=True)
\ No newline at end of file
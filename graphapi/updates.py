@@ -0,0 +1,136 @@
+from django.core.exceptions import ValidationError
+from django.db import connections, router
+from django.db.models.signals import post_save
+from django.utils import timezone
+from graphql import GraphQLError
+
+from restapi.writes import run_write
+
+
+def partial_update(model, pk, changes, not_found_message):
+    """
+    Частичное обновление одним запросом UPDATE ... SET <переданные поля>.
+
+    В `changes` попадают только аргументы, которые клиент передал. Как и
+    при прежнем save(), пустая строка записывается как есть, явный null
+    очищает поле, допускающее NULL, а для NOT NULL полей считается
+    "не передано". Непустые значения проходят проверки поля (choices,
+    валидаторы). Если СУБД поддерживает UPDATE ... RETURNING (SQLite
+    3.35+, PostgreSQL), обновленная строка вместе с аннотациями менеджера
+    возвращается тем же запросом, иначе выполняется дополнительный SELECT.
+    """
+    values = {}
+    for name, value in changes.items():
+        field = model._meta.get_field(name)
+        if value is None and not field.null:
+            continue
+        if value is not None:
+            try:
+                value = field.to_python(value)
+                # Пустую строку save() записывал без проверки blank.
+                if value not in field.empty_values:
+                    field.validate(value, None)
+                    field.run_validators(value)
+            except ValidationError as error:
+                raise GraphQLError(f'{name}: {"; ".join(error.messages)}')
+        values[name] = value
+
+    try:
+        pk = model._meta.pk.to_python(pk)
+    except ValidationError:
+        raise GraphQLError(not_found_message)
+
+    # update() и UPDATE ... RETURNING не вызывают pre_save,
+    # поэтому auto_now поля (updated_at) выставляем сами.
+    if values:
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                values[field.name] = now
+
+    using = router.db_for_write(model)
+    if not values:
+        instance = model._default_manager.using(using).filter(pk=pk).first()
+    else:
+        instance = run_write(lambda: _write(model, pk, values, using), using=using)
+
+    if instance is None:
+        raise GraphQLError(not_found_message)
+    return instance
+
+
+def _write(model, pk, values, using):
+    connection = connections[using]
+    instance = NotImplemented
+    if supports_update_returning(connection):
+        instance = _update_returning(model, pk, values, connection)
+    if instance is NotImplemented:
+        manager = model._default_manager.using(using)
+        updated = manager.filter(pk=pk).update(**values)
+        # Через менеджер, чтобы у объекта были его аннотации (Pricing._total_cost).
+        instance = manager.get(pk=pk) if updated else None
+
+    if instance is not None:
+        # Сигнал нужен поисковому индексу и кэшу ответов restapi.
+        post_save.send(sender=model, instance=instance, created=False,
+                       update_fields=frozenset(values), raw=False, using=using)
+    return instance
+
+
+def supports_update_returning(connection):
+    # MariaDB умеет INSERT ... RETURNING, но не UPDATE ... RETURNING.
+    return connection.features.can_return_columns_from_insert and connection.vendor != 'mysql'
+
+
+def _update_returning(model, pk, values, connection):
+    """
+    UPDATE ... RETURNING: строка и аннотации менеджера модели, вычисленные
+    по новым значениям колонок. NotImplemented, если аннотацию нельзя
+    посчитать без GROUP BY.
+    """
+    opts = model._meta
+    qn = connection.ops.quote_name
+    fields = [opts.get_field(name) for name in values]
+    concrete = opts.concrete_fields
+
+    query = model._default_manager.using(connection.alias).all().query
+    if any(annotation.contains_aggregate for annotation in query.annotations.values()):
+        return NotImplemented
+    compiler = query.get_compiler(connection=connection)
+    annotations = [(name, annotation, *compiler.compile(annotation))
+                   for name, annotation in query.annotations.items()]
+
+    columns = [qn(field.column) for field in concrete]
+    columns += [sql for _, _, sql, _ in annotations]
+    sql = 'UPDATE {table} SET {assignments} WHERE {pk} = %s RETURNING {columns}'.format(
+        table=qn(opts.db_table),
+        assignments=', '.join(f'{qn(field.column)} = %s' for field in fields),
+        pk=qn(opts.pk.column),
+        columns=', '.join(columns),
+    )
+    params = [field.get_db_prep_save(values[field.name], connection) for field in fields]
+    params.append(opts.pk.get_db_prep_value(pk, connection))
+    for _, _, _, annotation_params in annotations:
+        params.extend(annotation_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    if row is None:
+        return None
+
+    expressions = [field.get_col(opts.db_table) for field in concrete]
+    expressions += [annotation for _, annotation, _, _ in annotations]
+    converted = []
+    for expression, value in zip(expressions, row):
+        converters = (connection.ops.get_db_converters(expression)
+                      + expression.get_db_converters(connection))
+        for converter in converters:
+            value = converter(value, expression, connection)
+        converted.append(value)
+
+    instance = model.from_db(connection.alias, [field.attname for field in concrete],
+                             converted[:len(concrete)])
+    for (name, _, _, _), value in zip(annotations, converted[len(concrete):]):
+        setattr(instance, name, value)
+    return instance
@@ -1,33 +1,112 @@
 from django.urls import path
 
 from django.contrib.auth.decorators import login_required
-from graphene_django.views import GraphQLView
+from django.db import connection, transaction
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed
+from graphene_django.constants import MUTATION_ERRORS_FLAG
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView, HttpError
+from graphql import ExecutionResult, GraphQLError, OperationType, execute, get_operation_ast
+from restapi.db.routers import pin_primary
+from restapi.metrics import operation_label
+from restapi.timing import span, timed_view
 
-from .schemas import schema  
+from .cost import check_query_cost
+from .persisted import get_persisted_hash
+from .schemas import schema
 
 
-# Переопределяем метод execute_graphql_request, 
-# чтобы добавить дополнительную логику перед 
-# выполнением запроса GraphQL. 
-class CustomGraphQLView(GraphQLView): 
-    def execute_graphql_request(self, request, 
-        data, query, variables, operation_name, 
+# Переопределяем метод execute_graphql_request,
+# чтобы добавить дополнительную логику перед
+# выполнением запроса GraphQL.
+class CustomGraphQLView(GraphQLView):
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        cost = getattr(request, 'graphql_cost', None)
+        if cost is not None:
+            response['X-GraphQL-Cost'] = f'cost={cost.cost}, depth={cost.depth}'
+        return response
+
+    def json_encode(self, request, d, pretty=False):
+        with span('render'):
+            return super().json_encode(request, d, pretty)
+
+    def execute_graphql_request(self, request,
+        data, query, variables, operation_name,
         show_graphiql=False):
-        return super().execute_graphql_request(
-            request, data, query, variables, 
-            operation_name, show_graphiql
-        )
+        key = get_persisted_hash(request, data)
+        if not query and not key:
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseBadRequest('Must provide query string.'))
+
+        # Текст запроса по хэшу и разобранный, провалидированный
+        # документ берутся из LRU схемы (graphapi/persisted.py): повторяющиеся
+        # запросы фронтенда не разбираются и не валидируются заново, документ
+        # сразу передается в graphql.execute.
+        try:
+            query, document, errors = self.schema.persisted_queries.resolve(query, key)
+        except GraphQLError as error:
+            return ExecutionResult(errors=[error])
+        if errors:
+            return ExecutionResult(errors=errors)
+
+        operation_ast = get_operation_ast(document, operation_name)
+        if (request.method.lower() == 'get' and operation_ast
+                and operation_ast.operation != OperationType.QUERY):
+            if show_graphiql:
+                return None
+            raise HttpError(HttpResponseNotAllowed(
+                ['POST'],
+                f'Can only perform a {operation_ast.operation.value} operation from a POST request.'))
+
+        # Стоимость и глубина считаются по AST до выполнения запроса.
+        cost_error = check_query_cost(
+            self.schema.graphql_schema, document, operation_name, request)
+        if cost_error is not None:
+            return ExecutionResult(errors=[cost_error])
+
+        # Метка операции для /metrics (restapi/metrics.py).
+        request.graphql_operation = operation_label(
+            operation_name or (operation_ast and operation_ast.name and operation_ast.name.value))
+
+        options = {
+            'root_value': self.get_root_value(request),
+            'variable_values': variables,
+            'operation_name': operation_name,
+            'context_value': self.get_context(request),
+            'middleware': self.get_middleware(request),
+        }
+        if self.execution_context_class:
+            options['execution_context_class'] = self.execution_context_class
+
+        with span('graphql'):
+            if operation_ast and operation_ast.operation == OperationType.MUTATION:
+                # Мутации читают и пишут в основную базу, запросы могут идти в реплику.
+                pin_primary(wrote=False)
+                if (graphene_settings.ATOMIC_MUTATIONS is True
+                        or connection.settings_dict.get('ATOMIC_MUTATIONS', False) is True):
+                    with transaction.atomic():
+                        result = execute(self.schema.graphql_schema, document, **options)
+                        if getattr(request, MUTATION_ERRORS_FLAG, False) is True:
+                            transaction.set_rollback(True)
+                    return result
+            return execute(self.schema.graphql_schema, document, **options)
+
+
+# Представление создается один раз при импорте модуля,
+# а не на каждый запрос.
+view = CustomGraphQLView.as_view(graphiql=True, schema=schema)
+
 
+@timed_view
 @login_required(login_url='/login')
 def graphql_view(request):
-    # Создаем экземпляр CustomGraphQLView с передачей параметров 
-    # graphiql=True и schema=schema.
-    view = CustomGraphQLView.as_view(graphiql=True, schema=schema)
-    # Вызываем представление view, передавая объект 
+    # Вызываем представление view, передавая объект
     # request для обработки запроса GraphQL.
     return view(request)
 
 
 urlpatterns = [
     path('', graphql_view),
-]
\ No newline at end of file
+]
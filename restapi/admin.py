@@ -1,6 +1,24 @@
 from django.contrib import admin
+from django.http import HttpResponse
 
-from .models import Me, Project, Pricing, Skill, Contact
+from .models import (
+    Me, Project, Pricing, Skill, SkillCategorySummary, Contact, Upload, RequestProfile,
+)
+from .profiling import merge_by_route
+from .search import full_text_search
+
+
+class FullTextSearchMixin:
+    """
+    Поиск в админке через полнотекстовый индекс вместо icontains по каждому полю.
+    """
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        results = full_text_search(queryset, search_term, self.get_search_fields(request))
+        if results is None:
+            return super().get_search_results(request, queryset, search_term)
+        return results, False
 
 
 @admin.register(Me)
@@ -25,7 +43,7 @@ class MeAdmin(admin.ModelAdmin):
 
 
 @admin.register(Project)
-class ProjectAdmin(admin.ModelAdmin):
+class ProjectAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'start_data', 'end_data', 'url', 'repository')
     search_fields = ['title', 'description', 'technologies_used']
     list_filter = ['start_data', 'end_data']
@@ -77,15 +95,66 @@ class SkillAdmin(admin.ModelAdmin):
     )
     
 
+@admin.register(SkillCategorySummary)
+class SkillCategorySummaryAdmin(admin.ModelAdmin):
+    # Сводку пересчитывают сигналы навыков и команда rebuild_skill_summary.
+    list_display = ('category', 'count', 'average_percentage', 'max_percentage', 'updated_at')
+    readonly_fields = ['category', 'count', 'average_percentage', 'max_percentage',
+                       'top_skills', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Contact)
-class ContactAdmin(admin.ModelAdmin):
+class ContactAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'email', 'subject', 'created_at', 'is_read')
     search_fields = ['name', 'email', 'subject', 'message']
     list_filter = ['is_read']
     date_hierarchy = 'created_at'
+    ordering = ['-created_at', '-id']
     readonly_fields = ['created_at']
     fieldsets = (
         ('Основная информация', {
             'fields': ('name', 'email', 'subject', 'message', 'is_read')
         }),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    # Загрузки создаются через API (/uploads/), в админке их можно только
+    # просмотреть; незавершенные удаляет команда clean_uploads.
+    list_display = ('filename', 'offset', 'length', 'completed', 'project', 'updated_at')
+    list_filter = ['completed']
+    readonly_fields = ['filename', 'length', 'offset', 'sha256', 'project', 'completed']
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    # Профили пишет ProfilingMiddleware; старые удаляются сами (KEEP).
+    list_display = ('route', 'method', 'status', 'duration_ms', 'samples', 'reason', 'created_at')
+    list_filter = ['reason', 'method', 'route']
+    search_fields = ['path']
+    readonly_fields = ['route', 'method', 'path', 'status', 'reason', 'duration_ms',
+                       'interval_ms', 'samples', 'stacks', 'created_at']
+    actions = ['download_stacks']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Скачать collapsed stacks (по маршрутам)")
+    def download_stacks(self, request, queryset):
+        # Файл открывается в speedscope или передается flamegraph.pl.
+        response = HttpResponse(merge_by_route(queryset), content_type='text/plain; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="profiles.folded"'
+        return response
@@ -4,3 +4,20 @@ from django.apps import AppConfig
 class RestapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'restapi'
+
+    def ready(self):
+        from .signals import (
+            connect_cache_signals,
+            connect_image_signals,
+            connect_routing_signals,
+            connect_search_signals,
+            connect_summary_signals,
+            connect_timing_signals,
+        )
+
+        connect_search_signals()
+        connect_cache_signals()
+        connect_image_signals()
+        connect_summary_signals()
+        connect_timing_signals()
+        connect_routing_signals()
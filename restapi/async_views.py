@@ -0,0 +1,285 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError as DjangoValidationError
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework import exceptions, permissions, status
+
+from .cache import CachedResponseMixin, get_api_cache, response_cache_key
+from .conditional import ConditionalGetMixin
+from .fastpath import FastReadMixin
+from .metrics import record_cache
+from .streaming import StreamingListMixin
+from .timing import span
+from .writes import QueuedWriteMixin, arun_write
+
+
+class AsyncViewSetAdapter:
+    """
+    Нативный async путь для list/retrieve/create одного ViewSet под ASGI.
+
+    Чтение идет через async ORM (aiterator, aget), создание — через очередь
+    писателя (arun_write); сериализация и рендер JSON выполняются прямо в
+    event loop, без sync_to_async вокруг всего представления. В Django 4.2
+    async ORM — обертка над sync_to_async: каждый запрос выполняется в
+    потоке, а event loop в это время свободен. Валидаторы и кэш ответов
+    (файловый кэш) читаются одним вызовом в потоке. Фильтры, поиск,
+    сортировка, курсорная пагинация, ETag и кэш ответов берутся из
+    исходного ViewSet. Все, что async путь не покрывает (HTML browsable API,
+    PUT/PATCH/DELETE, bulk-операции, multipart, не-AllowAny права,
+    троттлинг, запись с учетными данными), передается синхронному ViewSet.
+    """
+    iterator_chunk_size = 500
+
+    def __init__(self, callback):
+        self.sync_view = callback
+        self.viewset_class = callback.cls
+        self.actions = callback.actions
+        self.initkwargs = callback.initkwargs
+        # Как и ViewSetMixin.as_view(): HEAD обслуживается тем же действием, что GET.
+        if 'get' in self.actions and 'head' not in self.actions:
+            self.actions['head'] = self.actions['get']
+
+    def as_view(self):
+        async def view(request, *args, **kwargs):
+            return await self.dispatch(request, *args, **kwargs)
+
+        # DRF-представления не проверяют CSRF для анонимных запросов,
+        # async путь ведет себя так же.
+        view.csrf_exempt = True
+        view.cls = self.viewset_class
+        view.actions = self.actions
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        action = self.actions.get(request.method.lower())
+        handler = getattr(self, f'a{action}', None)
+        response = None
+        if handler is not None:
+            response = await handler(request, *args, **kwargs)
+        if response is None:
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        return response
+
+    def get_viewset(self, request, action, kwargs):
+        """
+        Готовит экземпляр ViewSet так же, как APIView.initial(), но без
+        аутентификации: она обращается к базе синхронно. Возвращает None,
+        если запрос должен обработать синхронный ViewSet.
+        """
+        view = self.viewset_class(**self.initkwargs)
+        view.action_map = self.actions
+        view.action = action
+        for method, name in self.actions.items():
+            setattr(view, method, getattr(view, name))
+        view.args = ()
+        view.kwargs = kwargs
+        view.headers = view.default_response_headers
+        view.format_kwarg = view.get_format_suffix(**kwargs)
+
+        if not all(isinstance(permission, permissions.AllowAny)
+                   for permission in view.get_permissions()):
+            return None
+        # Троттлинг считает запросы по пользователю, а запись с сессией
+        # требует проверки CSRF в SessionAuthentication: для этого нужна
+        # аутентификация, поэтому такие запросы идут в синхронный ViewSet.
+        if view.get_throttles():
+            return None
+        if request.method not in permissions.SAFE_METHODS and (
+                'HTTP_AUTHORIZATION' in request.META
+                or settings.SESSION_COOKIE_NAME in request.COOKIES):
+            return None
+
+        drf_request = view.initialize_request(request, **kwargs)
+        view.request = drf_request
+        try:
+            renderer, media_type = view.perform_content_negotiation(drf_request)
+        except exceptions.NotAcceptable:
+            return None
+        if renderer.media_type == 'text/html':
+            return None
+        drf_request.accepted_renderer = renderer
+        drf_request.accepted_media_type = media_type
+        return view
+
+    async def alist(self, request, *args, **kwargs):
+        view = self.get_viewset(request, 'list', kwargs)
+        if view is None:
+            return None
+        try:
+            queryset = view.filter_queryset(view.get_queryset())
+            return await self.conditional(view, queryset, 'list', self._list_data)
+        except exceptions.APIException as exc:
+            return self.render_exception(view, exc)
+
+    async def _list_data(self, view, queryset):
+        plan = self.get_field_plan(view)
+        if plan is not None:
+            queryset = plan.rows(queryset)
+        paginator = view.paginator
+        page = None
+        if paginator is not None:
+            page = await paginator.apaginate_queryset(queryset, view.request, view=view)
+        paginated = page is not None
+        # Ответ рендерится целиком, поэтому весь список все равно оказывается
+        # в памяти; большие списки отдает потоковый режим (restapi/streaming.py).
+        if not paginated and plan is not None:
+            # В Django 4.2 aiterator() у values_list() открывает курсор в самом
+            # event loop (SynchronousOnlyOperation). async for по queryset
+            # выбирает все строки одним вызовом _fetch_all в sync_to_async.
+            page = [row async for row in queryset]
+        elif not paginated:
+            # aiterator() читает строки кусками, каждый в sync_to_async.
+            page = [item async for item in queryset.aiterator(chunk_size=self.iterator_chunk_size)]
+        if plan is not None:
+            represent = plan.bind(view.get_serializer())
+            with span('serialize'):
+                data = [represent(row) for row in page]
+        else:
+            data = view.get_serializer(page, many=True).data
+        if paginated:
+            return view.get_paginated_response(data).data
+        return data
+
+    async def aretrieve(self, request, *args, **kwargs):
+        view = self.get_viewset(request, 'retrieve', kwargs)
+        if view is None:
+            return None
+        lookup_url_kwarg = view.lookup_url_kwarg or view.lookup_field
+        try:
+            try:
+                queryset = view.get_queryset().filter(
+                    **{view.lookup_field: kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, DjangoValidationError):
+                raise exceptions.NotFound()
+            return await self.conditional(view, queryset, str(kwargs[lookup_url_kwarg]),
+                                          self._retrieve_data)
+        except exceptions.APIException as exc:
+            return self.render_exception(view, exc)
+
+    async def _retrieve_data(self, view, queryset):
+        plan = self.get_field_plan(view)
+        if plan is not None:
+            queryset = plan.rows(queryset)
+        try:
+            instance = await queryset.aget()
+        except ObjectDoesNotExist:
+            raise exceptions.NotFound()
+        if plan is not None:
+            with span('serialize'):
+                return plan.bind(view.get_serializer())(instance)
+        return view.get_serializer(instance).data
+
+    def get_field_plan(self, view):
+        # Быстрый путь чтения (restapi/fastpath.py), если он есть у ViewSet.
+        if isinstance(view, FastReadMixin):
+            return view.get_field_plan()
+        return None
+
+    async def acreate(self, request, *args, **kwargs):
+        # Файлы (multipart) и bulk-списки обрабатывает синхронный ViewSet.
+        if request.content_type != 'application/json':
+            return None
+        # Тело читается заранее и кэшируется в request, чтобы синхронный
+        # ViewSet мог разобрать его повторно, если запрос уйдет к нему.
+        request.body
+        view = self.get_viewset(request, 'create', kwargs)
+        if view is None:
+            return None
+        try:
+            if isinstance(view.request.data, list):
+                return None
+            serializer = view.get_serializer(data=view.request.data)
+            serializer.is_valid(raise_exception=True)
+            if type(view).perform_create is QueuedWriteMixin.perform_create:
+                # Та же запись, что делает perform_create очереди, но ожидание
+                # результата не занимает поток.
+                await arun_write(serializer.save)
+            else:
+                await sync_to_async(view.perform_create)(serializer)
+            data = serializer.data
+            return self.render(view, data, status.HTTP_201_CREATED,
+                               view.get_success_headers(data))
+        except exceptions.APIException as exc:
+            return self.render_exception(view, exc)
+
+    async def conditional(self, view, queryset, scope, get_data):
+        # get_validators и кэш ответов читают файловый кэш, поэтому они
+        # выполняются одним вызовом в потоке, не блокируя event loop.
+        etag, last_modified, response, key = await sync_to_async(self.lookup)(
+            view, queryset, scope)
+        if response is not None:
+            return response
+
+        if (scope == 'list' and isinstance(view, StreamingListMixin)
+                and view.is_streaming(view.request)):
+            response = view.streaming_response(queryset, asynchronous=True)
+            self.set_headers(view, response)
+            return self.finalize(view, response, etag, last_modified)
+
+        response = self.render(view, await get_data(view, queryset), status.HTTP_200_OK)
+        if key is not None:
+            await get_api_cache().aset(key, (response.content, response['Content-Type']))
+        return self.finalize(view, response, etag, last_modified)
+
+    def lookup(self, view, queryset, scope):
+        """
+        Возвращает (etag, last_modified, готовый ответ или None, ключ для
+        записи ответа в кэш или None): 304 или ответ из кэша.
+        """
+        request = view.request
+        etag = last_modified = None
+        if isinstance(view, ConditionalGetMixin):
+            etag, last_modified = view.get_validators(request, scope)
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return (etag, last_modified,
+                        view.set_validators(not_modified, etag, last_modified), None)
+
+        if (scope == 'list' and isinstance(view, StreamingListMixin)
+                and view.is_streaming(request)):
+            return etag, last_modified, None, None
+
+        if not (isinstance(view, CachedResponseMixin) and view.is_cacheable(request)):
+            return etag, last_modified, None, None
+        key = response_cache_key(request, queryset.model, scope)
+        cached = get_api_cache().get(key)
+        record_cache('api', cached is not None)
+        if cached is None:
+            return etag, last_modified, None, key
+        content, content_type = cached
+        response = HttpResponse(content, content_type=content_type)
+        return etag, last_modified, self.finalize(view, response, etag, last_modified), None
+
+    def finalize(self, view, response, etag, last_modified):
+        if etag is not None:
+            view.set_validators(response, etag, last_modified)
+        return response
+
+    def render(self, view, data, status_code, headers=None):
+        request = view.request
+        renderer = request.accepted_renderer
+        with span('render'):
+            content = renderer.render(data, request.accepted_media_type,
+                                      view.get_renderer_context())
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = HttpResponse(content, status=status_code, content_type=content_type)
+        return self.set_headers(view, response, headers)
+
+    def set_headers(self, view, response, headers=None):
+        view_headers = dict(view.headers)
+        vary = view_headers.pop('Vary', None)
+        for name, value in {**view_headers, **(headers or {})}.items():
+            response[name] = value
+        if vary is not None:
+            patch_vary_headers(response, [vary])
+        return response
+
+    def render_exception(self, view, exc):
+        response = view.handle_exception(exc)
+        return self.render(view, response.data, response.status_code,
+                           {name: value for name, value in response.items()
+                            if name != 'Content-Type'})
@@ -0,0 +1,291 @@
+"""
+Нагрузочный прогон REST и GraphQL эндпоинтов внутри процесса
+(manage.py benchmark).
+
+Список эндпоинтов строится из роутеров Portfolio/urls.py и restapi/urls.py,
+схемы GraphQL и страниц админки, поэтому новые ViewSet и поля Query
+попадают в прогон без правок. Для каждого эндпоинта считаются p50/p95/p99
+и среднее время ответа, пропускная способность, число SQL-запросов на
+запрос и пиковая память Python на один запрос; отчет — JSON с
+отсортированными ключами, который удобно сравнивать между коммитами.
+"""
+
+import json
+import math
+import platform
+import resource
+import subprocess
+import time
+import tracemalloc
+from collections import namedtuple
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from graphql import GraphQLEnumType, GraphQLList, GraphQLNonNull, GraphQLScalarType
+
+from .cache import get_api_cache
+from .seed import WORDS
+
+Endpoint = namedtuple('Endpoint', 'name method path data urlconf')
+Endpoint.__new__.__defaults__ = (None, None)
+
+BENCHMARK_USER = 'benchmark'
+
+
+def router_endpoints(router, urlconf, prefix=''):
+    """
+    list (целиком и первая страница), поиск и detail каждого ViewSet роутера.
+    """
+    endpoints = []
+    for route, viewset, basename in router.registry:
+        base = f'{prefix}/{route}/'
+        queryset = viewset.queryset
+        if hasattr(viewset, 'list'):
+            endpoints.append(Endpoint(f'GET {base}', 'get', base, urlconf=urlconf))
+            endpoints.append(Endpoint(f'GET {base}?page_size=50', 'get',
+                                      f'{base}?page_size=50', urlconf=urlconf))
+            if getattr(viewset, 'search_fields', None):
+                path = f'{base}?search={WORDS[0]}&page_size=50'
+                endpoints.append(Endpoint(f'GET {path}', 'get', path, urlconf=urlconf))
+            if getattr(viewset, 'range_fields', None):
+                field = viewset.range_fields[0]
+                path = f'{base}?ordering=-{field}&{field}__lte=1000&page_size=50'
+                endpoints.append(Endpoint(f'GET {path}', 'get', path, urlconf=urlconf))
+        if hasattr(viewset, 'retrieve') and queryset is not None:
+            lookup_field = getattr(viewset, 'lookup_field', 'pk')
+            # Объект из середины таблицы, а не первый по pk.
+            count = queryset.count()
+            obj = queryset.order_by('pk')[count // 2:count // 2 + 1].first() if count else None
+            if obj is not None:
+                value = getattr(obj, lookup_field)
+                endpoints.append(Endpoint(f'GET {base}{{{lookup_field}}}/', 'get',
+                                          f'{base}{value}/', urlconf=urlconf))
+    return endpoints
+
+
+def _named_type(graphql_type):
+    while isinstance(graphql_type, (GraphQLNonNull, GraphQLList)):
+        graphql_type = graphql_type.of_type
+    return graphql_type
+
+
+def graphql_endpoints(path='/graphql/'):
+    """
+    По одному запросу на каждое поле Query: все скалярные поля типа
+    без обязательных аргументов.
+    """
+    from graphapi.schemas import schema
+
+    endpoints = []
+    query_type = schema.graphql_schema.query_type
+    for name, field in sorted(query_type.fields.items()):
+        if any(isinstance(arg.type, GraphQLNonNull) for arg in field.args.values()):
+            continue
+        named = _named_type(field.type)
+        if isinstance(named, (GraphQLScalarType, GraphQLEnumType)):
+            selection = ''
+        else:
+            leaves = [
+                leaf_name for leaf_name, leaf in named.fields.items()
+                if isinstance(_named_type(leaf.type), (GraphQLScalarType, GraphQLEnumType))
+                and not any(isinstance(arg.type, GraphQLNonNull) for arg in leaf.args.values())
+            ]
+            selection = ' { %s }' % ' '.join(leaves)
+        query = '{ %s%s }' % (name, selection)
+        endpoints.append(Endpoint(f'POST {path} {name}', 'post', path, {'query': query}))
+    return endpoints
+
+
+def admin_endpoints(prefix='/admin'):
+    endpoints = [Endpoint(f'GET {prefix}/', 'get', f'{prefix}/')]
+    for model in admin.site._registry:
+        opts = model._meta
+        path = f'{prefix}/{opts.app_label}/{opts.model_name}/'
+        endpoints.append(Endpoint(f'GET {path}', 'get', path))
+    return endpoints
+
+
+def default_endpoints():
+    from Portfolio.urls import router as portfolio_router
+    from restapi.urls import router as restapi_router
+
+    endpoints = router_endpoints(portfolio_router, None)
+    endpoints += router_endpoints(restapi_router, 'restapi.urls')
+    endpoints += graphql_endpoints()
+    endpoints.append(Endpoint('GET /swagger/?format=openapi', 'get', '/swagger/?format=openapi'))
+    endpoints += admin_endpoints()
+    return endpoints
+
+
+def percentile(values, percent):
+    # Метод ближайшего ранга: значение, которое реально было измерено.
+    ordered = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Benchmark:
+    """
+    Выполняет эндпоинты через django.test.Client (весь стек middleware,
+    без сети). Каждый эндпоинт вызывается warmup раз без замеров, затем до
+    requests раз; и прогрев, и замеры ограничены max_seconds, поэтому
+    медленный эндпоинт дает меньше измерений, но не останавливает прогон.
+    Память измеряется отдельным вызовом под tracemalloc, чтобы он не
+    искажал время ответа.
+
+    cold=True очищает кэш ответов API перед каждым запросом; по умолчанию
+    измеряется обычный режим с кэшем.
+    """
+
+    def __init__(self, requests=100, warmup=5, max_seconds=10, cold=False):
+        self.requests = requests
+        self.warmup = warmup
+        self.max_seconds = max_seconds
+        self.cold = cold
+        self.client = Client()
+
+    def call(self, endpoint):
+        if self.cold:
+            get_api_cache().clear()
+        if endpoint.method == 'post':
+            response = self.client.post(endpoint.path, endpoint.data,
+                                        content_type='application/json')
+        else:
+            response = getattr(self.client, endpoint.method)(endpoint.path)
+        # Потоковые ответы читаются целиком, чтобы учесть их рендеринг.
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+    def measure(self, endpoint):
+        with override_settings(ROOT_URLCONF=endpoint.urlconf or settings.ROOT_URLCONF):
+            started = time.perf_counter()
+            for _ in range(self.warmup):
+                self.call(endpoint)
+                if time.perf_counter() - started > self.max_seconds:
+                    break
+
+            latencies = []
+            errors = 0
+            counter = QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                while len(latencies) < self.requests:
+                    begin = time.perf_counter()
+                    status = self.call(endpoint)
+                    latencies.append(time.perf_counter() - begin)
+                    if status >= 400:
+                        errors += 1
+                    if time.perf_counter() - started > self.max_seconds:
+                        break
+            elapsed = time.perf_counter() - started
+
+            tracemalloc.start()
+            try:
+                self.call(endpoint)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        return {
+            'method': endpoint.method.upper(),
+            'path': endpoint.path,
+            'requests': len(latencies),
+            'errors': errors,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+            'throughput_rps': round(len(latencies) / elapsed, 2),
+            'queries_per_request': round(counter.count / len(latencies), 2),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
+
+    def run(self, endpoints, progress=None):
+        user, created = get_user_model().objects.get_or_create(
+            username=BENCHMARK_USER, defaults={'is_staff': True, 'is_superuser': True})
+        self.client.force_login(user)
+        try:
+            results = {}
+            for endpoint in endpoints:
+                results[endpoint.name] = self.measure(endpoint)
+                if progress is not None:
+                    progress(endpoint.name, results[endpoint.name])
+        finally:
+            self.client.logout()
+            if created:
+                user.delete()
+
+        return {
+            'meta': self.meta(),
+            'endpoints': results,
+        }
+
+    def meta(self):
+        return {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'dataset': {
+                model._meta.label: model._default_manager.count()
+                for model in apps.get_app_config('restapi').get_models()
+            },
+            'settings': {
+                'requests': self.requests,
+                'warmup': self.warmup,
+                'max_seconds': self.max_seconds,
+                'cold': self.cold,
+                'fast_read': getattr(settings, 'FAST_READ', {}).get('ENABLED', True),
+            },
+            # Пиковый RSS процесса за весь прогон (Linux — КиБ, macOS — байты).
+            'max_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(previous, current, metrics=('p50_ms', 'p95_ms', 'queries_per_request')):
+    """
+    Изменения метрик относительно предыдущего отчета: {эндпоинт: {метрика: (было, стало, %)}}.
+    """
+    changes = {}
+    for name, result in current['endpoints'].items():
+        before = previous.get('endpoints', {}).get(name)
+        if before is None:
+            continue
+        changes[name] = {}
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            delta = (new - old) / old * 100 if old else 0.0
+            changes[name][metric] = (old, new, round(delta, 1))
+    return changes
+
+
+def dump(report):
+    return json.dumps(report, ensure_ascii=False, indent=2, sort_keys=True)
@@ -0,0 +1,143 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .writes import run_write
+
+
+class BulkModelMixin:
+    """
+    Массовые операции над коллекцией:
+
+    * POST   /skills/  [{...}, {...}]                  -> bulk_create
+    * PATCH  /skills/  [{"id": 1, ...}, {"id": 2, ...}] -> bulk_update
+    * DELETE /skills/  [1, 2, 3]                        -> один DELETE ... WHERE id IN
+
+    Все элементы валидируются заранее; если хотя бы один невалиден (или
+    в bulk_update один id указан дважды), возвращается 400 со списком
+    ошибок в порядке элементов запроса и в базу ничего не пишется. Запись выполняется в одной транзакции.
+    """
+    bulk_max_items = 1000
+
+    def create(self, request, *args, **kwargs):
+        if not isinstance(request.data, list):
+            return super().create(request, *args, **kwargs)
+
+        items = self.get_bulk_items(request)
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        model = self.get_queryset().model
+        instances = [model(**data) for data in serializer.validated_data]
+
+        def write():
+            with transaction.atomic():
+                created = model._default_manager.bulk_create(instances)
+                self.send_bulk_post_save(model, created, created=True)
+            return created
+
+        instances = run_write(write)
+
+        data = self.get_serializer(instances, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def bulk_update(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request)
+        model = self.get_queryset().model
+        pks = [item.get('id') if isinstance(item, dict) else None for item in items]
+        try:
+            instances = self.get_queryset().in_bulk([pk for pk in pks if pk is not None])
+        except (TypeError, ValueError):
+            raise ValidationError('Каждый объект должен содержать корректный id.')
+        instances = {str(pk): instance for pk, instance in instances.items()}
+
+        errors, updates, fields, seen = [], [], set(), set()
+        for item, pk in zip(items, pks):
+            instance = instances.get(str(pk))
+            if instance is None:
+                errors.append({'id': [f'Объект с идентификатором {pk} не найден.']})
+                continue
+            if str(pk) in seen:
+                # Второе изменение того же объекта молча затерло бы первое.
+                errors.append({'id': [f'Объект с идентификатором {pk} указан несколько раз.']})
+                continue
+            seen.add(str(pk))
+            serializer = self.get_serializer(instance, data=item, partial=True)
+            if serializer.is_valid():
+                errors.append({})
+                updates.append((instance, serializer.validated_data))
+                fields.update(serializer.validated_data)
+            else:
+                errors.append(serializer.errors)
+        if any(errors):
+            raise ValidationError(errors)
+
+        # bulk_update не вызывает pre_save, поэтому auto_now поля
+        # (updated_at) обновляем вручную.
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+                for instance, _ in updates:
+                    setattr(instance, field.attname, now)
+
+        for instance, validated_data in updates:
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+
+        updated = [instance for instance, _ in updates]
+        if fields:
+            def write():
+                with transaction.atomic():
+                    model._default_manager.bulk_update(updated, sorted(fields))
+                    self.send_bulk_post_save(model, updated, created=False)
+
+            run_write(write)
+
+        return Response(self.get_serializer(updated, many=True).data)
+
+    def bulk_destroy(self, request, *args, **kwargs):
+        items = self.get_bulk_items(request)
+        pks = [item.get('id') if isinstance(item, dict) else item for item in items]
+        try:
+            existing = set(
+                str(pk) for pk in self.get_queryset().filter(pk__in=pks).values_list('pk', flat=True))
+        except (TypeError, ValueError):
+            raise ValidationError('Ожидается список идентификаторов.')
+
+        errors = [
+            {} if str(pk) in existing else {'id': [f'Объект с идентификатором {pk} не найден.']}
+            for pk in pks
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+
+        # Один DELETE ... WHERE id IN (...); сигналы post_delete сохраняются,
+        # чтобы поисковый индекс и кэш ответов оставались согласованными.
+        queryset = self.get_queryset().filter(pk__in=pks)
+
+        def write():
+            with transaction.atomic():
+                queryset.delete()
+
+        run_write(write)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def get_bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError('Ожидается непустой список объектов.')
+        if len(items) > self.bulk_max_items:
+            raise ValidationError(
+                f'Слишком много объектов: {len(items)}, максимум {self.bulk_max_items}.')
+        return items
+
+    def send_bulk_post_save(self, model, instances, created):
+        # bulk_create/bulk_update не отправляют post_save; отправляем сами,
+        # чтобы сработали поисковый индекс и инвалидация кэша.
+        for instance in instances:
+            post_save.send(sender=model, instance=instance, created=created,
+                           update_fields=None, raw=False, using=instance._state.db)
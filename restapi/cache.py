@@ -0,0 +1,115 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .db.routers import get_replicas, is_pinned
+from .metrics import record_cache
+
+
+def get_api_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'api')]
+
+
+def _generation_key(model, scope):
+    return f'api-gen:{model._meta.label_lower}:{scope}'
+
+
+def _new_generation():
+    # Время смены поколения — Last-Modified ответов (restapi/conditional.py).
+    return f'{int(time.time())}.{uuid.uuid4().hex}'
+
+
+def _generation(cache, model, scope):
+    """
+    Текущее поколение кэша для списка модели или одного объекта.
+    Ключи ответов включают поколение, поэтому смена поколения делает
+    недостижимыми ровно те записи, которые относятся к измененным данным.
+    """
+    key = _generation_key(model, scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def get_generation(model, scope):
+    return _generation(get_api_cache(), model, scope)
+
+
+def generation_time(generation):
+    """
+    Unix-время смены поколения. Если поколение создано заново (кэш
+    очищен), это время его создания: оно не раньше последнего изменения.
+    """
+    try:
+        return int(generation.split('.', 1)[0])
+    except (AttributeError, ValueError):
+        return None
+
+
+def invalidate(model, pks=()):
+    """
+    Сбрасывает кэш списков модели и деталей объектов с указанными pk.
+    Новое поколение записывается целиком (а не через incr), чтобы
+    несколько процессов с файловым кэшем не затирали изменения друг друга.
+    """
+    cache = get_api_cache()
+    keys = [_generation_key(model, 'list')]
+    keys += [_generation_key(model, str(pk)) for pk in pks]
+    cache.set_many({key: _new_generation() for key in keys}, timeout=None)
+
+
+def response_cache_key(request, model, scope, generation=None):
+    if generation is None:
+        generation = get_generation(model, scope)
+    # Клиент, закрепленный за основной базой после записи, не должен
+    # получить ответ, собранный по отстающей реплике.
+    source = 'primary' if get_replicas() and is_pinned() else ''
+    raw = '|'.join([request.path, request.META.get('QUERY_STRING', ''),
+                    request.accepted_media_type or '', source])
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'api:{model._meta.label_lower}:{scope}:{generation}:{digest}'
+
+
+class CachedResponseMixin:
+    """
+    Read-through кэш для GET list/retrieve. Кэшируется уже отрендеренный
+    ответ (JSON и т.п.), HTML browsable API не кэшируется, так как
+    содержит CSRF-токен и данные пользователя.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, 'list', super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.cached_response(request, str(kwargs[lookup_url_kwarg]),
+                                    super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, scope, handler, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        cache = get_api_cache()
+        key = response_cache_key(request, self.queryset.model, scope)
+        cached = cache.get(key)
+        record_cache('api', cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            def store(rendered):
+                cache.set(key, (rendered.content, rendered['Content-Type']))
+            response.add_post_render_callback(store)
+        return response
+
+    def is_cacheable(self, request):
+        return (request.method in ('GET', 'HEAD')
+                and request.accepted_renderer.media_type != 'text/html')
@@ -0,0 +1,62 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers, quote_etag
+from django.utils.http import http_date
+
+from .cache import generation_time, get_generation, response_cache_key
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified для GET list/retrieve.
+
+    Валидаторы строятся из поколения кэша ответов (restapi/cache.py):
+    сигналы меняют его после каждого коммита, затронувшего модель (для
+    списка) или объект (для детали). Запросов к базе для них нет, поэтому
+    при совпадении If-None-Match / If-Modified-Since ответ 304 отдается
+    без выборки строк и сериализации. Страница курсорной пагинации
+    различается по query string, которая тоже входит в ETag, а формат
+    ответа (JSON, NDJSON, ...) — по согласованному media type, поэтому
+    ответ, в том числе 304, получает Vary: Accept.
+
+    Поколение меняют и записи без сигналов: QuerySet.update() моделей с
+    кэшем (CachedQuerySet), bulk-операции и seed. Кэш 'api' должен быть
+    общим для всех машин (см. CACHES), иначе запись на одной из них не
+    изменит валидаторы на остальных.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, 'list', super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.conditional_response(request, str(kwargs[lookup_url_kwarg]),
+                                         super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, scope, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request, scope)
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self.set_validators(not_modified, etag, last_modified)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.set_validators(response, etag, last_modified)
+        return response
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        patch_vary_headers(response, ['Accept'])
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validators(self, request, scope):
+        model = self.queryset.model
+        generation = get_generation(model, scope)
+        # Ключ ответа в кэше уже учитывает путь, query string, формат и
+        # закрепление за основной базой.
+        raw = response_cache_key(request, model, scope, generation)
+        etag = quote_etag(hashlib.md5(raw.encode('utf-8')).hexdigest())
+        return etag, generation_time(generation)
@@ -0,0 +1,94 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Состояние текущего запроса. Объект изменяемый, чтобы отметка о записи,
+# сделанная в потоке sync_to_async, была видна и вызывающему коду.
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    def __init__(self, pinned=False):
+        # pinned — читать с основной базы; wrote — в этом запросе была запись.
+        self.pinned = pinned
+        self.wrote = False
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def begin_request(pinned=False):
+    return _state.set(RoutingState(pinned))
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def pin_primary(wrote=True):
+    """
+    До конца запроса все чтения идут в основную базу. Вызывается при записи
+    и перед чтениями, результат которых будет записан (PUT, мутации).
+    """
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+        state.wrote = state.wrote or wrote
+
+
+def is_pinned():
+    state = _state.get()
+    return state is not None and state.pinned
+
+
+# Выражения, после которых чтения закрепляются за основной базой.
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+def pin_on_write(execute, sql, params, many, context):
+    # Закрепляет клиента только настоящая запись: db_for_write вызывается
+    # и для чтений (транзакции админки на GET, get_or_create).
+    if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+        pin_primary()
+    return execute(sql, params, many, context)
+
+
+def install_write_pinning(sender, connection, **kwargs):
+    if connection.alias == DEFAULT_DB_ALIAS and pin_on_write not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, pin_on_write)
+
+
+class PrimaryReplicaRouter:
+    """
+    Запись — в основную базу (default), чтение — в случайную реплику из
+    DATABASE_REPLICAS. После записи (pin_on_write, run_write) чтение
+    закрепляется за основной базой до конца запроса, а через cookie (ReplicaPinningMiddleware) — еще на
+    REPLICA_PIN_SECONDS секунд для этого клиента. Внутри транзакции на
+    основной базе чтение тоже идет в нее.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replicas()
+        if not replicas or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплики приходит вместе с репликацией.
+        if db in get_replicas():
+            return False
+        return None
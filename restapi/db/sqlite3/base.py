@@ -0,0 +1,56 @@
+"""
+SQLite для продакшена: PRAGMA при каждом подключении и BEGIN IMMEDIATE.
+
+Опции повторяют появившиеся в Django 5.1 `init_command` и
+`transaction_mode`, поэтому после обновления Django достаточно
+вернуть ENGINE на django.db.backends.sqlite3.
+"""
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Опции, которые обрабатывает этот бэкенд, а не sqlite3.connect().
+    backend_options = ('init_command', 'transaction_mode', 'write_queue')
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for name in self.backend_options:
+            kwargs.pop(name, None)
+        return kwargs
+
+    @property
+    def init_commands(self):
+        init_command = self.settings_dict['OPTIONS'].get('init_command', '')
+        return [command.strip() for command in init_command.split(';') if command.strip()]
+
+    @property
+    def transaction_mode(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        if mode is not None and mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode должен быть одним из {', '.join(TRANSACTION_MODES)}.")
+        return mode and mode.upper()
+
+    @property
+    def write_queue(self):
+        return self.settings_dict['OPTIONS'].get('write_queue') or None
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in self.init_commands:
+            conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # С BEGIN (DEFERRED) транзакция берет блокировку записи только на
+        # первом INSERT/UPDATE. Если в этот момент пишет другое соединение,
+        # SQLite сразу возвращает "database is locked", не дожидаясь
+        # busy_timeout. IMMEDIATE берет блокировку в начале и ждет ее честно.
+        if self.transaction_mode:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+        else:
+            super()._start_transaction_under_autocommit()
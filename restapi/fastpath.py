@@ -0,0 +1,226 @@
+"""
+Быстрый путь GET list/retrieve: строки читаются через values_list() и
+превращаются в словари по плану, составленному один раз на класс
+сериализатора, без создания экземпляров моделей и без обхода полей
+Serializer.to_representation для каждой строки.
+
+План повторяет то, что делает to_representation: для колонок значение
+берется из кортежа и передается в to_representation поля (или отдается
+как есть, если поле ничего с ним не делает). Поля, которым нужен объект
+(SerializerMethodField, свойства модели, файлы), получают легкий объект
+модели, собранный из той же строки без Model.__init__. Если в
+сериализаторе есть поля, которые так не прочитать (вложенные
+сериализаторы, many-to-many, источники через связи), используется
+обычный путь DRF.
+"""
+
+from django.conf import settings
+from django.db import models
+from django.db.models.base import ModelState
+from rest_framework import permissions, serializers
+from rest_framework.fields import SkipField
+from rest_framework.generics import get_object_or_404
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+from .sparse import field_columns, ordering_columns
+from .timing import span
+
+# to_representation, которые для значения нужного типа из базы
+# возвращают его без изменений.
+PASSTHROUGH = {
+    serializers.CharField.to_representation: {
+        'CharField', 'TextField', 'SlugField',
+    },
+    serializers.IntegerField.to_representation: {
+        'AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField', 'BigIntegerField',
+        'SmallIntegerField', 'PositiveIntegerField', 'PositiveSmallIntegerField',
+        'PositiveBigIntegerField',
+    },
+    serializers.BooleanField.to_representation: {'BooleanField'},
+}
+
+COLUMN, RELATED, OBJECT = 'column', 'related', 'object'
+
+
+class FieldPlan:
+    """
+    План чтения полей сериализатора: список (имя, вид, колонка, без
+    преобразования, колонки для значения). Не зависит от запроса и
+    хранится в классе.
+    """
+
+    def __init__(self, model, names, steps):
+        self.model = model
+        self.names = names
+        self.steps = steps
+        self.needs_object = any(kind == OBJECT for _, kind, _, _, _ in steps)
+        self._selected = {}
+
+    def select(self, field_names):
+        """
+        План только для полей field_names (?fields= / ?omit=): из базы
+        читаются лишь нужные им колонки и первичный ключ.
+        """
+        field_names = frozenset(field_names)
+        if field_names >= {name for name, _, _, _, _ in self.steps}:
+            return self
+        if field_names not in self._selected:
+            steps = [step for step in self.steps if step[0] in field_names]
+            needed = {self.model._meta.pk.attname}
+            for _, _, _, _, columns in steps:
+                if columns is None:
+                    needed.update(self.names)
+                    break
+                needed.update(columns)
+            names = [name for name in self.names if name in needed]
+            self._selected[field_names] = FieldPlan(self.model, names, steps)
+        return self._selected[field_names]
+
+    def rows(self, queryset):
+        # Колонки сортировки и аннотации (search_rank, _total_cost) нужны
+        # курсору пагинации.
+        opts = self.model._meta
+        ordering = [opts.get_field(name).attname for name in ordering_columns(queryset)]
+        extra = [name for name in dict.fromkeys(ordering) if name not in self.names]
+        return queryset.values_list(*self.names, *extra, *queryset.query.annotation_select)
+
+    def bind(self, serializer):
+        """
+        Функция строка -> словарь для полей конкретного экземпляра
+        сериализатора (с его context и request).
+        """
+        fields = serializer.fields
+        steps = [
+            (name, kind, None if column is None else self.names.index(column),
+             None if passthrough else fields[name])
+            for name, kind, column, passthrough, _ in self.steps
+        ]
+        make_object = self.make_object
+
+        def represent(row):
+            instance = make_object(row) if self.needs_object else None
+            data = {}
+            for name, kind, index, field in steps:
+                if kind == OBJECT:
+                    try:
+                        value = field.get_attribute(instance)
+                    except SkipField:
+                        continue
+                else:
+                    value = row[index]
+                if value is None or field is None:
+                    data[name] = value
+                else:
+                    data[name] = field.to_representation(value)
+            return data
+
+        return represent
+
+    def make_object(self, row):
+        instance = self.model.__new__(self.model)
+        instance.__dict__.update(zip(self.names, row))
+        instance._state = ModelState()
+        instance._state.adding = False
+        return instance
+
+
+_plans = {}
+
+
+def compile_plan(serializer_class):
+    """
+    План для класса сериализатора или None, если быстрый путь к нему
+    неприменим. Результат кэшируется.
+    """
+    if serializer_class not in _plans:
+        _plans[serializer_class] = _compile(serializer_class())
+    return _plans[serializer_class]
+
+
+def _compile(serializer):
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return None
+    opts = model._meta
+    names = [field.attname for field in opts.concrete_fields]
+    steps = []
+    for field in serializer._readable_fields:
+        if isinstance(field, (serializers.BaseSerializer, ManyRelatedField)):
+            return None
+        columns = field_columns(model, field)
+        if columns is not None:
+            columns = tuple(opts.get_field(name).attname for name in columns)
+        attrs = field.source_attrs
+        model_field = None
+        if len(attrs) == 1:
+            model_field = next((f for f in opts.concrete_fields if f.name == attrs[0]), None)
+        elif attrs:
+            return None
+
+        if model_field is None:
+            # Свойство или метод модели, SerializerMethodField (source='*').
+            if attrs and any(f.name == attrs[0] for f in opts.get_fields()):
+                return None
+            steps.append((field.field_name, OBJECT, None, False, columns))
+        elif model_field.is_relation:
+            if not isinstance(field, PrimaryKeyRelatedField) or field.pk_field is not None:
+                return None
+            steps.append((field.field_name, RELATED, model_field.attname, True, columns))
+        elif isinstance(model_field, models.FileField):
+            steps.append((field.field_name, OBJECT, None, False, columns))
+        else:
+            passthrough = model_field.get_internal_type() in PASSTHROUGH.get(
+                type(field).to_representation, ())
+            steps.append((field.field_name, COLUMN, model_field.attname, passthrough, columns))
+    return FieldPlan(model, names, steps)
+
+
+class FastReadMixin:
+    """
+    GET list/retrieve через FieldPlan. Ставится после ConditionalGetMixin и
+    CachedResponseMixin, чтобы ETag и кэш ответов работали как раньше.
+    Объектные права не проверяются, поэтому retrieve идет быстрым путем,
+    только если ни один класс прав не переопределяет has_object_permission.
+    """
+
+    def get_field_plan(self):
+        if not getattr(settings, 'FAST_READ', {}).get('ENABLED', True):
+            return None
+        plan = compile_plan(self.get_serializer_class())
+        if plan is not None:
+            # Сериализатор может быть сужен через ?fields= / ?omit=.
+            plan = plan.select(self.get_serializer().fields)
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_field_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = plan.rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        represent = plan.bind(self.get_serializer())
+        with span('serialize'):
+            data = [represent(row) for row in (rows if page is None else page)]
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        plan = self.get_field_plan()
+        if plan is None or not self.has_trivial_object_permissions():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        rows = plan.rows(self.filter_queryset(self.get_queryset()))
+        row = get_object_or_404(rows, **{self.lookup_field: kwargs[lookup_url_kwarg]})
+        with span('serialize'):
+            data = plan.bind(self.get_serializer())(row)
+        return Response(data)
+
+    def has_trivial_object_permissions(self):
+        return all(
+            type(permission).has_object_permission is permissions.BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
@@ -0,0 +1,108 @@
+from django.core.exceptions import ValidationError
+from rest_framework.compat import coreapi, coreschema
+from rest_framework.exceptions import ValidationError as APIValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter, SearchFilter
+
+from .search import full_text_search
+
+
+def query_alias(view, name):
+    """
+    Имя в queryset для публичного имени параметра запроса. Представление
+    задает их в `query_aliases`, например {'total_cost': '_total_cost'}.
+    """
+    return getattr(view, 'query_aliases', {}).get(name, name)
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    `?search=` через полнотекстовый индекс (FTS5 / tsvector).
+    Для моделей без индекса работает как обычный SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_term = request.query_params.get(self.search_param, '')
+        if not search_term.strip():
+            return queryset
+
+        results = full_text_search(queryset, search_term,
+                                   self.get_search_fields(view, request) or [])
+        if results is None:
+            return super().filter_queryset(request, queryset, view)
+        return results
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """
+    Если клиент не задал `?ordering=`, результаты поиска сортируются
+    по релевантности, а затем по порядку представления по умолчанию.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering:
+            ordering = [('-' if order.startswith('-') else '') + query_alias(view, order.lstrip('-'))
+                        for order in ordering]
+        if (request.query_params.get(self.ordering_param)
+                or 'search_rank' not in queryset.query.annotations):
+            return ordering
+        return ['-search_rank'] + list(ordering or [])
+
+
+class RangeFilter(BaseFilterBackend):
+    """
+    `?<поле>__gte=`, `__lte=`, `__gt=`, `__lt=` для полей из `range_fields`
+    представления. Поле может быть колонкой модели или аннотацией
+    queryset (например, _total_cost под публичным именем total_cost, см.
+    `query_aliases`); сравнение выполняется в SQL.
+    """
+    lookups = ('gte', 'lte', 'gt', 'lt')
+
+    def get_range_fields(self, queryset, view):
+        fields = {}
+        for name in getattr(view, 'range_fields', []):
+            source = query_alias(view, name)
+            if source in queryset.query.annotations:
+                fields[name] = source, queryset.query.annotations[source].output_field
+            else:
+                fields[name] = source, queryset.model._meta.get_field(source)
+        return fields
+
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        errors = {}
+        for name, (source, field) in self.get_range_fields(queryset, view).items():
+            for lookup in self.lookups:
+                param = f'{name}__{lookup}'
+                value = request.query_params.get(param)
+                if value is None or value == '':
+                    continue
+                try:
+                    filters[f'{source}__{lookup}'] = field.to_python(value)
+                except ValidationError as error:
+                    errors[param] = error.messages
+        if errors:
+            raise APIValidationError(errors)
+        return queryset.filter(**filters) if filters else queryset
+
+    def get_schema_fields(self, view):
+        assert coreapi is not None, 'coreapi must be installed to use `get_schema_fields()`'
+        assert coreschema is not None, 'coreschema must be installed to use `get_schema_fields()`'
+        return [
+            coreapi.Field(name=f'{name}__{lookup}', required=False, location='query',
+                          schema=coreschema.Number(title=f'{name}__{lookup}'))
+            for name in getattr(view, 'range_fields', [])
+            for lookup in self.lookups
+        ]
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': f'{name}__{lookup}',
+                'required': False,
+                'in': 'query',
+                'schema': {'type': 'number'},
+            }
+            for name in getattr(view, 'range_fields', [])
+            for lookup in self.lookups
+        ]
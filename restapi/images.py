@@ -0,0 +1,248 @@
+import base64
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, router, transaction
+from PIL import Image, ImageOps
+
+from .writes import run_write
+
+logger = logging.getLogger('restapi.images')
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'avif': 'image/avif',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+}
+
+
+def get_derivative_settings():
+    options = {
+        # Ширины производных изображений в пикселях. Больше исходной
+        # ширины изображение не увеличивается.
+        'WIDTHS': [320, 640, 1280],
+        # Форматы в порядке предпочтения. Формат пропускается, если
+        # установленный Pillow не умеет его кодировать (AVIF требует
+        # Pillow с libavif или плагин pillow-avif-plugin).
+        'FORMATS': ['avif', 'webp'],
+        'QUALITY': 80,
+        # Ширина размытой заглушки, которая отдается inline как data URI.
+        'PLACEHOLDER_WIDTH': 16,
+        # Потоки, в которых выполняются задания (чтение, запись, база).
+        'WORKERS': 2,
+        # Если больше нуля, кодирование выполняется в пуле из стольких
+        # процессов, а не в потоках.
+        'PROCESSES': 0,
+        # False — генерировать синхронно (management-команда, тесты).
+        'ASYNC': True,
+    }
+    options.update(getattr(settings, 'PROJECT_IMAGE_DERIVATIVES', {}))
+    return options
+
+
+# EXIF Orientation и значения, при которых ширина и высота меняются местами.
+ORIENTATION_TAG = 0x0112
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def supported_formats(formats):
+    Image.init()
+    return [fmt for fmt in formats if fmt.upper() in Image.SAVE]
+
+
+def target_widths(source_width, widths):
+    """
+    Ширины меньше исходной плюс сама исходная ширина, если она меньше
+    наибольшей настроенной: так у маленьких картинок будет хотя бы один
+    вариант, а большие не увеличиваются.
+    """
+    result = {width for width in widths if width < source_width}
+    if widths and source_width <= max(widths):
+        result.add(source_width)
+    return sorted(result)
+
+
+def render_derivatives(data, widths, formats, quality, placeholder_width):
+    """
+    Кодирует производные изображения. Функция не обращается к Django,
+    поэтому может выполняться в отдельном процессе.
+
+    Возвращает (варианты, заглушка), где варианты — список
+    (ширина, высота, формат, байты), а заглушка — байты WebP.
+    """
+    image = Image.open(BytesIO(data))
+    # Для JPEG декодер сразу уменьшает изображение в 2/4/8 раз,
+    # если нужная ширина это позволяет. draft() вызывается до декодирования,
+    # то есть до exif_transpose, поэтому у повернутых на 90° снимков
+    # (Orientation 5-8) будущая ширина — это текущая высота.
+    if widths:
+        width, height = image.size
+        if image.getexif().get(ORIENTATION_TAG) in ROTATED_ORIENTATIONS:
+            image.draft('RGB', (width * max(widths) // height or 1, max(widths)))
+        else:
+            image.draft('RGB', (max(widths), height * max(widths) // width or 1))
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = []
+    for width in target_widths(image.width, widths):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else \
+            image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            buffer = BytesIO()
+            # JPEG не поддерживает прозрачность.
+            frame = resized.convert('RGB') if fmt == 'jpeg' else resized
+            frame.save(buffer, fmt.upper(), quality=quality)
+            variants.append((width, height, fmt, buffer.getvalue()))
+
+    height = max(1, round(image.height * placeholder_width / image.width))
+    placeholder = image.resize((placeholder_width, height), Image.Resampling.BILINEAR)
+    buffer = BytesIO()
+    placeholder.save(buffer, 'WEBP', quality=30)
+    return variants, buffer.getvalue()
+
+
+def derivative_name(name, width, fmt, content):
+    # Хеш содержимого в имени: новый файл всегда получает новый URL,
+    # поэтому производные можно кэшировать как immutable.
+    root, _ = os.path.splitext(name)
+    digest = hashlib.sha1(content).hexdigest()[:10]
+    return f'{root}_{width}w_{digest}.{fmt}'
+
+
+def delete_derivatives(storage, derivatives):
+    for variant in derivatives.get('variants', []):
+        try:
+            storage.delete(variant['name'])
+        except OSError:
+            logger.warning('Не удалось удалить %s', variant['name'])
+
+
+def generate_derivatives(model, pk, name):
+    """
+    Генерирует производные для изображения `name` объекта `pk` и сохраняет
+    их рядом с оригиналом. Результат записывается в image_derivatives, только
+    если изображение объекта за это время не поменялось.
+    """
+    options = get_derivative_settings()
+    field = model._meta.get_field('image')
+    storage = field.storage
+    formats = supported_formats(options['FORMATS'])
+
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+
+    args = (data, options['WIDTHS'], formats, options['QUALITY'], options['PLACEHOLDER_WIDTH'])
+    pool = get_process_pool(options)
+    if pool is not None:
+        variants, placeholder = pool.submit(render_derivatives, *args).result()
+    else:
+        variants, placeholder = render_derivatives(*args)
+
+    stored = []
+    for width, height, fmt, content in variants:
+        target = derivative_name(name, width, fmt, content)
+        if not storage.exists(target):
+            target = storage.save(target, ContentFile(content))
+        stored.append({
+            'name': target,
+            'width': width,
+            'height': height,
+            'format': fmt,
+        })
+
+    derivatives = {
+        'source': name,
+        'variants': stored,
+        'placeholder': 'data:image/webp;base64,' + base64.b64encode(placeholder).decode('ascii'),
+    }
+    # update() не вызывает post_save: ни сигнал производных, ни
+    # переиндексацию поиска здесь запускать не нужно, а кэш ответов
+    # сбрасывает CachedQuerySet.update(). Запись идет через очередь
+    # писателя, как и остальные записи в базу.
+    updated = run_write(lambda: model._default_manager.filter(pk=pk, image=name)
+                        .update(image_derivatives=derivatives),
+                        using=router.db_for_write(model))
+    if not updated:
+        # Изображение заменили или объект удалили, пока шло кодирование.
+        delete_derivatives(storage, derivatives)
+    return derivatives
+
+
+_executor = None
+_process_pool = None
+_lock = threading.Lock()
+
+
+def get_executor(options):
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=options['WORKERS'], thread_name_prefix='image-derivatives')
+        return _executor
+
+
+def get_process_pool(options):
+    global _process_pool
+    if not options['PROCESSES']:
+        return None
+    with _lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=options['PROCESSES'])
+        return _process_pool
+
+
+def _run_job(model, pk, name):
+    close_old_connections()
+    try:
+        generate_derivatives(model, pk, name)
+    except Exception:
+        logger.exception('Не удалось сгенерировать производные для %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(model, pk, name):
+    """
+    Ставит генерацию в очередь после коммита транзакции, чтобы запрос
+    загрузки не ждал кодирования.
+    """
+    options = get_derivative_settings()
+    if not options['ASYNC']:
+        transaction.on_commit(lambda: generate_derivatives(model, pk, name))
+        return
+    transaction.on_commit(lambda: get_executor(options).submit(_run_job, model, pk, name))
+
+
+def variant_urls(instance):
+    """
+    Представление производных для API: заглушка и список вариантов
+    с URL из хранилища.
+    """
+    derivatives = instance.image_derivatives or {}
+    if not instance.image or derivatives.get('source') != instance.image.name:
+        return {'placeholder': None, 'variants': []}
+    storage = instance.image.storage
+    return {
+        'placeholder': derivatives.get('placeholder'),
+        'variants': [
+            {
+                'url': storage.url(variant['name']),
+                'width': variant['width'],
+                'height': variant['height'],
+                'format': variant['format'],
+                'content_type': CONTENT_TYPES.get(variant['format']),
+            }
+            for variant in derivatives.get('variants', [])
+        ],
+    }
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from restapi.benchmark import Benchmark, compare, default_endpoints, dump
+
+
+class Command(BaseCommand):
+    help = ('Измеряет задержку (p50/p95/p99), пропускную способность, число '
+            'SQL-запросов и память для всех REST и GraphQL эндпоинтов и '
+            'выводит отчет в JSON. Данные можно подготовить командой seed_data.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Запросов на эндпоинт.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--max-seconds', type=float, default=10,
+                            help='Ограничение времени на эндпоинт.')
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кэш ответов API перед каждым запросом.')
+        parser.add_argument('--no-fast-read', action='store_true',
+                            help='Сериализовать list/retrieve обычным путем DRF, '
+                                 'без restapi/fastpath.py.')
+        parser.add_argument('--filter', default='',
+                            help='Только эндпоинты, в имени которых есть эта строка.')
+        parser.add_argument('--output', help='Файл для отчета (по умолчанию stdout).')
+        parser.add_argument('--compare', help='Предыдущий отчет для сравнения.')
+
+    def handle(self, *args, **options):
+        endpoints = [endpoint for endpoint in default_endpoints()
+                     if options['filter'] in endpoint.name]
+
+        def progress(name, result):
+            self.stderr.write(
+                f"{name}: p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, "
+                f"{result['queries_per_request']} SQL")
+
+        benchmark = Benchmark(
+            requests=options['requests'],
+            warmup=options['warmup'],
+            max_seconds=options['max_seconds'],
+            cold=options['cold'],
+        )
+        with override_settings(FAST_READ={'ENABLED': not options['no_fast_read']}):
+            report = benchmark.run(endpoints, progress if options['verbosity'] > 1 else None)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(dump(report))
+        else:
+            self.stdout.write(dump(report))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                previous = json.load(file)
+            for name, metrics in sorted(compare(previous, report).items()):
+                changes = ', '.join(f'{metric} {old} -> {new} ({delta:+}%)'
+                                    for metric, (old, new, delta) in metrics.items())
+                self.stderr.write(f'{name}: {changes}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from restapi.models import Upload
+from restapi.uploads import discard, expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет незавершенные загрузки, которые давно не продолжались.'
+
+    def handle(self, *args, **options):
+        uploads = list(expired_uploads(Upload.objects.all()))
+        for upload in uploads:
+            discard(upload)
+            upload.delete()
+        self.stdout.write(f'Удалено загрузок: {len(uploads)}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from restapi.images import generate_derivatives
+from restapi.models import Project
+
+
+class Command(BaseCommand):
+    help = 'Генерирует производные изображений проектов, у которых их еще нет.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Перегенерировать производные для всех изображений.')
+
+    def handle(self, *args, **options):
+        projects = Project.objects.exclude(image='').exclude(image__isnull=True) \
+            .only('pk', 'image', 'image_derivatives')
+        done = 0
+        for project in projects.iterator():
+            if not options['all'] and \
+                    project.image_derivatives.get('source') == project.image.name:
+                continue
+            try:
+                generate_derivatives(Project, project.pk, project.image.name)
+            except (OSError, ValueError) as error:
+                self.stderr.write(f'{project.pk}: {error}')
+                continue
+            done += 1
+        self.stdout.write(f'Обработано изображений: {done}')
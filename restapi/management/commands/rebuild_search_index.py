@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from restapi.search import SEARCH_INDEXES, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс (например, после bulk_create или импорта).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options['database'])
+        if backend is None:
+            raise CommandError('Полнотекстовый поиск не поддерживается этой базой данных.')
+        for label in SEARCH_INDEXES:
+            model = apps.get_model(label)
+            backend.create(model)
+            backend.rebuild(model)
+            self.stdout.write(f'{label}: {model._default_manager.count()}')
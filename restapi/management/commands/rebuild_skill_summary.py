@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from restapi.models import SkillCategorySummary
+from restapi.summaries import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сводку навыков по категориям (например, после импорта или изменения SKILL_SUMMARY_TOP).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        rebuild(options['database'])
+        count = SkillCategorySummary.objects.using(options['database']).count()
+        self.stdout.write(f'Категорий в сводке: {count}')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from restapi.seed import DEFAULT_SIZES, flush, seed
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу детерминированными синтетическими данными для '
+            'нагрузочных тестов (например, --contacts 1000000 --projects 10000).')
+
+    def add_arguments(self, parser):
+        for name, size in DEFAULT_SIZES.items():
+            parser.add_argument(f'--{name}', type=int, default=size,
+                                help=f'Сколько создать (по умолчанию {size}).')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Одинаковый seed дает одинаковые данные.')
+        parser.add_argument('--text-size', type=int, default=200,
+                            help='Примерное число слов в описании проекта.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Сначала удалить существующие данные этих таблиц.')
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            flush(options['database'])
+
+        def progress(name, done, total):
+            if options['verbosity'] > 1 or done == total:
+                self.stdout.write(f'{name}: {done}/{total}')
+
+        seed(
+            sizes={name: options[name] for name in DEFAULT_SIZES},
+            seed=options['seed'],
+            text_size=options['text_size'],
+            batch_size=options['batch_size'],
+            using=options['database'],
+            progress=progress,
+        )
@@ -0,0 +1,210 @@
+import hashlib
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_media_settings():
+    options = {
+        # Подключать ли маршрут MEDIA_URL (Portfolio/urls.py). Выключается,
+        # если MEDIA_ROOT отдает веб-сервер.
+        'ENABLED': True,
+        # 'django' — отдавать файлы самим Django (FileResponse, sendfile
+        # у WSGI-сервера); 'x-accel' — через X-Accel-Redirect (nginx);
+        # 'x-sendfile' — через X-Sendfile (Apache mod_xsendfile, lighttpd).
+        'BACKEND': 'django',
+        # internal location nginx, под которым доступен MEDIA_ROOT.
+        'ACCEL_PREFIX': '/protected-media/',
+        # Файлы, имена которых меняются вместе с содержимым (производные
+        # изображений с хешем в имени), кэшируются как immutable.
+        'IMMUTABLE_PATTERNS': [r'_\d+w_[0-9a-f]{10}\.\w+$'],
+        # Остальные файлы кэшируются на MAX_AGE секунд и перепроверяются по ETag.
+        'MAX_AGE': 3600,
+        # Размер блока при потоковой отдаче под ASGI.
+        'CHUNK_SIZE': 256 * 1024,
+    }
+    options.update(getattr(settings, 'MEDIA_SERVING', {}))
+    return options
+
+
+def file_etag(st):
+    # Строгий ETag: меняется вместе с размером, временем изменения и inode.
+    digest = hashlib.md5(f'{st.st_ino}-{st.st_size}-{st.st_mtime_ns}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range с одним диапазоном. Возвращает (start, end)
+    включительно, None, если заголовок нужно игнорировать (отдается весь
+    файл), или False, если диапазон невыполним (416).
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-500: последние 500 байт.
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    header = request.META.get('HTTP_IF_RANGE')
+    if not header:
+        return True
+    if header.startswith('"') or header.startswith('W/'):
+        # If-Range допускает только строгое сравнение.
+        return header == etag
+    date = parse_http_date_safe(header)
+    return date is not None and int(mtime) <= date
+
+
+class RangeFile:
+    """
+    Ограничивает чтение файла диапазоном [start, start + length).
+
+    fileno() и позиция в файле сохраняются, поэтому WSGI-сервер с
+    wsgi.file_wrapper (gunicorn) отправляет диапазон через os.sendfile,
+    не копируя данные в Python.
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+async def aread_range(path, start, length, chunk_size):
+    # Под ASGI Django вычитывает синхронный FileResponse в память целиком,
+    # поэтому файл читается блоками асинхронным генератором.
+    file = await sync_to_async(open)(path, 'rb')
+    try:
+        await sync_to_async(file.seek)(start)
+        while length > 0:
+            data = await sync_to_async(file.read)(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Отдает файл из MEDIA_ROOT с поддержкой Range (206/416), If-Range,
+    строгих ETag и Cache-Control. Может передать отправку фронт-прокси
+    через X-Accel-Redirect или X-Sendfile.
+    """
+    options = get_media_settings()
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(fullpath)
+    except (OSError, ValueError, SuspiciousFileOperation):
+        raise Http404('Файл не найден.')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('Файл не найден.')
+
+    etag = file_etag(st)
+    last_modified = int(st.st_mtime)
+    content_type, _ = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _file_response(request, path, fullpath, st, etag, content_type, options)
+    else:
+        response['ETag'] = etag
+
+    response['Last-Modified'] = http_date(last_modified)
+    if any(re.search(pattern, path) for pattern in options['IMMUTABLE_PATTERNS']):
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = f'public, max-age={options["MAX_AGE"]}'
+    return response
+
+
+def _file_response(request, path, fullpath, st, etag, content_type, options):
+    backend = options['BACKEND']
+    if backend == 'x-accel':
+        # nginx сам обработает Range и отдаст файл из internal location.
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = options['ACCEL_PREFIX'] + quote(path)
+        response['ETag'] = etag
+        return response
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = fullpath
+        response['ETag'] = etag
+        return response
+
+    size = st.st_size
+    byte_range = None
+    if request.method == 'GET' and if_range_matches(request, etag, st.st_mtime):
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            aread_range(fullpath, start, length, options['CHUNK_SIZE']),
+            content_type=content_type)
+    else:
+        response = FileResponse(RangeFile(open(fullpath, 'rb'), start, length),
+                                content_type=content_type)
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    return response
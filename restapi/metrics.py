@@ -0,0 +1,439 @@
+"""
+Метрики в текстовом формате Prometheus (/metrics).
+
+Значения хранятся в хранилище процесса: без METRICS['DIR'] — в словаре,
+с ним — в файле <pid>.db, отображенном в память через mmap. Каждый процесс
+пишет только в свой файл, поэтому блокировки между процессами не нужны;
+/metrics читает файлы всех воркеров и складывает значения. Счетчики и
+гистограммы завершившихся воркеров остаются в сумме, gauge учитываются
+только у живых процессов.
+
+/metrics доступен с Bearer-токеном METRICS['TOKEN'], сотрудникам и
+адресам из METRICS['ALLOWED_IPS']; остальным отвечает 401.
+
+Ключ значения — строка образца в формате экспозиции, например
+portfolio_requests_total{method="GET",route="skill-list",status="200"}.
+"""
+
+import glob
+import hashlib
+import hmac
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_metrics_settings():
+    options = {
+        'DIR': None,
+        'BUCKETS': DEFAULT_BUCKETS,
+        # Сколько разных имен операций GraphQL попадает в метки, остальные — "other".
+        'MAX_OPERATIONS': 100,
+        'TOKEN': None,
+        # Адреса сборщиков, которым токен не нужен.
+        'ALLOWED_IPS': (),
+    }
+    options.update(getattr(settings, 'METRICS', {}))
+    return options
+
+
+class MemoryStore:
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, items):
+        with self.lock:
+            for key, amount in items:
+                self.values[key] = self.values.get(key, 0.0) + amount
+
+    def read(self):
+        with self.lock:
+            return dict(self.values)
+
+
+class MmapStore:
+    """
+    Файл значений одного процесса. Формат: 8 байт заголовка (занятый
+    размер), затем записи: длина ключа (4 байта), ключ UTF-8, выровненный
+    до 8 байт, значение double. Новая запись сначала пишется целиком, а
+    затем сдвигается размер в заголовке, поэтому читатель из другого
+    процесса не видит недописанных записей.
+
+    Существующий файл с тем же PID остался от завершившегося процесса:
+    его счетчики сохраняются, а gauge из reset обнуляются, иначе новый
+    процесс унаследовал бы, например, незавершенные запросы.
+    """
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, path, reset=()):
+        self.path = path
+        self.lock = threading.Lock()
+        self.positions = {}
+        self.file = open(path, 'a+b')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < self.INITIAL_SIZE:
+            self.file.truncate(self.INITIAL_SIZE)
+            size = self.INITIAL_SIZE
+        self.map = mmap.mmap(self.file.fileno(), size)
+        self.used = struct.unpack_from('q', self.map, 0)[0] or 8
+        for key, _, position in parse_entries(self.map, self.used):
+            self.positions[key] = position
+            if key.partition('{')[0] in reset:
+                struct.pack_into('d', self.map, position, 0.0)
+
+    def add(self, items):
+        with self.lock:
+            for key, amount in items:
+                position = self.positions.get(key)
+                if position is None:
+                    position = self.append(key)
+                value = struct.unpack_from('d', self.map, position)[0]
+                struct.pack_into('d', self.map, position, value + amount)
+
+    def append(self, key):
+        encoded = key.encode('utf-8')
+        padded = len(encoded) + (-(4 + len(encoded)) % 8)
+        entry = struct.pack(f'i{padded}sd', len(encoded), encoded, 0.0)
+        if self.used + len(entry) > len(self.map):
+            size = len(self.map)
+            while self.used + len(entry) > size:
+                size *= 2
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), size)
+        self.map[self.used:self.used + len(entry)] = entry
+        position = self.used + len(entry) - 8
+        self.used += len(entry)
+        struct.pack_into('q', self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def read(self):
+        with self.lock:
+            return {key: value for key, value, _ in parse_entries(self.map, self.used)}
+
+
+def parse_entries(data, used):
+    position = 8
+    while position < used:
+        length = struct.unpack_from('i', data, position)[0]
+        key = bytes(data[position + 4:position + 4 + length]).decode('utf-8')
+        position += 4 + length + (-(4 + length) % 8)
+        yield key, struct.unpack_from('d', data, position)[0], position
+        position += 8
+
+
+def read_file(path):
+    with open(path, 'rb') as values_file:
+        data = values_file.read()
+    if len(data) < 8:
+        return {}
+    used = min(struct.unpack_from('q', data, 0)[0], len(data))
+    return {key: value for key, value, _ in parse_entries(data, used)}
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+_store = None
+_store_key = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    # После fork воркер открывает собственный файл.
+    global _store, _store_key
+    directory = get_metrics_settings()['DIR']
+    key = (os.getpid(), str(directory) if directory else None)
+    with _store_lock:
+        if _store is None or _store_key != key:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+                gauges = {metric.name for metric in METRICS if metric.kind == 'gauge'}
+                _store = MmapStore(os.path.join(directory, f'{os.getpid()}.db'), reset=gauges)
+            else:
+                _store = MemoryStore()
+            _store_key = key
+        return _store
+
+
+def collect(gauges=()):
+    """
+    Значения всех процессов: счетчики складываются, gauge из gauges
+    берутся только у живых процессов.
+    """
+    directory = get_metrics_settings()['DIR']
+    if not directory:
+        return get_store().read()
+    get_store()
+    totals = {}
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        name = os.path.splitext(os.path.basename(path))[0]
+        alive = not name.isdigit() or pid_alive(int(name))
+        for key, value in read_file(path).items():
+            if not alive and key.partition('{')[0] in gauges:
+                continue
+            totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def sample_key(name, labels):
+    if not labels:
+        return name
+    pairs = ','.join(f'{label}="{escape(value)}"' for label, value in sorted(labels.items()))
+    return f'{name}{{{pairs}}}'
+
+
+class Metric:
+    def __init__(self, name, kind, documentation):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+
+
+class Counter(Metric):
+    def __init__(self, name, documentation):
+        super().__init__(name, 'counter', documentation)
+
+    def samples(self, amount=1, **labels):
+        return [(sample_key(self.name, labels), amount)]
+
+    def inc(self, amount=1, **labels):
+        get_store().add(self.samples(amount, **labels))
+
+
+class Gauge(Metric):
+    def __init__(self, name, documentation):
+        super().__init__(name, 'gauge', documentation)
+
+    def inc(self, amount=1, **labels):
+        get_store().add([(sample_key(self.name, labels), amount)])
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """
+    В хранилище пишется счетчик одной корзины, в которую попало значение;
+    накопительные значения le считаются при экспорте.
+    """
+
+    def __init__(self, name, documentation):
+        super().__init__(name, 'histogram', documentation)
+
+    def samples(self, value, **labels):
+        buckets = get_metrics_settings()['BUCKETS']
+        bucket = next((repr(float(bound)) for bound in buckets if value <= bound), '+Inf')
+        # le — последняя метка, при экспорте она отделяется от остальных.
+        pairs = _labels(sample_key(self.name, labels))
+        pairs = ','.join(filter(None, [pairs, f'le="{bucket}"']))
+        return [
+            (f'{self.name}_bucket{{{pairs}}}', 1),
+            (sample_key(f'{self.name}_sum', labels), value),
+            (sample_key(f'{self.name}_count', labels), 1),
+        ]
+
+    def observe(self, value, **labels):
+        get_store().add(self.samples(value, **labels))
+
+
+REQUESTS = Counter('portfolio_requests_total', 'Число обработанных запросов.')
+ERRORS = Counter('portfolio_request_errors_total', 'Число ответов 5xx.')
+LATENCY = Histogram('portfolio_request_duration_seconds', 'Время обработки запроса.')
+IN_FLIGHT = Gauge('portfolio_requests_in_flight', 'Запросы, обрабатываемые сейчас.')
+DB_QUERIES = Counter('portfolio_db_queries_total', 'Число SQL-запросов.')
+DB_DURATION = Counter('portfolio_db_query_duration_seconds_total',
+                      'Суммарное время SQL-запросов.')
+CACHE_REQUESTS = Counter('portfolio_cache_requests_total', 'Обращения к кэшам по результату.')
+
+METRICS = [REQUESTS, ERRORS, LATENCY, IN_FLIGHT, DB_QUERIES, DB_DURATION, CACHE_REQUESTS]
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache=cache, result='hit' if hit else 'miss')
+
+
+_operations = set()
+_operations_key = None
+_operations_lock = threading.Lock()
+
+
+def operation_label(name):
+    # Имена операций присылает клиент; число разных меток ограничено.
+    name = name or 'anonymous'
+    global _operations_key
+    directory = get_metrics_settings()['DIR']
+    with _operations_lock:
+        if _operations_key != directory:
+            _operations.clear()
+            _operations_key = directory
+        if name in _operations:
+            return name
+        if admit_operation(name, directory):
+            _operations.add(name)
+            return name
+    return 'other'
+
+
+def admit_operation(name, directory):
+    """
+    Решает, получит ли новое имя операции свою метку. С METRICS['DIR']
+    список имен общий для воркеров: файл на имя в каталоге operations,
+    иначе каждый процесс допускал бы свои MAX_OPERATIONS имен. Одновременно
+    добавленные воркерами имена могут превысить лимит на число воркеров.
+    """
+    limit = get_metrics_settings()['MAX_OPERATIONS']
+    if not directory:
+        return len(_operations) < limit
+    operations = os.path.join(directory, 'operations')
+    path = os.path.join(operations, hashlib.sha1(name.encode('utf-8')).hexdigest())
+    if os.path.exists(path):
+        return True
+    os.makedirs(operations, exist_ok=True)
+    if len(os.listdir(operations)) >= limit:
+        return False
+    with open(path, 'w', encoding='utf-8') as name_file:
+        name_file.write(name)
+    return True
+
+
+def route_label(request):
+    """
+    Имя маршрута роутера (skill-list), шаблон пути (graphql/) или
+    "unmatched": путь запроса в метку не попадает.
+    """
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    if match.url_name:
+        return match.view_name
+    return match.route or 'unmatched'
+
+
+def record_request(request, response, duration, timings=None):
+    route = route_label(request)
+    operation = getattr(request, 'graphql_operation', None)
+    if operation is not None:
+        route = f'{route} {operation}'
+    labels = {'route': route, 'method': request.method}
+    items = REQUESTS.samples(status=response.status_code, **labels)
+    items += LATENCY.samples(duration, **labels)
+    if response.status_code >= 500:
+        items += ERRORS.samples(**labels)
+    if timings is not None:
+        items += DB_QUERIES.samples(timings.queries, route=route)
+        items += DB_DURATION.samples(timings.sql, route=route)
+    get_store().add(items)
+
+
+def record_queries(route, queries, seconds):
+    """
+    SQL, выполненный после ответа middleware (потоковая выдача
+    restapi/streaming.py), добавляется к метрикам маршрута.
+    """
+    get_store().add(DB_QUERIES.samples(queries, route=route)
+                    + DB_DURATION.samples(seconds, route=route))
+
+
+def _labels(key):
+    # Строка меток образца без фигурных скобок.
+    return key.partition('{')[2][:-1]
+
+
+def export():
+    values = collect(gauges={IN_FLIGHT.name})
+    lines = []
+    for metric in METRICS:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if metric.kind == 'histogram':
+            lines += _export_histogram(metric, values)
+        else:
+            lines += [f'{key} {value!r}' for key, value in sorted(values.items())
+                      if key.partition('{')[0] == metric.name]
+
+    # Доля попаданий считается здесь же, чтобы ее было видно без PromQL.
+    ratio = 'portfolio_cache_hit_ratio'
+    lines.append(f'# HELP {ratio} Доля попаданий в кэш с запуска.')
+    lines.append(f'# TYPE {ratio} gauge')
+    caches = {}
+    for key, value in values.items():
+        if key.startswith(CACHE_REQUESTS.name + '{'):
+            cache = key.split('cache="', 1)[1].split('"', 1)[0]
+            hits, total = caches.get(cache, (0.0, 0.0))
+            caches[cache] = (hits + (value if 'result="hit"' in key else 0.0), total + value)
+    for cache, (hits, total) in sorted(caches.items()):
+        if total:
+            lines.append(f'{sample_key(ratio, {"cache": cache})} {hits / total!r}')
+    return '\n'.join(lines) + '\n'
+
+
+def _export_histogram(metric, values):
+    series = {}
+    for key, value in values.items():
+        name = key.partition('{')[0]
+        if name == f'{metric.name}_bucket':
+            labels, _, bound = _labels(key).rpartition('le="')
+            bound = bound[:-1]
+            counts = series.setdefault(labels.rstrip(','), {}).setdefault('buckets', {})
+            counts[float('inf') if bound == '+Inf' else float(bound)] = value
+        elif name in (f'{metric.name}_sum', f'{metric.name}_count'):
+            series.setdefault(_labels(key), {})[name.rsplit('_', 1)[1]] = value
+
+    lines = []
+    bounds = {float(bound) for bound in get_metrics_settings()['BUCKETS']} | {float('inf')}
+    for labels, data in sorted(series.items()):
+        counts = data.get('buckets', {})
+        cumulative = 0.0
+        for bound in sorted(bounds | set(counts)):
+            cumulative += counts.get(bound, 0.0)
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            pairs = ','.join(filter(None, [labels, f'le="{le}"']))
+            lines.append(f'{metric.name}_bucket{{{pairs}}} {cumulative!r}')
+        suffix = f'{{{labels}}}' if labels else ''
+        lines.append(f'{metric.name}_sum{suffix} {data.get("sum", 0.0)!r}')
+        lines.append(f'{metric.name}_count{suffix} {data.get("count", 0.0)!r}')
+    return lines
+
+
+def metrics_allowed(request):
+    options = get_metrics_settings()
+    token = options['TOKEN']
+    # compare_digest принимает str только из ASCII, поэтому сравниваются байты.
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                     f'Bearer {token}'.encode()):
+        return True
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    return request.META.get('REMOTE_ADDR') in options['ALLOWED_IPS']
+
+
+def metrics_view(request):
+    """
+    Метрики всех воркеров в формате Prometheus. Нужен заголовок
+    Authorization: Bearer <METRICS['TOKEN']>, вход сотрудника или адрес
+    из METRICS['ALLOWED_IPS'].
+    """
+    if not metrics_allowed(request):
+        return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    return HttpResponse(export(), content_type='text/plain; version=0.0.4; charset=utf-8')
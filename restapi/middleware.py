@@ -0,0 +1,264 @@
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from rest_framework.views import APIView
+
+from . import metrics, profiling, timing
+from .db.routers import begin_request, end_request
+from .writes import arun_write, run_write
+
+logger = logging.getLogger('restapi.timing')
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes для PrimaryReplicaRouter: состояние маршрутизации
+    создается на каждый запрос, а после записи клиент получает cookie,
+    с которой его чтения еще REPLICA_PIN_SECONDS секунд идут в основную базу,
+    пока реплики догоняют ее.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'REPLICA_PIN_COOKIE', 'db_pin')
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 15)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = begin_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self.process_response(response, state)
+
+    async def __acall__(self, request):
+        token = begin_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = end_request(token)
+        return self.process_response(response, state)
+
+    def process_response(self, response, state):
+        if state.wrote and self.pin_seconds:
+            response.set_cookie(self.cookie_name, '1', max_age=self.pin_seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def is_api_view(view_func):
+    # DRF (и async адаптер restapi) или представление, отмеченное timed_view.
+    view_class = getattr(view_func, 'cls', None)
+    return getattr(view_func, 'request_timing', False) or (
+        isinstance(view_class, type) and issubclass(view_class, APIView))
+
+
+class ServerTimingMiddleware:
+    """
+    Для запросов к DRF ViewSet и GraphQL добавляет заголовок Server-Timing
+    (SQL, serialize, graphql, render, total) и пишет строку в журнал
+    restapi.timing. Если одна форма SQL повторилась не меньше
+    NPLUSONE_THRESHOLD раз, в журнал пишется предупреждение о N+1.
+    Настройки — REQUEST_TIMING в settings.py.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = timing.get_timing_settings()
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = timing.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = timing.end_request(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        token = timing.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = timing.end_request(token)
+        return self.finish(request, response, timings)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if is_api_view(view_func):
+            timing.enable()
+
+    def process_template_response(self, request, response):
+        # Ответ DRF рендерится после этого вызова, время рендера — до
+        # последнего post-render callback.
+        timings = timing.get_timings()
+        if timings is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: timings.add('render', time.perf_counter() - started))
+        return response
+
+    def finish(self, request, response, timings):
+        if not timings.enabled:
+            return response
+        timings.finish()
+        if self.options['HEADER']:
+            response['Server-Timing'] = timing.server_timing(timings)
+        if self.options['LOG']:
+            spans = ' '.join(f'{name}={seconds * 1000:.1f}ms'
+                             for name, seconds in timings.spans.items())
+            logger.info('%s %s %s total=%.1fms db=%.1fms queries=%s %s',
+                        request.method, request.path, response.status_code,
+                        timings.total * 1000, timings.sql * 1000, timings.queries, spans,
+                        extra={'timing': {
+                            'method': request.method,
+                            'path': request.path,
+                            'status': response.status_code,
+                            'total_ms': round(timings.total * 1000, 3),
+                            'db_ms': round(timings.sql * 1000, 3),
+                            'queries': timings.queries,
+                            **{f'{name}_ms': round(seconds * 1000, 3)
+                               for name, seconds in timings.spans.items()},
+                        }})
+        for shape, count in timings.repeated_queries(self.options['NPLUSONE_THRESHOLD']):
+            logger.warning('Возможный N+1: %s %s выполнил %s раз запрос %s',
+                           request.method, request.path, count, shape,
+                           extra={'timing': {'path': request.path, 'count': count,
+                                             'sql': shape}})
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Статистический профиль запросов к DRF и GraphQL (restapi/profiling.py).
+    Сотрудник включает его заголовком X-Profile или параметром ?profile,
+    остальные запросы профилируются с вероятностью SAMPLE_RATE. Номер
+    сохраненного профиля возвращается в заголовке X-Profile-Id.
+
+    Стоит перед ReplicaPinningMiddleware: сохранение профиля — служебная
+    запись, она не должна закреплять чтения клиента за основной базой.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.options = profiling.get_profiling_settings()
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler = self.stop(request)
+        if sampler is None:
+            return response
+        profile = run_write(lambda: profiling.store_profile(
+            profiling.build_profile(request, response, sampler, request.profile_reason),
+            self.options['KEEP']))
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    async def __acall__(self, request):
+        # Async представления выполняются в потоке event loop, синхронные —
+        # в потоке sync_to_async, в котором вызывается process_view.
+        request.profile_loop_thread = threading.get_ident()
+        try:
+            response = await self.get_response(request)
+        finally:
+            sampler = self.stop(request)
+        if sampler is None:
+            return response
+        profile = await arun_write(lambda: profiling.store_profile(
+            profiling.build_profile(request, response, sampler, request.profile_reason),
+            self.options['KEEP']))
+        response['X-Profile-Id'] = str(profile.pk)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not is_api_view(view_func):
+            return
+        reason = profiling.profile_reason(request, self.options)
+        if reason is None:
+            return
+        thread_id = threading.get_ident()
+        if iscoroutinefunction(view_func):
+            thread_id = getattr(request, 'profile_loop_thread', thread_id)
+        request.profile_reason = reason
+        request.profiler = profiling.Sampler(thread_id, self.options['INTERVAL'])
+        request.profiler.start()
+
+    def stop(self, request):
+        sampler = getattr(request, 'profiler', None)
+        if sampler is not None:
+            sampler.stop()
+        return sampler
+
+
+class MetricsMiddleware:
+    """
+    Счетчики, гистограммы времени и число запросов в обработке для /metrics
+    (restapi/metrics.py). SQL берется из счетчиков ServerTimingMiddleware,
+    если она выше в MIDDLEWARE, иначе считается здесь.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        token = self.begin()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = self.end(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        token = self.begin()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = self.end(token)
+        return self.finish(request, response, time.perf_counter() - started, timings)
+
+    def begin(self):
+        metrics.IN_FLIGHT.inc()
+        return timing.begin_request() if timing.current() is None else None
+
+    def end(self, token):
+        metrics.IN_FLIGHT.dec()
+        timings = timing.current()
+        if token is not None:
+            timing.end_request(token)
+        return timings
+
+    def finish(self, request, response, duration, timings):
+        metrics.record_request(request, response, duration, timings)
+        return response
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:20
+
+from django.db import migrations
+
+# Индекс описан здесь, а не берется из restapi.search: миграция должна
+# создавать ту же схему, что и в момент ее написания.
+SEARCH_INDEXES = {
+    'restapi_project': ['title', 'description', 'technologies_used'],
+    'restapi_contact': ['name', 'email', 'subject', 'message'],
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+    for table, fields in SEARCH_INDEXES.items():
+        columns = ', '.join(qn(field) for field in fields)
+        values = ', '.join(f"COALESCE({qn(field)}, '')" for field in fields)
+        if connection.vendor == 'sqlite':
+            index = qn(f'{table}_fts')
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {index} '
+                f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')")
+            schema_editor.execute(f'DELETE FROM {index}')
+            schema_editor.execute(
+                f'INSERT INTO {index} (rowid, {columns}) SELECT id, {values} FROM {qn(table)}')
+        elif connection.vendor == 'postgresql':
+            index = qn(f'{table}_search')
+            schema_editor.execute(
+                f'CREATE TABLE IF NOT EXISTS {index} ('
+                f'id bigint PRIMARY KEY REFERENCES {qn(table)} (id) '
+                f'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                f'document tsvector NOT NULL)')
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS {qn(table + "_search_gin")} '
+                f'ON {index} USING GIN (document)')
+            schema_editor.execute(
+                f"INSERT INTO {index} (id, document) "
+                f"SELECT id, to_tsvector('simple', concat_ws(' ', {values})) FROM {qn(table)} "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document")
+
+
+def drop_search_indexes(apps, schema_editor):
+    connection = schema_editor.connection
+    suffix = {'sqlite': '_fts', 'postgresql': '_search'}.get(connection.vendor)
+    if suffix is None:
+        return
+    for table in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(table + suffix)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
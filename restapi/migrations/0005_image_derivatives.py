@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0004_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Производные изображения'),
+        ),
+    ]
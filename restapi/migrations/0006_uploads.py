@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0005_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('length', models.PositiveBigIntegerField(verbose_name='Размер (байт)')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='Загружено (байт)')),
+                ('sha256', models.CharField(blank=True, help_text='Контрольная сумма всего файла, проверяется при завершении', max_length=64, verbose_name='SHA-256')),
+                ('completed', models.BooleanField(default=False, verbose_name='Завершена')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата последнего обновления')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='uploads', to='restapi.project', verbose_name='Проект')),
+            ],
+            options={
+                'verbose_name': 'Загрузка',
+                'verbose_name_plural': 'Загрузки',
+            },
+        ),
+    ]
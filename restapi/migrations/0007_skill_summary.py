@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:37
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max
+
+
+def build_summary(apps, schema_editor):
+    Skill = apps.get_model('restapi', 'Skill')
+    SkillCategorySummary = apps.get_model('restapi', 'SkillCategorySummary')
+    using = schema_editor.connection.alias
+    skills = Skill.objects.using(using)
+    rows = skills.values('category').order_by().annotate(
+        count=Count('pk'), average_percentage=Avg('percentage'), max_percentage=Max('percentage'))
+    SkillCategorySummary.objects.using(using).bulk_create([
+        SkillCategorySummary(
+            category=row['category'],
+            count=row['count'],
+            average_percentage=round(row['average_percentage'], 2),
+            max_percentage=row['max_percentage'],
+            top_skills=list(
+                skills.filter(category=row['category'])
+                .order_by('-percentage', 'name', 'pk')
+                .values('id', 'name', 'percentage')[:5]),
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0006_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SkillCategorySummary',
+            fields=[
+                ('category', models.CharField(choices=[('programming', 'Программирование'), ('design', 'Дизайн'), ('languages', 'Языки программирования'), ('database', 'Базы данных'), ('frameworks', 'Фреймворки'), ('tools', 'Инструменты разработки'), ('soft_skills', 'Soft Skills'), ('web', 'Веб-разработка'), ('mobile', 'Мобильная разработка'), ('cloud', 'Облачные технологии'), ('testing', 'Тестирование и QA'), ('analytics', 'Аналитика данных'), ('machine_learning', 'Машинное обучение и искусственный интеллект'), ('security', 'Информационная безопасность'), ('networking', 'Сетевые технологии'), ('graphics', 'Графический дизайн'), ('audio_video', 'Аудио и видео производство'), ('project_management', 'Управление проектами'), ('communication', 'Коммуникационные навыки'), ('leadership', 'Лидерство'), ('entrepreneurship', 'Предпринимательство'), ('data_science', 'Наука о данных'), ('automation', 'Автоматизация процессов'), ('devops', 'DevOps'), ('blockchain', 'Блокчейн технологии'), ('robotics', 'Робототехника')], max_length=30, primary_key=True, serialize=False, verbose_name='Категория')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество навыков')),
+                ('average_percentage', models.FloatField(default=0, verbose_name='Средний процент')),
+                ('max_percentage', models.PositiveSmallIntegerField(default=0, verbose_name='Максимальный процент')),
+                ('top_skills', models.JSONField(blank=True, default=list, verbose_name='Лучшие навыки')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата последнего обновления')),
+            ],
+            options={
+                'verbose_name': 'Сводка навыков',
+                'verbose_name_plural': 'Сводки навыков',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['category', '-percentage'], name='skill_category_percentage_idx'),
+        ),
+        migrations.RunPython(build_summary, migrations.RunPython.noop),
+    ]
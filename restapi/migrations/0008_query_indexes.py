@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0007_skill_summary'),
+    ]
+
+    operations = [
+        # Заменен индексом skill_category_top_idx (category, -percentage, name):
+        # лучшие навыки категории сортируются еще и по имени (restapi/summaries.py).
+        migrations.RemoveIndex(
+            model_name='skill',
+            name='skill_category_percentage_idx',
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['created_at', 'id'], name='contact_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['updated_at'], name='contact_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricing',
+            index=models.Index(fields=['rate_per_hour'], name='pricing_rate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricing',
+            index=models.Index(fields=['updated_at'], name='pricing_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['updated_at'], name='project_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['category', 'name'], name='skill_category_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['category', '-percentage', 'name'], name='skill_category_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='skill',
+            index=models.Index(fields=['updated_at'], name='skill_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='upload',
+            index=models.Index(condition=models.Q(('completed', False)), fields=['updated_at'], name='upload_pending_idx'),
+        ),
+    ]
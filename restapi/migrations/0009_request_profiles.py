@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('route', models.CharField(max_length=255, verbose_name='Маршрут')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.CharField(max_length=500, verbose_name='Путь')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Статус ответа')),
+                ('reason', models.CharField(choices=[('requested', 'По запросу'), ('sampled', 'Выборка')], max_length=20, verbose_name='Причина')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность (мс)')),
+                ('interval_ms', models.FloatField(verbose_name='Интервал снимков (мс)')),
+                ('samples', models.PositiveIntegerField(verbose_name='Снимков стека')),
+                ('stacks', models.TextField(blank=True, verbose_name='Стеки (collapsed)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-id'],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:05
+
+from django.db import migrations
+
+# Поля индекса PostgreSQL и их веса (A, B, C, D) в порядке
+# restapi.search.SEARCH_INDEXES: по весам поиск ограничивается полями
+# представления. Индекс FTS5 в SQLite хранит поля отдельными колонками
+# и не меняется.
+SEARCH_INDEXES = {
+    'restapi_project': ['title', 'description', 'technologies_used'],
+    'restapi_contact': ['name', 'email', 'subject', 'message'],
+}
+
+
+def weight_documents(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    qn = connection.ops.quote_name
+    for table, fields in SEARCH_INDEXES.items():
+        document = ' || '.join(
+            f"setweight(to_tsvector('simple', COALESCE(source.{qn(field)}, '')), '{weight}')"
+            for weight, field in zip('ABCD', fields))
+        schema_editor.execute(
+            f'UPDATE {qn(table + "_search")} AS search SET document = {document} '
+            f'FROM {qn(table)} AS source WHERE source.id = search.id')
+
+
+def reset_weights(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_INDEXES:
+        # D — вес по умолчанию, как у документов без весов.
+        schema_editor.execute(
+            f"UPDATE {connection.ops.quote_name(table + '_search')} "
+            f"SET document = setweight(document, 'D')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restapi', '0009_request_profiles'),
+    ]
+
+    operations = [
+        migrations.RunPython(weight_documents, reset_weights),
+    ]
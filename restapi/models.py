@@ -1,6 +1,30 @@
-from django.db import models
+import uuid
+
+from django.contrib import admin
+from django.db import models, transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+from .cache import invalidate
+
+
+class CachedQuerySet(models.QuerySet):
+    """
+    QuerySet моделей с кэшем ответов API. update() не отправляет сигналы,
+    поэтому поколения кэша (а с ними ETag и Last-Modified,
+    restapi/conditional.py) для списка и затронутых объектов меняются
+    здесь, после коммита.
+    """
+
+    def update(self, **kwargs):
+        self._for_write = True
+        using = self.db
+        pks = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        if rows:
+            model = self.model
+            transaction.on_commit(lambda: invalidate(model, pks), using=using, robust=True)
+        return rows
+
 
 class Me(models.Model):
     first_name = models.CharField(max_length=50, verbose_name="Имя", 
@@ -38,6 +62,10 @@ class Me(models.Model):
     work_history = models.TextField(verbose_name="Трудовая история", blank=True, null=True, 
         help_text="Укажите ваш опыт работы")
 
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = CachedQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -53,6 +81,9 @@ class Project(models.Model):
     
     image = models.ImageField(upload_to="project_image/", blank=True, null=True, 
         help_text="Загрузите изображение проекта, если есть")
+    # Заполняется в фоне после загрузки (см. restapi/images.py).
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False,
+        verbose_name="Производные изображения")
     
     title = models.CharField(max_length=150, verbose_name="Название проекта", 
         help_text="Введите название вашего проекта")
@@ -76,6 +107,8 @@ class Project(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = CachedQuerySet.as_manager()
     
     def __str__(self):
         return self.title
@@ -84,6 +117,11 @@ class Project(models.Model):
         verbose_name = "Проект"
         verbose_name_plural = "Проекты"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="project_created_id_idx"),
+            # Сортировка ?ordering=updated_at.
+            models.Index(fields=["updated_at"], name="project_updated_idx"),
+        ]
         
 
 class Skill(models.Model):
@@ -126,14 +164,75 @@ class Skill(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(100)],
         verbose_name="Проценты", help_text="Введите ваш уровень в процентах")
 
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = CachedQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Категория на момент загрузки: если ее изменят, сводку нужно
+        # пересчитать и для прежней категории (restapi/summaries.py).
+        instance._loaded_category = instance.__dict__.get('category')
+        return instance
+
     def __str__(self):
         return f"{self.name} ({self.percentage}%)"
 
     class Meta:
         verbose_name = "Навык"
         verbose_name_plural = "Навыки"
+        indexes = [
+            # Фильтр и сортировка в SkillAdmin.
+            models.Index(fields=['category', 'name'], name='skill_category_name_idx'),
+            # Лучшие навыки категории для SkillCategorySummary.
+            models.Index(fields=['category', '-percentage', 'name'], name='skill_category_top_idx'),
+            models.Index(fields=['updated_at'], name='skill_updated_idx'),
+        ]
+
+
+class SkillCategorySummary(models.Model):
+    """
+    Сводка навыков по категории. Пересчитывается для затронутых категорий
+    после сохранения и удаления навыков (restapi/summaries.py), поэтому
+    чтение сводки не сканирует таблицу навыков.
+    """
+    category = models.CharField(max_length=30, primary_key=True,
+        choices=Skill.CATEGORY_CHOICES, verbose_name="Категория")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество навыков")
+    average_percentage = models.FloatField(default=0, verbose_name="Средний процент")
+    max_percentage = models.PositiveSmallIntegerField(default=0, verbose_name="Максимальный процент")
+    top_skills = models.JSONField(default=list, blank=True, verbose_name="Лучшие навыки")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = CachedQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.get_category_display()} ({self.count})"
+
+    class Meta:
+        verbose_name = "Сводка навыков"
+        verbose_name_plural = "Сводки навыков"
         
 
+class PricingQuerySet(CachedQuerySet):
+    def with_total_cost(self):
+        """
+        Добавляет _total_cost, вычисленную в SQL: по ней можно сортировать
+        и фильтровать, не загружая все строки в Python. Свойство
+        Pricing.total_cost отдает это значение, если оно есть.
+        """
+        return self.annotate(_total_cost=models.ExpressionWrapper(
+            models.F('rate_per_hour') * models.F('estimated_hours'),
+            output_field=models.DecimalField(max_digits=15, decimal_places=4)))
+
+
+class PricingManager(models.Manager.from_queryset(PricingQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().with_total_cost()
+
+
 class Pricing(models.Model):
     service = models.CharField(max_length=100, verbose_name="Услуга", 
         help_text="Введите название услуги")
@@ -147,18 +246,43 @@ class Pricing(models.Model):
         verbose_name="Оценочное время работы (часы)", 
         help_text="Оцените, сколько часов требуется для выполнения услуги")
 
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = PricingManager()
+
+    @property
+    @admin.display(description="Общая стоимость ($)", ordering="_total_cost")
     def total_cost(self):
         """
-        Метод total_cost вычисляет общую стоимость на основе почасовой ставки и расчетных часов.
+        Общая стоимость на основе почасовой ставки и расчетных часов.
+        У объектов из менеджера берется аннотация _total_cost (PricingQuerySet).
         """
+        total_cost = self.__dict__.get('_total_cost')
+        if total_cost is not None:
+            return total_cost
+        if self.rate_per_hour is None or self.estimated_hours is None:
+            return None
         return self.rate_per_hour * self.estimated_hours
-    
+
+    def __setattr__(self, name, value):
+        # Аннотация посчитана по ставке и часам из базы: после их изменения
+        # у объекта стоимость считается заново.
+        if name in ('rate_per_hour', 'estimated_hours'):
+            self.__dict__.pop('_total_cost', None)
+        super().__setattr__(name, value)
+
     def __str__(self):
-        return f"{self.service} - ${self.total_cost()}"
+        return f"{self.service} - ${self.total_cost}"
 
     class Meta:
         verbose_name = "Расценка"
         verbose_name_plural = "Расценки"
+        indexes = [
+            # Фильтр по ставке в PricingAdmin.
+            models.Index(fields=["rate_per_hour"], name="pricing_rate_idx"),
+            models.Index(fields=["updated_at"], name="pricing_updated_idx"),
+        ]
     
     
 class Contact(models.Model):
@@ -174,6 +298,9 @@ class Contact(models.Model):
         help_text="Оставьте ваше сообщение")
     
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    objects = CachedQuerySet.as_manager()
     is_read = models.BooleanField(default=False, verbose_name="Прочитано", 
         help_text="Отметьте, если сообщение было прочитано")
 
@@ -182,4 +309,81 @@ class Contact(models.Model):
 
     class Meta:
         verbose_name = "Контакт"
-        verbose_name_plural = "Контакты"
\ No newline at end of file
+        verbose_name_plural = "Контакты"
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="contact_created_id_idx"),
+            # Непрочитанные сообщения, новые сверху (фильтр в ContactAdmin).
+            # Частичный индекс: filter(is_read=False) компилируется в
+            # NOT is_read, а такое условие SQLite сопоставляет только
+            # с тем же условием индекса, не с колонкой is_read.
+            models.Index(fields=["created_at", "id"], condition=models.Q(is_read=False),
+                         name="contact_unread_idx"),
+            models.Index(fields=["updated_at"], name="contact_updated_idx"),
+        ]
+
+class Upload(models.Model):
+    """
+    Возобновляемая загрузка файла проекта (см. restapi/uploads.py).
+    Фактическое смещение — размер частичного файла на диске,
+    поле offset хранит его копию для списков и админки.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    length = models.PositiveBigIntegerField(verbose_name="Размер (байт)")
+    offset = models.PositiveBigIntegerField(default=0, verbose_name="Загружено (байт)")
+    sha256 = models.CharField(max_length=64, blank=True, verbose_name="SHA-256",
+        help_text="Контрольная сумма всего файла, проверяется при завершении")
+
+    project = models.ForeignKey(Project, on_delete=models.SET_NULL, blank=True, null=True,
+        related_name="uploads", verbose_name="Проект")
+    completed = models.BooleanField(default=False, verbose_name="Завершена")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата последнего обновления")
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.length})"
+
+    class Meta:
+        verbose_name = "Загрузка"
+        verbose_name_plural = "Загрузки"
+        indexes = [
+            # Поиск брошенных загрузок (expired_uploads, clean_uploads);
+            # частичный по той же причине, что и contact_unread_idx.
+            models.Index(fields=["updated_at"], condition=models.Q(completed=False),
+                         name="upload_pending_idx"),
+        ]
+
+
+class RequestProfile(models.Model):
+    """
+    Статистический профиль одного запроса (см. restapi/profiling.py).
+    stacks — collapsed stacks: "кадр;кадр;...;кадр число_снимков" в строке.
+    """
+    REASON_REQUESTED = "requested"
+    REASON_SAMPLED = "sampled"
+    REASON_CHOICES = [
+        (REASON_REQUESTED, "По запросу"),
+        (REASON_SAMPLED, "Выборка"),
+    ]
+
+    route = models.CharField(max_length=255, verbose_name="Маршрут")
+    method = models.CharField(max_length=10, verbose_name="Метод")
+    path = models.CharField(max_length=500, verbose_name="Путь")
+    status = models.PositiveSmallIntegerField(verbose_name="Статус ответа")
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name="Причина")
+    duration_ms = models.FloatField(verbose_name="Длительность (мс)")
+    interval_ms = models.FloatField(verbose_name="Интервал снимков (мс)")
+    samples = models.PositiveIntegerField(verbose_name="Снимков стека")
+    stacks = models.TextField(blank=True, verbose_name="Стеки (collapsed)")
+
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    def __str__(self):
+        return f"{self.method} {self.route} ({self.duration_ms:.0f} мс)"
+
+    class Meta:
+        verbose_name = "Профиль запроса"
+        verbose_name_plural = "Профили запросов"
+        ordering = ["-id"]
@@ -0,0 +1,252 @@
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация по составному стабильному ключу.
+
+    Вместо OFFSET страница выбирается условием вида
+    (created_at, id) < (:created_at, :id), поэтому время выборки не зависит
+    от того, насколько далеко клиент пролистал таблицу.
+
+    Пагинация включается только по запросу: если в query string нет ни
+    `cursor`, ни `page_size`, список отдается целиком, как и раньше.
+    Порядок берется из OrderingFilter (`?ordering=` или `ordering`
+    представления), к нему всегда добавляется первичный ключ, чтобы
+    позиция в курсоре была уникальной.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-pk',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([item async for item in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Возвращает ленивый queryset страницы (на одну запись больше
+        page_size) или None, если клиент не запрашивал пагинацию.
+        """
+        params = request.query_params
+        if (self.cursor_query_param not in params
+                and self.page_size_query_param not in params):
+            return None
+
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_keyset_ordering(request, queryset, view)
+        self.model = queryset.model
+        # Имена колонок строк values_list(); None для экземпляров модели.
+        self.row_fields = queryset._fields
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        position = self.cursor['position'] if self.cursor else None
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [self._invert(order) for order in ordering]
+
+        queryset = queryset.order_by(*[self._order_expression(order) for order in ordering])
+        if position is not None:
+            try:
+                queryset = queryset.filter(self._after(ordering, position))
+            except (ValueError, TypeError, ValidationError):
+                # Значение позиции не приводится к типу поля.
+                raise NotFound(self.invalid_cursor_message)
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        position = self.cursor['position'] if self.cursor else None
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_keyset_ordering(self, request, queryset, view):
+        """
+        Возвращает порядок сортировки, дополненный первичным ключом.
+        """
+        ordering_filters = [
+            filter_cls for filter_cls in getattr(view, 'filter_backends', [])
+            if hasattr(filter_cls, 'get_ordering')
+        ]
+        ordering = None
+        if ordering_filters:
+            ordering = ordering_filters[0]().get_ordering(request, queryset, view)
+        if not ordering:
+            ordering = self.ordering
+        if isinstance(ordering, str):
+            ordering = [ordering]
+
+        ordering = [order.replace('pk', queryset.model._meta.pk.name)
+                    if order.lstrip('-') == 'pk' else order
+                    for order in ordering]
+        for order in ordering:
+            if '__' in order:
+                raise NotFound('Курсорная пагинация не поддерживает сортировку по связанным полям.')
+
+        pk_name = queryset.model._meta.pk.name
+        if pk_name not in [order.lstrip('-') for order in ordering]:
+            descending = ordering[-1].startswith('-')
+            ordering = list(ordering) + [('-' if descending else '') + pk_name]
+        return list(ordering)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Пустая обратная страница: продолжаем с той же позиции вперед.
+            return self.encode_cursor({'position': self.cursor['position'], 'reverse': False})
+        return self.encode_cursor({
+            'position': self._get_keyset_position(self.page[-1]),
+            'reverse': False,
+        })
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return self.encode_cursor({'position': self.cursor['position'], 'reverse': True})
+        return self.encode_cursor({
+            'position': self._get_keyset_position(self.page[0]),
+            'reverse': True,
+        })
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            tokens = json.loads(urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            position = tokens['p']
+            reverse = bool(tokens.get('r', 0))
+            ordering = tokens['o']
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Курсор от другой сортировки (клиент сменил ?ordering=) указывал бы
+        # позицию в чужом ключе.
+        if ordering != self.ordering_token():
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {'position': position, 'reverse': reverse}
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': cursor['position'], 'o': self.ordering_token()}
+        if cursor['reverse']:
+            tokens['r'] = 1
+        payload = json.dumps(tokens, default=str, separators=(',', ':'))
+        encoded = urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def ordering_token(self):
+        return hashlib.md5(','.join(self.ordering).encode('utf-8')).hexdigest()[:8]
+
+    def _get_keyset_position(self, instance):
+        position = []
+        for order in self.ordering:
+            name = order.lstrip('-')
+            field = self._model_field(name)
+            if isinstance(instance, dict):
+                value = instance[name]
+            elif isinstance(instance, tuple):
+                # Строка values_list() (restapi/fastpath.py).
+                value = instance[self.row_fields.index(name)]
+            elif field is None:
+                # Аннотация queryset, например search_rank или _total_cost.
+                value = getattr(instance, name)
+            else:
+                value = field.value_from_object(instance)
+            position.append(None if value is None else str(value))
+        return position
+
+    def _model_field(self, name):
+        try:
+            return self.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def _is_nullable(self, name):
+        field = self._model_field(name)
+        return field is not None and field.null
+
+    def _order_expression(self, order):
+        # NULL всегда считается наименьшим значением, чтобы порядок
+        # совпадал на SQLite и PostgreSQL и условие курсора было однозначным.
+        name = order.lstrip('-')
+        if not self._is_nullable(name):
+            return order
+        if order.startswith('-'):
+            return F(name).desc(nulls_last=True)
+        return F(name).asc(nulls_first=True)
+
+    def _after(self, ordering, position):
+        """
+        Строит условие "строго после позиции" для составного ключа:
+        (k1 > p1) OR (k1 = p1 AND k2 > p2) OR ...
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for order, value in zip(ordering, position):
+            name = order.lstrip('-')
+            descending = order.startswith('-')
+            condition |= equal & self._beyond(name, value, descending)
+            if value is None:
+                equal &= Q(**{name + '__isnull': True})
+            else:
+                equal &= Q(**{name: value})
+        return condition
+
+    def _beyond(self, name, value, descending):
+        nullable = self._is_nullable(name)
+        if value is None:
+            if descending:
+                return Q(pk__in=[])
+            return Q(**{name + '__isnull': False})
+        if descending:
+            beyond = Q(**{name + '__lt': value})
+            if nullable:
+                beyond |= Q(**{name + '__isnull': True})
+            return beyond
+        return Q(**{name + '__gt': value})
+
+    @staticmethod
+    def _invert(order):
+        return order[1:] if order.startswith('-') else '-' + order
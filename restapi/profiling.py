@@ -0,0 +1,159 @@
+"""
+Статистический профилировщик запросов (ProfilingMiddleware в
+restapi/middleware.py).
+
+Пока запрос выполняется, отдельный поток каждые INTERVAL секунд снимает
+стек потока запроса через sys._current_frames() и считает одинаковые стеки.
+Результат хранится в формате collapsed stacks ("a;b;c 12"), который
+понимают flamegraph.pl, speedscope и inferno; последние KEEP профилей
+лежат в RequestProfile и скачиваются из админки.
+"""
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+from .models import RequestProfile
+
+
+def get_profiling_settings():
+    options = {
+        # Доля запросов, профилируемых без запроса пользователя (0.0–1.0).
+        'SAMPLE_RATE': 0.0,
+        'INTERVAL': 0.005,
+        'KEEP': 100,
+        'HEADER': 'X-Profile',
+        'QUERY_PARAM': 'profile',
+    }
+    options.update(getattr(settings, 'REQUEST_PROFILING', {}))
+    return options
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """
+    Снимает стеки одного потока, пока не вызван stop().
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.started = None
+        self.duration = None
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self.run, name='request-profiler', daemon=True)
+        self._thread.start()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+                self.samples += 1
+            # Ссылка на кадр держит его локальные переменные.
+            del frame
+
+    def stop(self):
+        self.duration = time.perf_counter() - self.started
+        self._stopped.set()
+        self._thread.join()
+
+
+def profile_reason(request, options):
+    """
+    Причина профилировать запрос или None. Явный запрос через заголовок
+    или параметр доступен только сотрудникам.
+    """
+    header = options['HEADER']
+    param = options['QUERY_PARAM']
+    requested = (header and request.headers.get(header)) or (param and param in request.GET)
+    if requested:
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_staff:
+            return RequestProfile.REASON_REQUESTED
+    rate = options['SAMPLE_RATE']
+    if rate and random.random() < rate:
+        return RequestProfile.REASON_SAMPLED
+    return None
+
+
+def route_name(request):
+    # Имя маршрута роутера (skill-detail) или шаблон пути (graphql/).
+    match = request.resolver_match
+    if match is None:
+        return request.path
+    if match.url_name:
+        return match.view_name
+    return match.route or request.path
+
+
+def build_profile(request, response, sampler, reason):
+    return RequestProfile(
+        route=route_name(request)[:255],
+        method=request.method,
+        path=request.get_full_path()[:500],
+        status=response.status_code,
+        reason=reason,
+        duration_ms=round(sampler.duration * 1000, 3),
+        interval_ms=round(sampler.interval * 1000, 3),
+        samples=sampler.samples,
+        stacks=format_stacks(sampler.stacks),
+    )
+
+
+def store_profile(profile, keep):
+    """
+    Сохраняет профиль и удаляет самые старые сверх keep.
+    Выполняется через run_write/arun_write.
+    """
+    profile.save()
+    oldest = RequestProfile.objects.order_by('-pk').values_list('pk', flat=True)[keep:keep + 1]
+    RequestProfile.objects.filter(pk__lte=oldest).delete()
+    return profile
+
+
+def format_stacks(stacks, prefix=''):
+    return ''.join(f'{prefix}{stack} {count}\n' for stack, count in stacks.most_common())
+
+
+def parse_stacks(text):
+    stacks = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+def merge_by_route(profiles):
+    """
+    Collapsed stacks нескольких профилей, сложенные по маршрутам: корнем
+    каждого стека становится "МЕТОД маршрут".
+    """
+    routes = {}
+    for profile in profiles:
+        key = f'{profile.method} {profile.route}'
+        routes.setdefault(key, Counter()).update(parse_stacks(profile.stacks))
+    return ''.join(format_stacks(stacks, f'{key};') for key, stacks in sorted(routes.items()))
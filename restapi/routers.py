@@ -0,0 +1,18 @@
+from rest_framework import routers
+
+
+class BulkRouter(routers.DefaultRouter):
+    """
+    DefaultRouter, который дополнительно направляет PATCH и DELETE
+    на коллекцию (`/skills/`) в bulk_update и bulk_destroy представления.
+    """
+    routes = [
+        route._replace(mapping={
+            **route.mapping,
+            'patch': 'bulk_update',
+            'delete': 'bulk_destroy',
+        })
+        if isinstance(route, routers.Route) and route.mapping.get('get') == 'list'
+        else route
+        for route in routers.DefaultRouter.routes
+    ]
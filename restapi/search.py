@@ -0,0 +1,251 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+
+# Поля, которые попадают в полнотекстовый индекс каждой модели.
+# Сюда входят и поля поиска API, и поля поиска админки. В PostgreSQL
+# у каждого поля свой вес, поэтому полей не больше четырех.
+SEARCH_INDEXES = {
+    'restapi.Project': ['title', 'description', 'technologies_used'],
+    'restapi.Contact': ['name', 'email', 'subject', 'message'],
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_terms(search_term):
+    """
+    Разбивает строку поиска на слова. Каждое слово ищется как префикс,
+    поэтому поиск работает и во время набора текста.
+    """
+    return TOKEN_RE.findall(search_term or '')
+
+
+def indexed_fields(model):
+    return SEARCH_INDEXES.get(model._meta.label)
+
+
+class BaseSearchBackend:
+    """
+    Базовый класс бэкенда полнотекстового поиска.
+
+    Индекс хранится в отдельной таблице рядом с таблицей модели и
+    обновляется сигналами post_save/post_delete.
+    """
+    vendor = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def index_table(self, model):
+        raise NotImplementedError
+
+    def create(self, model):
+        raise NotImplementedError
+
+    def drop(self, model):
+        raise NotImplementedError
+
+    def index(self, instance):
+        raise NotImplementedError
+
+    def remove(self, model, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.qn(self.index_table(model))} WHERE {self.rowid} = %s', [pk])
+
+    def search(self, queryset, search_term, fields=None):
+        """
+        Возвращает queryset, отфильтрованный по индексу и аннотированный
+        полем `search_rank` (чем больше, тем релевантнее). fields
+        ограничивает поиск частью индексированных полей.
+        """
+        raise NotImplementedError
+
+    def join_index(self, queryset, condition, params, rank, rank_params):
+        """
+        Присоединяет таблицу индекса к запросу: условие поиска и ранг
+        считаются в одном проходе, без коррелированного подзапроса на
+        каждую строку. Аннотация (а не extra select) нужна, чтобы по
+        search_rank работали сортировка и условие курсора.
+        """
+        model = queryset.model
+        table = self.qn(self.index_table(model))
+        pk_column = f'{self.qn(model._meta.db_table)}.{self.qn(model._meta.pk.column)}'
+        return queryset.extra(
+            tables=[self.index_table(model)],
+            where=[f'{table}.{self.rowid} = {pk_column}', condition],
+            params=params,
+        ).annotate(search_rank=RawSQL(rank, rank_params, output_field=FloatField()))
+
+    def rebuild(self, model):
+        fields = indexed_fields(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.qn(self.index_table(model))}')
+        for instance in model._default_manager.using(self.connection.alias).only(*fields).iterator():
+            self.index(instance)
+
+    def qn(self, name):
+        return self.connection.ops.quote_name(name)
+
+    def document(self, instance):
+        return [getattr(instance, field) or '' for field in indexed_fields(type(instance))]
+
+
+class SQLiteFTS5Backend(BaseSearchBackend):
+    vendor = 'sqlite'
+    rowid = 'rowid'
+
+    def index_table(self, model):
+        return f'{model._meta.db_table}_fts'
+
+    def create(self, model):
+        columns = ', '.join(self.qn(field) for field in indexed_fields(model))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.qn(self.index_table(model))} '
+                f"USING fts5({columns}, tokenize='unicode61 remove_diacritics 2')"
+            )
+
+    def drop(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.qn(self.index_table(model))}')
+
+    def index(self, instance):
+        model = type(instance)
+        table = self.qn(self.index_table(model))
+        fields = indexed_fields(model)
+        columns = ', '.join(self.qn(field) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+            cursor.execute(
+                f'INSERT INTO {table} (rowid, {columns}) VALUES (%s, {placeholders})',
+                [instance.pk] + self.document(instance),
+            )
+
+    def search(self, queryset, search_term, fields=None):
+        terms = search_terms(search_term)
+        if not terms:
+            return queryset
+        match = ' '.join('"%s"*' % term for term in terms)
+        if fields:
+            # Фильтр колонок FTS5: {name email}: (...).
+            match = '{%s}: (%s)' % (' '.join(fields), match)
+        table = self.qn(self.index_table(queryset.model))
+        return self.join_index(queryset, f'{table} MATCH %s', [match], f'-bm25({table})', [])
+
+
+class PostgreSQLSearchBackend(BaseSearchBackend):
+    vendor = 'postgresql'
+    rowid = 'id'
+    config = 'simple'
+    weights = 'ABCD'
+
+    def index_table(self, model):
+        return f'{model._meta.db_table}_search'
+
+    def create(self, model):
+        table = self.index_table(model)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.qn(table)} ('
+                f'id bigint PRIMARY KEY REFERENCES {self.qn(model._meta.db_table)} '
+                f'({self.qn(model._meta.pk.column)}) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+                f'document tsvector NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {self.qn(table + "_gin")} '
+                f'ON {self.qn(table)} USING GIN (document)'
+            )
+
+    def drop(self, model):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.qn(self.index_table(model))}')
+
+    def document_sql(self, fields):
+        # Каждое поле получает свой вес (A, B, C, D), по нему поиск
+        # ограничивается полями представления.
+        return ' || '.join(
+            f"setweight(to_tsvector(%s, %s), '{weight}')"
+            for weight, _ in zip(self.weights, fields)
+        )
+
+    def index(self, instance):
+        model = type(instance)
+        table = self.qn(self.index_table(model))
+        fields = indexed_fields(model)
+        params = [instance.pk]
+        for value in self.document(instance):
+            params += [self.config, value]
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (id, document) VALUES (%s, {self.document_sql(fields)}) '
+                f'ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document',
+                params,
+            )
+
+    def search(self, queryset, search_term, fields=None):
+        terms = search_terms(search_term)
+        if not terms:
+            return queryset
+        weights = ''
+        if fields:
+            indexed = indexed_fields(queryset.model)
+            weights = ''.join(self.weights[indexed.index(field)] for field in fields)
+        query = ' & '.join("'%s':*%s" % (term, weights) for term in terms)
+        table = self.qn(self.index_table(queryset.model))
+        return self.join_index(
+            queryset,
+            f'{table}.document @@ to_tsquery(%s, %s)', [self.config, query],
+            f'ts_rank({table}.document, to_tsquery(%s, %s))', [self.config, query],
+        )
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgreSQLSearchBackend,
+}
+
+
+def get_search_backend(using='default'):
+    """
+    Возвращает бэкенд поиска для подключения `using` или None, если
+    СУБД не поддерживается (тогда используется обычный icontains-поиск).
+    Бэкенд можно переопределить настройкой SEARCH_BACKEND.
+    """
+    connection = connections[using]
+    backend_path = getattr(settings, 'SEARCH_BACKEND', None)
+    if backend_path:
+        return import_string(backend_path)(connection)
+    backend_class = SEARCH_BACKENDS.get(connection.vendor)
+    if backend_class is None:
+        return None
+    return backend_class(connection)
+
+
+def full_text_search(queryset, search_term, fields=None):
+    """
+    Полнотекстовый поиск по queryset, при заданных fields — только по этим
+    полям. Возвращает None, если для модели (или одного из полей) нет
+    индекса и вызывающий код должен использовать обычный поиск.
+    """
+    indexed = indexed_fields(queryset.model)
+    if indexed is None:
+        return None
+    if fields is not None:
+        # Поля с префиксами SearchFilter (^, =, @, $) индекс не заменяет.
+        if not fields or not set(fields) <= set(indexed):
+            return None
+        fields = [field for field in indexed if field in fields]
+        if fields == indexed:
+            fields = None
+    backend = get_search_backend(queryset.db)
+    if backend is None:
+        return None
+    return backend.search(queryset, search_term, fields)
@@ -0,0 +1,184 @@
+"""
+Детерминированные синтетические данные для нагрузочных тестов
+(manage.py seed_data, restapi/benchmark.py).
+
+Одинаковые seed и размеры дают одинаковое содержимое таблиц. Строки
+создаются через bulk_create пакетами в отдельных транзакциях, поэтому
+память не растет с размером набора; сигналы bulk_create не отправляет,
+и полнотекстовый индекс, сводка навыков и кэш ответов обновляются здесь же.
+"""
+
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.color import no_style
+from django.db import connections, transaction
+
+from .cache import invalidate
+from .models import Contact, Me, Pricing, Project, Skill, SkillCategorySummary, Upload
+from .search import get_search_backend, indexed_fields
+from .summaries import rebuild as rebuild_skill_summary
+from .uploads import discard
+
+WORDS = (
+    'django python api sqlite postgres index cache query latency throughput '
+    'backend frontend design cloud docker kubernetes graphql rest schema '
+    'проект сайт приложение сервис разработка дизайн данные поиск клиент '
+    'сервер модуль интерфейс задача отчет платформа магазин портфолио '
+    'аналитика интеграция оптимизация тестирование безопасность мобильный'
+).split()
+
+DEFAULT_SIZES = {
+    'contacts': 1000,
+    'projects': 100,
+    'skills': 200,
+    'pricings': 50,
+}
+
+SEEDED_MODELS = [Contact, Project, Skill, SkillCategorySummary, Pricing, Me]
+
+
+def words(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def text(rng, size):
+    # Абзацы по 40-80 слов, всего примерно size слов.
+    paragraphs = []
+    while size > 0:
+        length = min(size, rng.randint(40, 80))
+        paragraphs.append(words(rng, length).capitalize() + '.')
+        size -= length
+    return '\n\n'.join(paragraphs)
+
+
+def make_contact(rng, i, text_size):
+    name = words(rng, 2).title()
+    return Contact(
+        name=name[:100],
+        email=f'user{i}@example.com',
+        subject=words(rng, rng.randint(3, 8))[:200],
+        message=text(rng, max(1, text_size // 4)),
+        is_read=rng.random() < 0.7,
+    )
+
+
+def make_project(rng, i, text_size):
+    start = date(2015, 1, 1) + timedelta(days=rng.randint(0, 3000))
+    return Project(
+        title=f'{words(rng, 3).title()} {i}'[:150],
+        description=text(rng, text_size),
+        start_data=start,
+        end_data=start + timedelta(days=rng.randint(10, 400)) if rng.random() < 0.8 else None,
+        url=f'https://example.com/projects/{i}/',
+        repository=f'https://github.com/example/project-{i}',
+        technologies_used=', '.join(rng.sample(WORDS[:20], 3)),
+    )
+
+
+def make_skill(rng, i, text_size):
+    category = rng.choice(Skill.CATEGORY_CHOICES)[0]
+    return Skill(category=category, name=f'{rng.choice(WORDS)} {i}'[:50],
+                 percentage=rng.randint(0, 100))
+
+
+def make_pricing(rng, i, text_size):
+    return Pricing(
+        service=f'{words(rng, 2).title()} {i}'[:100],
+        description=text(rng, max(1, text_size // 4)),
+        rate_per_hour=Decimal(rng.randint(1000, 20000)) / 100,
+        estimated_hours=Decimal(rng.randint(50, 20000)) / 100,
+    )
+
+
+FACTORIES = {
+    'contacts': (Contact, make_contact),
+    'projects': (Project, make_project),
+    'skills': (Skill, make_skill),
+    'pricings': (Pricing, make_pricing),
+}
+
+
+def flush(using='default'):
+    """
+    Очищает таблицы, которые заполняет seed(), вместе с зависимыми от них
+    загрузками и индексом поиска, удаляет файлы проектов и их производные
+    и сбрасывает счетчики первичных ключей, чтобы повторный seed дал те же pk.
+    """
+    connection = connections[using]
+    # Имена собираются до очистки, а файлы удаляются после нее: если
+    # очистка не удалась, строки продолжают ссылаться на существующие файлы.
+    storage = Project._meta.get_field('image').storage
+    names = []
+    for image, file, derivatives in Project.objects.using(using).values_list(
+            'image', 'file', 'image_derivatives').iterator():
+        names += [name for name in (image, file) if name]
+        names += [variant['name'] for variant in (derivatives or {}).get('variants', [])]
+    uploads = list(Upload.objects.using(using).all())
+
+    tables = [model._meta.db_table for model in SEEDED_MODELS + [Upload]]
+    # allow_cascade: TRUNCATE ... CASCADE в PostgreSQL, в SQLite —
+    # DELETE и из таблиц, которые ссылаются на очищаемые.
+    statements = connection.ops.sql_flush(no_style(), tables, reset_sequences=True,
+                                          allow_cascade=True)
+    connection.ops.execute_sql_flush(statements)
+
+    for name in names:
+        try:
+            storage.delete(name)
+        except OSError:
+            pass
+    for upload in uploads:
+        discard(upload)
+
+    backend = get_search_backend(using)
+    if backend is not None:
+        for model in SEEDED_MODELS:
+            if indexed_fields(model):
+                backend.create(model)
+                backend.rebuild(model)
+    # Строки удалены мимо сигналов, поэтому кэш ответов сбрасывается здесь.
+    for model in SEEDED_MODELS:
+        invalidate(model)
+
+
+def seed(sizes=None, seed=0, text_size=200, batch_size=2000, using='default', progress=None):
+    """
+    Создает sizes[name] объектов каждой модели из FACTORIES и одну запись Me.
+    Возвращает число созданных объектов по моделям.
+    """
+    sizes = {**DEFAULT_SIZES, **(sizes or {})}
+    backend = get_search_backend(using)
+    created = {}
+
+    if not Me.objects.using(using).exists():
+        Me.objects.using(using).create(
+            first_name='Иван', last_name='Иванов', email='me@example.com',
+            phone='+7 700 000 00 00', github='https://github.com/example',
+            education=text(random.Random(seed), 60), work_history=text(random.Random(seed + 1), 120))
+
+    for name, (model, factory) in FACTORIES.items():
+        # Свой генератор на модель: размер одной таблицы не меняет другие.
+        rng = random.Random(f'{seed}:{name}')
+        total = sizes.get(name, 0)
+        done = 0
+        while done < total:
+            count = min(batch_size, total - done)
+            objects = [factory(rng, done + i, text_size) for i in range(count)]
+            with transaction.atomic(using=using):
+                # SQLite 3.35+ и PostgreSQL возвращают pk созданных строк.
+                objects = model.objects.using(using).bulk_create(objects)
+                if backend is not None and indexed_fields(model):
+                    for instance in objects:
+                        backend.index(instance)
+            done += count
+            if progress is not None:
+                progress(name, done, total)
+        created[name] = total
+        invalidate(model)
+
+    rebuild_skill_summary(using)
+    invalidate(SkillCategorySummary)
+    invalidate(Me)
+    return created
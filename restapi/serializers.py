@@ -1,32 +1,81 @@
+import os
+
 from rest_framework import serializers
-from .models import Me, Project, Pricing, Skill, Contact
+from .images import variant_urls
+from .models import Me, Project, Pricing, Skill, SkillCategorySummary, Contact, Upload
+from .timing import TimedSerializerMixin
+from .uploads import get_upload_settings
 
 
-class MeSerializer(serializers.ModelSerializer):
+class MeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Me
         fields = '__all__'
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # Уменьшенные WebP/AVIF варианты image и inline-заглушка;
+    # пока фоновая генерация не закончилась, список пуст.
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = Project
-        fields = '__all__'
+        exclude = ['image_derivatives']
+
+    def get_image_variants(self, obj):
+        variants = variant_urls(obj)
+        # Как и для image, URL абсолютные, если в контексте есть запрос.
+        request = self.context.get('request')
+        if request is not None:
+            for variant in variants['variants']:
+                variant['url'] = request.build_absolute_uri(variant['url'])
+        return variants
         
 
-class PricingSerializer(serializers.ModelSerializer):
+class PricingSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    total_cost = serializers.DecimalField(max_digits=15, decimal_places=4, read_only=True)
+
     class Meta:
         model = Pricing
         fields = '__all__'
 
 
-class SkillSerializer(serializers.ModelSerializer):
+class SkillSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Skill
         fields = '__all__'
         
 
-class ContactSerializer(serializers.ModelSerializer):
+class SkillCategorySummarySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = SkillCategorySummary
+        fields = ['category', 'count', 'average_percentage', 'max_percentage',
+                  'top_skills', 'updated_at']
+
+
+class ContactSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class UploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    sha256 = serializers.RegexField(r'^[0-9a-fA-F]{64}$', required=False, allow_blank=True)
+
+    class Meta:
+        model = Upload
+        fields = ['id', 'filename', 'length', 'offset', 'sha256', 'project',
+                  'completed', 'created_at', 'updated_at']
+        read_only_fields = ['offset', 'completed']
+
+    def validate_filename(self, value):
+        value = os.path.basename(value.replace('\\', '/'))
+        if not value:
+            raise serializers.ValidationError('Некорректное имя файла.')
+        return value
+
+    def validate_length(self, value):
+        max_size = get_upload_settings()['MAX_SIZE']
+        if value > max_size:
+            raise serializers.ValidationError(f'Файл больше допустимых {max_size} байт.')
+        return value
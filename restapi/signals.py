@@ -0,0 +1,110 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+
+from .cache import invalidate
+from .db.routers import install_write_pinning
+from .images import delete_derivatives, schedule_derivatives
+from .search import SEARCH_INDEXES, get_search_backend
+from .summaries import mark_dirty
+from .timing import install_query_recorder
+
+CACHED_MODELS = ['restapi.Me', 'restapi.Project', 'restapi.Pricing',
+                 'restapi.Skill', 'restapi.Contact', 'restapi.SkillCategorySummary']
+
+
+# Индекс поиска и кэш ответов обновляются только после коммита: записи из
+# очереди (restapi/writes.py) коммитятся пачкой, и до коммита читатель
+# получил бы из базы старые строки, а в кэше — уже новое поколение.
+# robust=True: ошибка после коммита не должна выдавать запись за неудачную.
+
+def update_search_index(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        transaction.on_commit(lambda: backend.index(instance), using=using, robust=True)
+
+
+def remove_from_search_index(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        pk = instance.pk
+        transaction.on_commit(lambda: backend.remove(sender, pk), using=using, robust=True)
+
+
+def connect_search_signals():
+    for label in SEARCH_INDEXES:
+        model = apps.get_model(label)
+        post_save.connect(update_search_index, sender=model,
+                          dispatch_uid=f'search_index_save_{label}')
+        post_delete.connect(remove_from_search_index, sender=model,
+                            dispatch_uid=f'search_index_delete_{label}')
+
+
+def invalidate_response_cache(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate(sender, [pk]), using=using, robust=True)
+
+
+def connect_cache_signals():
+    for label in CACHED_MODELS:
+        model = apps.get_model(label)
+        post_save.connect(invalidate_response_cache, sender=model,
+                          dispatch_uid=f'response_cache_save_{label}')
+        post_delete.connect(invalidate_response_cache, sender=model,
+                            dispatch_uid=f'response_cache_delete_{label}')
+
+
+def update_image_derivatives(sender, instance, raw=False, **kwargs):
+    # Производные привязаны к имени исходного файла: если оно совпадает,
+    # изображение не менялось и кодировать заново нечего.
+    derivatives = instance.image_derivatives or {}
+    name = instance.image.name if instance.image else None
+    if raw or name == derivatives.get('source'):
+        return
+    if derivatives:
+        delete_derivatives(instance.image.storage, derivatives)
+        sender._default_manager.filter(pk=instance.pk).update(image_derivatives={})
+        instance.image_derivatives = {}
+    if name:
+        schedule_derivatives(sender, instance.pk, name)
+
+
+def remove_image_derivatives(sender, instance, **kwargs):
+    if instance.image_derivatives:
+        delete_derivatives(instance.image.storage, instance.image_derivatives)
+
+
+def connect_image_signals():
+    model = apps.get_model('restapi.Project')
+    post_save.connect(update_image_derivatives, sender=model,
+                      dispatch_uid='image_derivatives_save')
+    post_delete.connect(remove_image_derivatives, sender=model,
+                        dispatch_uid='image_derivatives_delete')
+
+
+def update_skill_summary(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    mark_dirty({instance.category, getattr(instance, '_loaded_category', None)}, using)
+    instance._loaded_category = instance.category
+
+
+def remove_from_skill_summary(sender, instance, using, **kwargs):
+    mark_dirty({instance.category}, using)
+
+
+def connect_summary_signals():
+    model = apps.get_model('restapi.Skill')
+    post_save.connect(update_skill_summary, sender=model,
+                      dispatch_uid='skill_summary_save')
+    post_delete.connect(remove_from_skill_summary, sender=model,
+                        dispatch_uid='skill_summary_delete')
+
+
+def connect_timing_signals():
+    connection_created.connect(install_query_recorder, dispatch_uid='request_timing_queries')
+
+
+def connect_routing_signals():
+    connection_created.connect(install_write_pinning, dispatch_uid='replica_write_pinning')
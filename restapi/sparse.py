@@ -0,0 +1,141 @@
+"""
+Разреженные наборы полей: ?fields=title,image,start_data отдает только
+перечисленные поля, ?omit=description — все, кроме перечисленных.
+
+Кроме ответа сужается и запрос к базе: queryset получает .only() с
+колонками, которые нужны оставшимся полям, поэтому большие TextField
+не читаются вовсе. Быстрый путь чтения (restapi/fastpath.py) так же
+выбирает из базы только нужные колонки.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import permissions
+from rest_framework.exceptions import ValidationError
+
+# Вычисляемые поля (свойства модели, SerializerMethodField, поля типов
+# GraphQL) и колонки, которые нужны для их значения.
+COMPUTED_FIELDS = {
+    'restapi.Project': {
+        'image_variants': ('image', 'image_derivatives'),
+        'image_placeholder': ('image', 'image_derivatives'),
+    },
+    'restapi.Pricing': {
+        'total_cost': ('rate_per_hour', 'estimated_hours'),
+    },
+}
+
+
+def field_columns(model, field):
+    """
+    Имена колонок модели, которые читает поле сериализатора, или None,
+    если это неизвестно (источник через связь, свойство без записи в
+    COMPUTED_FIELDS).
+    """
+    computed = COMPUTED_FIELDS.get(model._meta.label, {})
+    if field.field_name in computed and field.source in ('*', field.field_name):
+        return computed[field.field_name]
+    if len(field.source_attrs) != 1:
+        return None
+    try:
+        model_field = model._meta.get_field(field.source_attrs[0])
+    except FieldDoesNotExist:
+        return None
+    if not model_field.concrete or model_field.many_to_many:
+        return None
+    return (model_field.name,)
+
+
+def ordering_columns(queryset):
+    """
+    Колонки модели из ORDER BY: их читает курсорная пагинация. Для
+    сортировки по вычисляемому полю из COMPUTED_FIELDS это колонки, из
+    которых оно считается; аннотации (_total_cost) queryset выбирает сам.
+    """
+    computed = COMPUTED_FIELDS.get(queryset.model._meta.label, {})
+    names = []
+    for order in queryset.query.order_by:
+        if not isinstance(order, str):
+            continue
+        name = order.lstrip('-')
+        if name == 'pk':
+            name = queryset.model._meta.pk.name
+        if name in computed:
+            names.extend(computed[name])
+            continue
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if field.concrete and not field.many_to_many:
+            names.append(field.name)
+    return names
+
+
+def parse_field_list(value):
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()} or None
+
+
+class SparseFieldsMixin:
+    """
+    ?fields= / ?omit= для GET и HEAD. На запись сериализатор всегда
+    полный, иначе он перестал бы проверять обязательные поля.
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+
+    def get_sparse_fields(self):
+        """
+        Имена полей сериализатора, которые нужно отдать, или None, если
+        клиент набор не ограничивал.
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return None
+        requested = parse_field_list(request.query_params.get(self.fields_query_param))
+        omitted = parse_field_list(request.query_params.get(self.omit_query_param))
+        if requested is None and omitted is None:
+            return None
+
+        available = list(super().get_serializer().fields)
+        errors = {}
+        for param, names in ((self.fields_query_param, requested),
+                             (self.omit_query_param, omitted)):
+            unknown = sorted((names or set()) - set(available))
+            if unknown:
+                errors[param] = [f"Неизвестные поля: {', '.join(unknown)}."]
+        if errors:
+            raise ValidationError(errors)
+        return tuple(name for name in available
+                     if (requested is None or name in requested)
+                     and name not in (omitted or ()))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        names = self.get_sparse_fields()
+        if names is not None:
+            fields = getattr(serializer, 'child', serializer).fields
+            for name in list(fields):
+                if name not in names:
+                    del fields[name]
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_sparse_fields() is None:
+            return queryset
+        columns = set()
+        for field in self.get_serializer().fields.values():
+            needed = field_columns(queryset.model, field)
+            if needed is None:
+                # Без точного списка колонок .only() дал бы N+1 на
+                # отложенных полях, поэтому queryset остается как есть.
+                return queryset
+            columns.update(needed)
+        return queryset.only(*columns, *ordering_columns(queryset))
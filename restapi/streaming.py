@@ -0,0 +1,185 @@
+"""
+Потоковая выдача больших списков (StreamingListMixin).
+
+Обычный list собирает весь список словарей, затем всю строку JSON, поэтому
+память растет вместе с таблицей. В потоковом режиме queryset читается
+через iterator(chunk_size=...), строки сериализуются по одной и уходят
+клиенту кусками StreamingHttpResponse: в памяти одновременно находится
+не больше CHUNK_SIZE объектов.
+
+Режим включается запросом:
+
+* ?stream=1 — JSON массив, такой же, как обычный ответ без пагинации;
+* Accept: application/x-ndjson или ?format=ndjson — NDJSON, по объекту
+  на строку.
+
+Пагинация в потоковом режиме не применяется, отдается весь
+отфильтрованный и отсортированный список. Кэш ответов API не
+используется, ETag и 304 работают как обычно.
+
+Строки читаются уже после middleware, поэтому их SQL не попадает в
+Server-Timing; в /metrics он добавляется к маршруту после последнего куска.
+"""
+
+import time
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+from . import metrics
+from .fastpath import FastReadMixin
+
+
+def get_streaming_settings():
+    options = {
+        'CHUNK_SIZE': 500,
+        'QUERY_PARAM': 'stream',
+    }
+    options.update(getattr(settings, 'STREAMING_RESPONSES', {}))
+    return options
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Списки пишутся по объекту на строку, все
+    остальное (detail, ошибки) — одной строкой.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        encode = JSONRenderer().render
+        return b''.join(encode(item) + b'\n' for item in data)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def stream_rows(rows, represent, ndjson=False, chunk_size=500):
+    """
+    Куски ответа по chunk_size объектов. JSON массив совпадает байт в байт
+    с тем, что JSONRenderer отдал бы для всего списка.
+    """
+    encode = JSONRenderer().render
+    encoded = (encode(represent(row)) for row in rows)
+    if ndjson:
+        for batch in _batches(encoded, chunk_size):
+            yield b''.join(line + b'\n' for line in batch)
+        return
+
+    opening = b'['
+    for batch in _batches(encoded, chunk_size):
+        yield opening + b','.join(batch)
+        opening = b','
+    yield b']' if opening == b',' else b'[]'
+
+
+class StreamedQueries:
+    """
+    Обертка execute_wrapper: число и время SQL потоковой выдачи.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def count_queries(content, using, route):
+    """
+    Отдает куски content, считая SQL на подключении using, и после
+    последнего куска записывает его в /metrics: счетчики запроса
+    middleware записала еще до чтения строк.
+    """
+    queries = StreamedQueries()
+    # Подключение того потока, который читает строки.
+    connection = connections[using]
+    connection.execute_wrappers.append(queries)
+    try:
+        yield from content
+    finally:
+        if queries in connection.execute_wrappers:
+            connection.execute_wrappers.remove(queries)
+        metrics.record_queries(route, queries.queries, queries.seconds)
+
+
+async def aiterate(iterator):
+    """
+    Синхронный генератор кусков для ASGI: каждый следующий кусок, вместе
+    с чтением строк из базы, выполняется в потоке sync_to_async.
+    """
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await next_chunk(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class StreamingListMixin:
+    """
+    Потоковый GET list по запросу клиента. Ставится после
+    ConditionalGetMixin (ETag считается как обычно) и перед
+    CachedResponseMixin: потоковый ответ не кэшируется.
+    """
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_streaming(request):
+            return super().list(request, *args, **kwargs)
+        return self.streaming_response(self.filter_queryset(self.get_queryset()))
+
+    def is_streaming(self, request):
+        renderer = request.accepted_renderer
+        if isinstance(renderer, NDJSONRenderer):
+            return True
+        param = get_streaming_settings()['QUERY_PARAM']
+        return (isinstance(renderer, JSONRenderer) and bool(param)
+                and request.query_params.get(param, '').lower() in ('1', 'true'))
+
+    def streaming_response(self, queryset, asynchronous=False):
+        # Строки читаются уже после выхода из представления и middleware,
+        # поэтому база выбирается сейчас, пока действует маршрутизация
+        # запроса (ReplicaPinningMiddleware).
+        queryset = queryset.using(queryset.db)
+        serializer = self.get_serializer()
+        plan = self.get_field_plan() if isinstance(self, FastReadMixin) else None
+        if plan is not None:
+            rows, represent = plan.rows(queryset), plan.bind(serializer)
+        else:
+            rows, represent = queryset, serializer.to_representation
+
+        chunk_size = get_streaming_settings()['CHUNK_SIZE']
+        renderer = self.request.accepted_renderer
+        content = stream_rows(rows.iterator(chunk_size=chunk_size), represent,
+                              isinstance(renderer, NDJSONRenderer), chunk_size)
+        content = count_queries(content, queryset.db, metrics.route_label(self.request))
+        if asynchronous:
+            content = aiterate(content)
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        return StreamingHttpResponse(content, content_type=content_type)
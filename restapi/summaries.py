@@ -0,0 +1,96 @@
+import threading
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Avg, Count, Max, Sum
+
+from .models import Skill, SkillCategorySummary
+from .writes import run_write
+
+
+def get_top_size():
+    # Сколько лучших навыков хранится в сводке каждой категории.
+    return getattr(settings, 'SKILL_SUMMARY_TOP', 5)
+
+
+def summarize(categories, using):
+    """
+    Сводки для указанных категорий: один GROUP BY по индексу
+    (category, -percentage, name) и по одному запросу с LIMIT на лучшие
+    навыки.
+    """
+    skills = Skill.objects.using(using).filter(category__in=categories)
+    stats = {
+        row['category']: row
+        for row in skills.values('category').order_by().annotate(
+            count=Count('pk'),
+            average_percentage=Avg('percentage'),
+            max_percentage=Max('percentage'),
+        )
+    }
+    summaries = {}
+    for category, row in stats.items():
+        top = skills.filter(category=category).order_by('-percentage', 'name', 'pk')
+        summaries[category] = {
+            'count': row['count'],
+            'average_percentage': round(row['average_percentage'], 2),
+            'max_percentage': row['max_percentage'],
+            'top_skills': list(top.values('id', 'name', 'percentage')[:get_top_size()]),
+        }
+    return summaries
+
+
+def refresh_categories(categories, using=None, check=True):
+    """
+    Пересчитывает сводку для категорий; пустые категории удаляются.
+    Если после этого сумма count в сводке не сходится с числом навыков
+    (категорию сменили запросом UPDATE, не зная прежнюю), сводка
+    пересобирается целиком.
+    """
+    using = using or router.db_for_write(SkillCategorySummary)
+    categories = set(categories)
+    with transaction.atomic(using=using):
+        summaries = summarize(categories, using)
+        manager = SkillCategorySummary.objects.db_manager(using)
+        for category in categories:
+            if category in summaries:
+                manager.update_or_create(category=category, defaults=summaries[category])
+            else:
+                for summary in manager.filter(category=category):
+                    summary.delete()
+
+        if check:
+            total = manager.aggregate(total=Sum('count'))['total'] or 0
+            if total != Skill.objects.using(using).count():
+                rebuild(using)
+
+
+def rebuild(using=None):
+    using = using or router.db_for_write(SkillCategorySummary)
+    categories = set(
+        Skill.objects.using(using).order_by().values_list('category', flat=True).distinct())
+    categories |= set(
+        SkillCategorySummary.objects.using(using).values_list('category', flat=True))
+    refresh_categories(categories, using, check=False)
+
+
+# Измененные категории по базам данных. Сводка пересчитывается один раз
+# после коммита: первый обработчик on_commit забирает все накопленные
+# категории, остальные находят пустое множество (bulk-операции меняют
+# сотни навыков в одной транзакции). Категории из откаченной транзакции
+# пересчитаются со следующим коммитом, это безвредно.
+_pending = threading.local()
+
+
+def mark_dirty(categories, using):
+    if not hasattr(_pending, 'categories'):
+        _pending.categories = {}
+    _pending.categories.setdefault(using, set()).update(
+        category for category in categories if category)
+    transaction.on_commit(lambda: _flush(using), using=using)
+
+
+def _flush(using):
+    categories = _pending.categories.pop(using, set())
+    if categories:
+        run_write(lambda: refresh_categories(categories, using), using=using)
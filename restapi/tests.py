@@ -1,3 +1,2097 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import importlib
+import json
+import os
+import multiprocessing
+import re
+import tempfile
+import threading
+import time
+from base64 import b64encode, urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import Future
+from unittest import mock
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Sum
+from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches
+from django.utils import timezone
+from PIL import Image
+from rest_framework import permissions
+from rest_framework.throttling import AnonRateThrottle
+
+from Portfolio import urls as portfolio_urls
+from graphapi.persisted import PersistedQueries, query_hash
+from graphapi.schemas import schema
+
+from .admin import ContactAdmin, SkillAdmin
+from . import metrics, profiling, summaries, timing
+from .benchmark import Benchmark, default_endpoints, dump
+from .cache import _generation_key, get_api_cache, invalidate
+from .db.routers import begin_request, end_request
+from .fastpath import compile_plan
+from .images import generate_derivatives, render_derivatives, target_widths
+from .media import serve_media
+from .models import (
+    Contact, Me, Pricing, Project, RequestProfile, Skill, SkillCategorySummary, Upload,
+)
+from .search import full_text_search
+from .seed import flush, seed
+from .summaries import summarize
+from .uploads import expired_uploads
+from .views import ContactViewSet, ProjectViewSet, UploadViewSet
+from .writes import WriteQueue, run_write
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Курсорная пагинация: обход страниц в обе стороны и проверка курсора.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 23, 'projects': 3, 'skills': 5, 'pricings': 3}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def walk(self, url, direction='next'):
+        pages = []
+        while url and len(pages) < 10:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([item['id'] for item in response.json()['results']])
+            url = response.json()[direction]
+        self.assertIsNone(url)
+        return pages
+
+    def test_pages(self):
+        for ordering in ('', '&ordering=name', '&ordering=-is_read,-id'):
+            with self.subTest(ordering=ordering):
+                expected = [item['id'] for item in
+                            self.client.get('/contacts/?' + ordering.lstrip('&')).json()]
+                pages = self.walk('/contacts/?page_size=5' + ordering)
+                self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+                self.assertEqual(sum(pages, []), expected)
+
+                last = self.client.get('/contacts/?page_size=5' + ordering).json()
+                while last['next']:
+                    last = self.client.get(last['next']).json()
+                back = self.walk(last['previous'], 'previous')
+                self.assertEqual(sum(reversed(back), []), expected[:20])
+
+    def test_unpaginated(self):
+        self.assertEqual(len(self.client.get('/contacts/').json()), 23)
+
+    def test_cursor_from_other_ordering(self):
+        next_url = self.client.get('/contacts/?page_size=5').json()['next']
+        self.assertEqual(self.client.get(next_url).status_code, 200)
+        self.assertEqual(self.client.get(next_url + '&ordering=name').status_code, 404)
+
+    def test_invalid_cursor(self):
+        next_url = self.client.get('/contacts/?page_size=5').json()['next']
+        cursor = json.loads(self.decode(next_url.split('cursor=')[1].split('&')[0]))
+        for position in (['not a date', '1'], ['2024-01-01T00:00:00', 'x'], ['1']):
+            with self.subTest(position=position):
+                token = self.encode({**cursor, 'p': position})
+                response = self.client.get(f'/contacts/?page_size=5&cursor={token}')
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get('/contacts/?cursor=garbage').status_code, 404)
+
+    @staticmethod
+    def decode(token):
+        return urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+
+    @staticmethod
+    def encode(tokens):
+        return urlsafe_b64encode(json.dumps(tokens).encode()).decode().rstrip('=')
+
+
+class FullTextSearchTests(TestCase):
+    """
+    ?search= по индексу FTS: только поля search_fields представления.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i in range(7):
+                Contact.objects.create(name=f'Гость {i}', email=f'guest{i}@example.com',
+                                       subject='Вопрос про кэширование' if i % 2 else 'Заказ',
+                                       message='Занзибар' if i < 3 else 'Текст')
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def test_search_fields(self):
+        self.assertEqual(self.client.get('/contacts/?search=занзибар').json(), [])
+        self.assertEqual(len(self.client.get('/contacts/?search=кэш').json()), 3)
+        self.assertEqual(len(self.client.get('/contacts/?search=guest1').json()), 1)
+        # В админке поиск идет и по тексту сообщения.
+        fields = ContactAdmin.search_fields
+        self.assertEqual(full_text_search(Contact.objects.all(), 'занзибар', fields).count(), 3)
+        self.assertIsNone(full_text_search(Contact.objects.all(), 'занзибар', ['=email']))
+
+    def test_single_match(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/contacts/?search=вопрос')
+        self.assertEqual(len(response.json()), 3)
+        sql = [query['sql'] for query in queries if 'MATCH' in query['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertEqual(sql[0].count('MATCH'), 1)
+
+    def test_ranked_cursor(self):
+        expected = [item['id'] for item in self.client.get('/contacts/?search=гость').json()]
+        self.assertEqual(len(expected), 7)
+        ids = []
+        # Браузер передает query string в percent-encoding.
+        url = '/contacts/?search=%D0%B3%D0%BE%D1%81%D1%82%D1%8C&page_size=2'
+        while url and len(ids) < 10:
+            response = self.client.get(url).json()
+            ids += [item['id'] for item in response['results']]
+            url = response['next']
+        self.assertEqual(ids, expected)
+
+
+class ResponseCacheTests(TestCase):
+    """
+    Кэш ответов API: попадание, промах и сброс, в том числе из другого процесса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 5, 'projects': 2, 'skills': 5, 'pricings': 2}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def test_isolated_from_working_copy(self):
+        # Прогон тестов не должен очищать кэш рабочей копии.
+        self.assertNotEqual(get_api_cache()._dir,
+                            str(settings.BASE_DIR / 'cache' / 'api'))
+
+    def test_hit_and_miss(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/skills/')
+        self.assertTrue(queries)
+        with self.assertNumQueries(0):
+            second = self.client.get('/skills/')
+        self.assertEqual(second.content, first.content)
+
+        # Другой query string и формат — другие записи.
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/skills/?ordering=-id')
+        self.assertTrue(queries)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/skills/?format=api')
+        self.assertTrue(queries)
+
+    def test_invalidation(self):
+        skill = Skill.objects.first()
+        self.client.get('/skills/')
+        self.client.get(f'/skills/{skill.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.name = 'Новое имя'
+            skill.save()
+        self.assertIn('Новое имя', self.client.get('/skills/').content.decode())
+        self.assertEqual(self.client.get(f'/skills/{skill.pk}/').json()['name'], 'Новое имя')
+
+    def test_invalidation_from_other_process(self):
+        self.client.get('/skills/')
+        with self.assertNumQueries(0):
+            self.client.get('/skills/')
+        worker = multiprocessing.get_context('fork').Process(target=invalidate, args=(Skill,))
+        worker.start()
+        worker.join()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/skills/')
+        self.assertTrue(queries)
+
+
+class ConditionalGetTests(TestCase):
+    """
+    ETag и Last-Modified из поколения кэша: 304 без запросов к базе.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 12, 'projects': 3, 'skills': 5, 'pricings': 3}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def test_not_modified(self):
+        for url in ('/contacts/', '/contacts/?page_size=5', '/contacts/1/', '/skill-summary/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with self.assertNumQueries(0):
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+                not_modified = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_pages_and_formats(self):
+        first = self.client.get('/contacts/?page_size=5')
+        second = self.client.get(first.json()['next'])
+        api = self.client.get('/contacts/?format=api')
+        self.assertEqual(len({first['ETag'], second['ETag'], api['ETag']}), 3)
+
+    def test_changes(self):
+        listing = self.client.get('/contacts/')
+        detail = self.client.get('/contacts/1/')
+        other = self.client.get('/contacts/2/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Contact.objects.filter(pk=1).first().save()
+
+        response = self.client.get('/contacts/', HTTP_IF_NONE_MATCH=listing['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], listing['ETag'])
+        response = self.client.get('/contacts/1/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/contacts/2/', HTTP_IF_NONE_MATCH=other['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_queryset_update(self):
+        # update() не отправляет сигналы: поколения меняет CachedQuerySet.
+        listing = self.client.get('/contacts/')
+        detail = self.client.get('/contacts/1/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Contact.objects.filter(pk=1).update(subject='Новая тема')
+
+        for url, stale in (('/contacts/', listing), ('/contacts/1/', detail)):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=stale['ETag'])
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Новая тема', response.content.decode())
+
+        pricing = Pricing.objects.order_by('pk').first()
+        detail = self.client.get(f'/pricings/{pricing.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Pricing.objects.filter(pk=pricing.pk).update(estimated_hours=1)
+        response = self.client.get(f'/pricings/{pricing.pk}/', HTTP_IF_NONE_MATCH=detail['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_object(self):
+        response = self.client.get('/contacts/999/')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class GraphQLProjectionTests(TestCase):
+    """
+    Резолверы списков GraphQL читают только колонки из selection set.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 3, 'skills': 1, 'pricings': 3}, text_size=30)
+        cls.user = get_user_model().objects.create_user('projection')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def query(self, query, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/graphql/', {'query': query}, content_type='application/json')
+        data = response.json()
+        self.assertNotIn('errors', data)
+        selects = [item['sql'] for item in queries.captured_queries
+                   if item['sql'].startswith('SELECT') and f'FROM "{table}"' in item['sql']]
+        self.assertEqual(len(selects), 1)
+        return data['data'], selects[0]
+
+    def test_columns(self):
+        data, sql = self.query('{ projects { title } }', 'restapi_project')
+        self.assertEqual([item['title'] for item in data['projects']],
+                         list(Project.objects.values_list('title', flat=True)))
+        self.assertIn('"title"', sql)
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"technologies_used"', sql)
+
+    def test_fragments(self):
+        data, sql = self.query(
+            'query { projects { ...Dates ... on ProjectType { url } } } '
+            'fragment Dates on ProjectType { startData endData }', 'restapi_project')
+        self.assertEqual(sorted(data['projects'][0]), ['endData', 'startData', 'url'])
+        self.assertIn('"start_data"', sql)
+        self.assertIn('"url"', sql)
+        self.assertNotIn('"description"', sql)
+
+    def test_computed_fields(self):
+        # total_cost считается из ставки и часов: их колонки читаются.
+        data, sql = self.query('{ pricing { service totalCost } }', 'restapi_pricing')
+        self.assertEqual([Decimal(item['totalCost']) for item in data['pricing']],
+                         [pricing.total_cost for pricing in Pricing.objects.all()])
+        self.assertIn('"rate_per_hour"', sql)
+        self.assertNotIn('"description"', sql)
+
+        data, sql = self.query('{ projects { title imageVariants { url } } }', 'restapi_project')
+        self.assertIn('"image_derivatives"', sql)
+        self.assertNotIn('"description"', sql)
+
+
+class PersistedQueryTests(TestCase):
+    """
+    Persisted queries (APQ и allow-list) и кэш разобранных документов.
+    """
+    query = '{ skills { name } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 3, 'pricings': 1}, text_size=30)
+        cls.user = get_user_model().objects.create_user('persisted')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.use(PersistedQueries(schema))
+
+    def use(self, persisted_queries):
+        patcher = mock.patch.object(schema, 'persisted_queries', persisted_queries)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, query=None, key=None):
+        data = {}
+        if query is not None:
+            data['query'] = query
+        if key is not None:
+            data['extensions'] = {'persistedQuery': {'version': 1, 'sha256Hash': key}}
+        return self.client.post('/graphql/', data, content_type='application/json').json()
+
+    def test_apq(self):
+        key = query_hash(self.query)
+        # Промах: клиент должен повторить запрос с текстом.
+        self.assertEqual(self.post(key=key)['errors'][0]['message'], 'PersistedQueryNotFound')
+
+        expected = self.post(self.query, key)
+        self.assertEqual(len(expected['data']['skills']), Skill.objects.count())
+        with mock.patch('graphapi.persisted.parse') as parse, \
+                mock.patch('graphapi.persisted.validate') as validate:
+            self.assertEqual(self.post(key=key), expected)
+            self.assertEqual(self.post(self.query), expected)
+        parse.assert_not_called()
+        validate.assert_not_called()
+
+        self.assertIn('не совпадает', self.post('{ skills { id } }', key)['errors'][0]['message'])
+
+    def test_cache_hit_is_not_parsed(self):
+        key = query_hash(self.query)
+        expected = self.post(self.query, key)
+        # Ни представление graphene-django, ни кэш не разбирают текст повторно.
+        with mock.patch('graphene_django.views.parse', side_effect=AssertionError) as view_parse, \
+                mock.patch('graphapi.persisted.parse', side_effect=AssertionError) as cache_parse:
+            for _ in range(3):
+                self.assertEqual(self.post(self.query, key), expected)
+        view_parse.assert_not_called()
+        cache_parse.assert_not_called()
+
+    def test_invalid_persisted_query(self):
+        for extensions in ({'persistedQuery': 'abc'}, {'persistedQuery': {'sha256Hash': 1}}):
+            response = self.client.post('/graphql/', {'extensions': extensions},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/graphql/', {'id': ['abc']}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_mutation_is_rejected(self):
+        response = self.client.get('/graphql/', {'query': 'mutation { __typename }'},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 405)
+
+    def test_validation_errors_are_cached(self):
+        for _ in range(2):
+            errors = self.post('{ skills { bogus } }')['errors']
+            self.assertIn('bogus', errors[0]['message'])
+        self.assertEqual(len(schema.persisted_queries.documents._entries), 1)
+
+    def test_allowlist(self):
+        allowed = '{ skills { percentage } }'
+        self.use(PersistedQueries(schema, allowlist={query_hash(allowed): allowed},
+                                  reject_unlisted=True))
+
+        data = self.post(key=query_hash(allowed))
+        self.assertEqual(len(data['data']['skills']), Skill.objects.count())
+        response = self.client.get('/graphql/', {'id': query_hash(allowed)},
+                                   HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json(), data)
+
+        self.assertIn('allow-list', self.post(self.query)['errors'][0]['message'])
+        self.assertIn('allow-list', self.post(key=query_hash(self.query))['errors'][0]['message'])
+
+
+class QueryCostTests(TestCase):
+    """
+    Стоимость и глубина GraphQL-запросов и бюджет стоимости на вызывающего.
+    """
+    query = '{ skills { name } }'
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 2, 'pricings': 1}, text_size=30)
+        cls.user = get_user_model().objects.create_user('cost')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        get_api_cache().clear()
+
+    def post(self, query):
+        return self.client.post('/graphql/', {'query': query}, content_type='application/json')
+
+    def test_cost_header_and_limits(self):
+        response = self.post(self.query)
+        self.assertEqual(response['X-GraphQL-Cost'], 'cost=100, depth=2')
+        self.assertNotIn('errors', response.json())
+
+        with self.settings(GRAPHQL_QUERY_COST={'MAX_COST': 99}):
+            errors = self.post(self.query).json()['errors']
+        self.assertIn('Стоимость запроса 100', errors[0]['message'])
+        with self.settings(GRAPHQL_QUERY_COST={'MAX_DEPTH': 1}):
+            errors = self.post(self.query).json()['errors']
+        self.assertIn('Глубина запроса 2', errors[0]['message'])
+
+    def test_budget(self):
+        with self.settings(GRAPHQL_QUERY_COST={'BUDGET': 150, 'BUDGET_WINDOW': 3600}):
+            self.assertNotIn('errors', self.post(self.query).json())
+            errors = self.post(self.query).json()['errors']
+        self.assertEqual(errors[0]['extensions']['code'], 'THROTTLED')
+
+        # Счетчик лежит в общем кэше: другой экземпляр бэкенда (как в
+        # другом воркере) видит потраченный бюджет.
+        key = f'graphql-budget:user:{self.user.pk}:{int(time.time() // 3600)}'
+        self.assertEqual(caches.create_connection('api').get(key), 200)
+
+
+class BulkTests(TestCase):
+    """
+    Массовые POST / PATCH / DELETE на коллекцию.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 4, 'pricings': 1}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def send(self, method, data):
+        return getattr(self.client, method)('/skills/', data, content_type='application/json')
+
+    def test_create(self):
+        count = Skill.objects.count()
+        items = [{'name': f'Навык {i}', 'category': 'programming', 'percentage': 10 + i}
+                 for i in range(3)]
+        response = self.send('post', items)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([item['name'] for item in response.json()], [item['name'] for item in items])
+        self.assertEqual(Skill.objects.count(), count + 3)
+
+        response = self.send('post', items[:1] + [{'name': 'Без процента'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertEqual(Skill.objects.count(), count + 3)
+
+    def test_update(self):
+        first, second = Skill.objects.order_by('pk')[:2]
+        response = self.send('patch', [{'id': first.pk, 'percentage': 11},
+                                       {'id': second.pk, 'percentage': 22}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(Skill.objects.filter(pk__in=[first.pk, second.pk]).order_by('pk')
+                 .values_list('percentage', flat=True)),
+            [11, 22])
+
+        response = self.send('patch', [{'id': first.pk, 'percentage': 33}, {'id': 999}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('id', response.json()[1])
+        self.assertEqual(Skill.objects.get(pk=first.pk).percentage, 11)
+
+    def test_update_duplicate_ids(self):
+        skill = Skill.objects.order_by('pk').first()
+        response = self.send('patch', [{'id': skill.pk, 'percentage': 44},
+                                       {'id': str(skill.pk), 'percentage': 55}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('id', response.json()[1])
+        self.assertEqual(Skill.objects.get(pk=skill.pk).percentage, skill.percentage)
+
+    def test_destroy(self):
+        pks = list(Skill.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        response = self.send('delete', pks + [999])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Skill.objects.filter(pk__in=pks).count(), 2)
+
+        response = self.send('delete', pks)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Skill.objects.filter(pk__in=pks).exists())
+
+
+class GraphQLUpdateTests(TestCase):
+    """
+    Мутации update*: один UPDATE только переданных полей, прежняя
+    семантика пустых строк и null.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 2, 'skills': 2, 'pricings': 2}, text_size=30)
+        cls.user = get_user_model().objects.create_user('graphql')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def mutate(self, query):
+        response = self.client.post('/graphql/', {'query': f'mutation {{ {query} }}'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_only_passed_fields(self):
+        skill = Skill.objects.order_by('pk').first()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.mutate(f'updateSkill(skillId: {skill.pk}, percentage: 77) '
+                               '{ skill { name percentage } }')
+        self.assertEqual(data['data']['updateSkill']['skill'],
+                         {'name': skill.name, 'percentage': 77})
+        updates = [query['sql'] for query in queries.captured_queries
+                   if query['sql'].startswith('UPDATE "restapi_skill"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"name"', updates[0].split(' WHERE ')[0])
+
+        fresh = Skill.objects.get(pk=skill.pk)
+        self.assertEqual((fresh.name, fresh.percentage), (skill.name, 77))
+        self.assertGreater(fresh.updated_at, skill.updated_at)
+
+    def test_fresh_annotation(self):
+        pricing = Pricing.objects.order_by('pk').first()
+        with CaptureQueriesContext(connection) as queries:
+            data = self.mutate(f'updatePricing(pricingId: {pricing.pk}, ratePerHour: 2, '
+                               'estimatedHours: 3) { pricing { totalCost } }')
+        self.assertEqual(Decimal(data['data']['updatePricing']['pricing']['totalCost']), Decimal('6'))
+        # Строка и _total_cost возвращаются самим UPDATE ... RETURNING.
+        pricing_queries = [query['sql'] for query in queries.captured_queries
+                           if '"restapi_pricing"' in query['sql']]
+        self.assertEqual(len(pricing_queries), 1)
+        self.assertIn('RETURNING', pricing_queries[0])
+
+    def test_without_returning(self):
+        pricing = Pricing.objects.order_by('pk').first()
+        with mock.patch('graphapi.updates.supports_update_returning', return_value=False):
+            data = self.mutate(f'updatePricing(pricingId: {pricing.pk}, ratePerHour: 2, '
+                               'estimatedHours: 4) { pricing { totalCost } }')
+        self.assertEqual(Decimal(data['data']['updatePricing']['pricing']['totalCost']), Decimal('8'))
+
+    def test_empty_strings_and_null(self):
+        project = Project.objects.order_by('pk').first()
+        Project.objects.filter(pk=project.pk).update(end_data=project.start_data)
+        data = self.mutate(f'updateProject(projectId: {project.pk}, description: "", '
+                           'endData: null, title: null, image: "") { project { title } }')
+        self.assertNotIn('errors', data)
+        fresh = Project.objects.get(pk=project.pk)
+        # Пустая строка записывается, null очищает только поле с NULL.
+        self.assertEqual(fresh.description, '')
+        self.assertIsNone(fresh.end_data)
+        self.assertEqual(fresh.title, project.title)
+        self.assertEqual(fresh.image, project.image)
+
+        me = Me.objects.get()
+        data = self.mutate(f'updateMe(id: {me.pk}, github: "", phone: null, lastName: "Петров") '
+                           '{ me { lastName github phone } }')
+        self.assertEqual(data['data']['updateMe']['me'],
+                         {'lastName': 'Петров', 'github': me.github, 'phone': me.phone})
+
+    def test_errors(self):
+        skill = Skill.objects.order_by('pk').first()
+        data = self.mutate(f'updateSkill(skillId: {skill.pk}, percentage: 150) {{ skill {{ id }} }}')
+        self.assertIn('percentage', data['errors'][0]['message'])
+        self.assertEqual(Skill.objects.get(pk=skill.pk).percentage, skill.percentage)
+
+        data = self.mutate(f'updateSkill(skillId: {skill.pk}, category: "bogus") {{ skill {{ id }} }}')
+        self.assertIn('category', data['errors'][0]['message'])
+        self.assertEqual(Skill.objects.get(pk=skill.pk).category, skill.category)
+
+        for skill_id in (999, '"abc"'):
+            with self.subTest(skill_id=skill_id):
+                data = self.mutate(f'updateSkill(skillId: {skill_id}, percentage: 5) {{ skill {{ id }} }}')
+                self.assertIn('не существует', data['errors'][0]['message'])
+
+
+@override_settings(ROOT_URLCONF='Portfolio.asgi_urls')
+class AsyncViewTests(TransactionTestCase):
+    """
+    Async путь под ASGI: те же ответы, что у синхронного ViewSet, запись
+    через perform_create, троттлинг и CSRF — синхронно.
+    """
+    contact = {'name': 'Гость', 'email': 'guest@example.com', 'subject': 'Тема',
+               'message': 'Сообщение'}
+
+    def setUp(self):
+        get_api_cache().clear()
+        seed({'contacts': 6, 'projects': 2, 'skills': 5, 'pricings': 2}, text_size=30)
+
+    async def sync_get(self, url):
+        with override_settings(ROOT_URLCONF='Portfolio.urls'):
+            return await sync_to_async(self.client.get)(url)
+
+    async def test_reads(self):
+        contact = await Contact.objects.afirst()
+        for url in ('/contacts/', '/contacts/?page_size=2', f'/contacts/{contact.pk}/',
+                    '/pricings/?ordering=-total_cost'):
+            with self.subTest(url=url):
+                expected = await self.sync_get(url)
+                get_api_cache().clear()
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+                not_modified = await self.async_client.get(
+                    url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual(not_modified.status_code, 304)
+        response = await self.async_client.get('/contacts/999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_create(self):
+        response = await self.async_client.post('/contacts/', self.contact,
+                                                content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('db_pin', response.cookies)
+        contact = await Contact.objects.aget(pk=response.json()['id'])
+        self.assertEqual(contact.subject, 'Тема')
+
+        def perform_create(view, serializer):
+            serializer.save(subject='Из perform_create')
+
+        with mock.patch.object(ContactViewSet, 'perform_create', perform_create):
+            response = await self.async_client.post('/contacts/', self.contact,
+                                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['subject'], 'Из perform_create')
+
+    async def test_throttled(self):
+        class OncePerMinute(AnonRateThrottle):
+            rate = '1/min'
+
+        with mock.patch.object(ContactViewSet, 'throttle_classes', [OncePerMinute]):
+            statuses = [(await self.async_client.get(f'/contacts/?n={i}')).status_code
+                        for i in range(2)]
+        self.assertEqual(statuses, [200, 429])
+
+    async def test_session_write_checks_csrf(self):
+        user = await get_user_model().objects.acreate(username='guest')
+        client = AsyncClient(enforce_csrf_checks=True)
+        await sync_to_async(client.force_login)(user)
+        response = await client.post('/contacts/', self.contact, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    async def test_cache_is_read_outside_event_loop(self):
+        calls = []
+
+        def outside_loop(name, original):
+            def wrapper(*args, **kwargs):
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    calls.append(name)
+                else:
+                    raise AssertionError(f'{name} вызван в event loop')
+                return original(*args, **kwargs)
+            return wrapper
+
+        cache = get_api_cache()
+        with mock.patch.object(ContactViewSet, 'get_validators',
+                               outside_loop('get_validators', ContactViewSet.get_validators)), \
+                mock.patch.object(cache, 'get', outside_loop('get', cache.get)), \
+                mock.patch.object(cache, 'set', outside_loop('set', cache.set)):
+            for _ in range(2):
+                response = await self.async_client.get('/contacts/')
+                self.assertEqual(response.status_code, 200)
+        self.assertIn('get_validators', calls)
+        self.assertIn('set', calls)
+
+
+@override_settings(PROJECT_IMAGE_DERIVATIVES={'WIDTHS': [32, 64], 'FORMATS': ['webp'], 'ASYNC': False})
+class ImageDerivativeTests(TestCase):
+    """
+    Производные Project.image: генерация после коммита, URL в API,
+    удаление вместе с изображением.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 1, 'pricings': 1}, text_size=30)
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        get_api_cache().clear()
+        self.project = Project.objects.get()
+
+    def png(self, width, height):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'red').save(buffer, 'PNG')
+        return ContentFile(buffer.getvalue())
+
+    def set_image(self, name, width=100, height=50):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.image.save(name, self.png(width, height))
+        self.project.refresh_from_db()
+        return self.project.image_derivatives
+
+    def test_generate(self):
+        derivatives = self.set_image('cover.png')
+        self.assertEqual(derivatives['source'], self.project.image.name)
+        self.assertEqual([(variant['width'], variant['height'], variant['format'])
+                          for variant in derivatives['variants']],
+                         [(32, 16, 'webp'), (64, 32, 'webp')])
+        self.assertTrue(derivatives['placeholder'].startswith('data:image/webp;base64,'))
+        for variant in derivatives['variants']:
+            self.assertRegex(variant['name'], r'_\d+w_[0-9a-f]{10}\.webp$')
+            self.assertTrue(default_storage.exists(variant['name']))
+
+        data = self.client.get(f'/projects/{self.project.pk}/').json()
+        self.assertEqual(data['image_variants']['placeholder'], derivatives['placeholder'])
+        self.assertEqual([variant['url'] for variant in data['image_variants']['variants']],
+                         [f'http://testserver/media/{variant["name"]}'
+                          for variant in derivatives['variants']])
+        self.assertEqual(data['image_variants']['variants'][0]['content_type'], 'image/webp')
+
+    def test_small_image(self):
+        # Картинка уже 64 px не увеличивается: один вариант исходной ширины.
+        derivatives = self.set_image('small.png', width=20, height=10)
+        self.assertEqual([variant['width'] for variant in derivatives['variants']], [20])
+        self.assertEqual(target_widths(2000, [320, 640]), [320, 640])
+        self.assertEqual(target_widths(500, [320, 640]), [320, 500])
+
+    def test_rotated_jpeg(self):
+        # Снимок 400x100, повернутый по EXIF на 90°: показывается как 100x400.
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        buffer = BytesIO()
+        Image.new('RGB', (400, 100), 'red').save(buffer, 'JPEG', exif=exif)
+        variants, _ = render_derivatives(buffer.getvalue(), [32, 64], ['webp'], 80, 16)
+        self.assertEqual([(width, height) for width, height, _, _ in variants],
+                         [(32, 128), (64, 256)])
+
+    def test_written_through_write_queue(self):
+        with mock.patch('restapi.images.run_write', wraps=run_write) as write:
+            self.set_image('cover.png')
+        write.assert_called_once()
+        self.assertTrue(self.project.image_derivatives['variants'])
+
+    def test_replace_and_delete(self):
+        old = self.set_image('cover.png')
+        new = self.set_image('other.png', width=80, height=80)
+        self.assertEqual(new['source'], self.project.image.name)
+        for variant in old['variants']:
+            self.assertFalse(default_storage.exists(variant['name']))
+
+        self.project.delete()
+        for variant in new['variants']:
+            self.assertFalse(default_storage.exists(variant['name']))
+
+    def test_image_changed_during_generation(self):
+        derivatives = self.set_image('cover.png')
+        name = self.project.image.name
+        Project.objects.filter(pk=self.project.pk).update(image='', image_derivatives={})
+        stale = generate_derivatives(Project, self.project.pk, name)
+        # Результат устарел: не записывается, файлы удаляются.
+        self.assertEqual(Project.objects.get(pk=self.project.pk).image_derivatives, {})
+        for variant in stale['variants']:
+            self.assertFalse(default_storage.exists(variant['name']))
+        self.assertEqual([variant['name'] for variant in stale['variants']],
+                         [variant['name'] for variant in derivatives['variants']])
+
+
+class MediaServingTests(TestCase):
+    """
+    serve_media: Range (206/416), If-Range, ETag и отдача через прокси.
+    """
+    content = b'0123456789abcdef'
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        with open(f'{media_root.name}/file.txt', 'wb') as file:
+            file.write(self.content)
+        self.factory = RequestFactory()
+
+    def get(self, path='file.txt', **headers):
+        response = serve_media(self.factory.get(f'/media/{path}', **headers), path)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_full(self):
+        response, body = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+
+        not_modified, _ = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_range(self):
+        for header, expected, content_range in (
+            ('bytes=2-5', b'2345', 'bytes 2-5/16'),
+            ('bytes=10-', b'abcdef', 'bytes 10-15/16'),
+            ('bytes=-3', b'def', 'bytes 13-15/16'),
+            ('bytes=14-100', b'ef', 'bytes 14-15/16'),
+        ):
+            with self.subTest(header=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, expected)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(expected)))
+
+        # Несколько диапазонов и неверный синтаксис игнорируются.
+        for header in ('bytes=0-1,4-5', 'items=0-1', 'bytes=5-2'):
+            with self.subTest(header=header):
+                response, body = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(body, self.content)
+
+    def test_unsatisfiable(self):
+        for header in ('bytes=16-', 'bytes=-0'):
+            with self.subTest(header=header):
+                response, _ = self.get(HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */16')
+
+    def test_if_range(self):
+        etag = self.get()[0]['ETag']
+        response, body = self.get(HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=etag)
+        self.assertEqual((response.status_code, body), (206, b'0123'))
+        # Файл изменился (другой ETag) — отдается целиком.
+        response, body = self.get(HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"stale"')
+        self.assertEqual((response.status_code, body), (200, self.content))
+        response, body = self.get(HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=f'W/{etag}')
+        self.assertEqual(response.status_code, 200)
+        response, body = self.get(HTTP_RANGE='bytes=0-3',
+                                  HTTP_IF_RANGE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing(self):
+        for path in ('missing.txt', '../settings.py', ''):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_proxy_backends(self):
+        with self.settings(MEDIA_SERVING={'BACKEND': 'x-accel', 'ACCEL_PREFIX': '/protected/'}):
+            response, body = self.get(HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected/file.txt')
+        self.assertEqual((response.status_code, body), (200, b''))
+        with self.settings(MEDIA_SERVING={'BACKEND': 'x-sendfile'}):
+            response, _ = self.get()
+        self.assertTrue(response['X-Sendfile'].endswith('file.txt'))
+
+    @override_settings(DEBUG=False)
+    def test_mounted_without_debug(self):
+        response = self.client.get('/media/file.txt', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        response.close()
+        self.assertEqual(self.client.get('/media/missing.txt').status_code, 404)
+
+    def test_disabled(self):
+        try:
+            with self.settings(MEDIA_SERVING={'ENABLED': False}):
+                importlib.reload(portfolio_urls)
+                clear_url_caches()
+                self.assertEqual(self.client.get('/media/file.txt').status_code, 404)
+        finally:
+            importlib.reload(portfolio_urls)
+            clear_url_caches()
+
+
+class UploadTests(TestCase):
+    """
+    Возобновляемые загрузки: фрагменты по смещению, контрольные суммы,
+    завершение в Project.file, отмена и очистка брошенных загрузок.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 1, 'pricings': 1}, text_size=30)
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        override = override_settings(MEDIA_ROOT=self.root + '/media',
+                                     RESUMABLE_UPLOADS={'DIR': self.root + '/uploads'})
+        override.enable()
+        self.addCleanup(override.disable)
+        get_api_cache().clear()
+        self.project = Project.objects.get()
+
+    def create(self, content, **data):
+        response = self.client.post('/uploads/', {'filename': 'a.bin', 'length': len(content),
+                                                  **data})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Upload-Offset'], '0')
+        return f"/uploads/{response.json()['id']}/"
+
+    def patch(self, url, chunk, offset, **headers):
+        return self.client.patch(url, chunk, content_type='application/offset+octet-stream',
+                                 HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    def test_chunks(self):
+        content = b'0123456789'
+        url = self.create(content)
+        response = self.patch(url, content[:4], 0)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '4')
+
+        response = self.client.head(url)
+        self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(response['Upload-Length'], '10')
+
+        # Повтор уже записанного фрагмента не дописывает его второй раз.
+        response = self.patch(url, content[:4], 0)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.patch(url, content[4:], 4)['Upload-Offset'], '10')
+        self.assertEqual(Upload.objects.get().offset, 10)
+
+    def test_invalid_chunk(self):
+        url = self.create(b'0123456789')
+        self.assertEqual(self.patch(url, b'0' * 11, 0).status_code, 400)
+        response = self.client.patch(url, b'0', content_type='application/octet-stream',
+                                     HTTP_UPLOAD_OFFSET='0')
+        self.assertEqual(response.status_code, 415)
+        response = self.client.patch(url, b'0', content_type='application/offset+octet-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '0')
+
+    def test_chunk_checksum(self):
+        url = self.create(b'0123456789')
+        digest = b64encode(hashlib.sha256(b'01234').digest()).decode()
+        response = self.patch(url, b'01234', 0, HTTP_UPLOAD_CHECKSUM=f'sha256 {digest}')
+        self.assertEqual(response.status_code, 204)
+        # Несовпавший фрагмент отбрасывается целиком.
+        response = self.patch(url, b'xxxxx', 5, HTTP_UPLOAD_CHECKSUM=f'sha256 {digest}')
+        self.assertEqual(response.status_code, 460)
+        self.assertEqual(self.client.head(url)['Upload-Offset'], '5')
+
+    def test_complete(self):
+        content = b'0123456789'
+        url = self.create(content, sha256=hashlib.sha256(content).hexdigest())
+        self.patch(url, content[:5], 0)
+        response = self.client.post(url + 'complete/', {'project': self.project.pk})
+        self.assertEqual(response.status_code, 400)
+
+        self.patch(url, content[5:], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url + 'complete/', {'project': self.project.pk})
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        with self.project.file.open('rb') as file:
+            self.assertEqual(file.read(), content)
+        # Частичный файл перенесен, а не скопирован.
+        self.assertEqual(os.listdir(self.root + '/uploads'), [])
+
+        upload = Upload.objects.get()
+        self.assertTrue(upload.completed)
+        self.assertEqual(upload.project, self.project)
+        self.assertEqual(self.client.post(url + 'complete/').status_code, 400)
+        self.assertEqual(self.patch(url, b'0', 10).status_code, 409)
+
+    def upload(self, content):
+        url = self.create(content)
+        self.patch(url, content, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url + 'complete/', {'project': self.project.pk})
+        self.assertEqual(response.status_code, 200)
+        self.project.refresh_from_db()
+        return self.project.file.name
+
+    def test_replace_deletes_old_file(self):
+        old = self.upload(b'old')
+        new = self.upload(b'new')
+        self.assertNotEqual(old, new)
+        self.assertFalse(default_storage.exists(old))
+        with default_storage.open(new) as file:
+            self.assertEqual(file.read(), b'new')
+
+    def test_project_permissions(self):
+        # Права загрузок — это права записи проекта, включая объектные.
+        self.assertIs(UploadViewSet.permission_classes, ProjectViewSet.permission_classes)
+
+        class ReadOnlyProject(permissions.BasePermission):
+            def has_object_permission(self, request, view, obj):
+                return not isinstance(obj, Project)
+
+        url = self.create(b'0')
+        self.patch(url, b'0', 0)
+        with mock.patch.object(UploadViewSet, 'permission_classes', [ReadOnlyProject]):
+            response = self.client.post(url + 'complete/', {'project': self.project.pk})
+        self.assertEqual(response.status_code, 403)
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.file)
+        self.assertFalse(Upload.objects.get().completed)
+
+    def test_complete_checksum_mismatch(self):
+        content = b'0123456789'
+        url = self.create(content, sha256=hashlib.sha256(b'other').hexdigest())
+        self.patch(url, content, 0)
+        response = self.client.post(url + 'complete/', {'project': self.project.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(self.root + '/uploads'), [])
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.file)
+
+    def test_complete_unknown_project(self):
+        url = self.create(b'0')
+        self.patch(url, b'0', 0)
+        response = self.client.post(url + 'complete/', {'project': 0})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('project', response.json())
+
+    def test_delete(self):
+        url = self.create(b'0123456789')
+        self.patch(url, b'0123', 0)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(Upload.objects.exists())
+        self.assertEqual(os.listdir(self.root + '/uploads'), [])
+        self.assertEqual(self.client.head(url).status_code, 404)
+
+    def test_clean_uploads(self):
+        self.create(b'0123456789')
+        fresh = Upload.objects.get(pk=self.create(b'0123456789').split('/')[2])
+        Upload.objects.exclude(pk=fresh.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(list(expired_uploads(Upload.objects.all())),
+                         list(Upload.objects.exclude(pk=fresh.pk)))
+
+        out = StringIO()
+        call_command('clean_uploads', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Удалено загрузок: 1')
+        self.assertEqual(list(Upload.objects.all()), [fresh])
+        self.assertEqual(os.listdir(self.root + '/uploads'), [f'{fresh.pk}.part'])
+
+
+class WriteQueueTests(TransactionTestCase):
+    """
+    Пакет писателя: задания изолированы, кэш и индекс обновляются после коммита.
+    """
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def execute(self, *funcs):
+        batch = [(func, Future()) for func in funcs]
+        WriteQueue(DEFAULT_DB_ALIAS, {}).execute(batch)
+        return [future for _, future in batch]
+
+    def test_failed_job_is_rolled_back(self):
+        def failing():
+            Contact.objects.create(name='b', email='b@example.com', subject='b', message='b')
+            raise ValueError('boom')
+
+        created, failed = self.execute(
+            lambda: Contact.objects.create(name='a', email='a@example.com',
+                                           subject='a', message='a').pk,
+            failing,
+        )
+        self.assertEqual(Contact.objects.get().pk, created.result())
+        with self.assertRaises(ValueError):
+            failed.result()
+
+    def test_invalidation_after_commit(self):
+        contact = Contact.objects.create(name='a', email='a@example.com', subject='a', message='a')
+        self.assertEqual(self.client.get('/contacts/').json()[0]['name'], 'a')
+        key = _generation_key(Contact, 'list')
+        generation = get_api_cache().get(key)
+
+        def rename():
+            contact.name = 'renamed'
+            contact.save()
+
+        seen = []
+        self.execute(rename, lambda: seen.append(get_api_cache().get(key)))
+        # До коммита поколение прежнее: читатель не закэширует старые строки
+        # под новым поколением.
+        self.assertEqual(seen, [generation])
+        self.assertNotEqual(get_api_cache().get(key), generation)
+        self.assertEqual(self.client.get('/contacts/').json()[0]['name'], 'renamed')
+        self.assertEqual(self.client.get('/contacts/?search=renamed').json()[0]['id'], contact.pk)
+
+    def test_complete_upload(self):
+        project = Project.objects.create(title='p', description='d', start_data='2024-01-01')
+        self.assertIsNone(self.client.get(f'/projects/{project.pk}/').json()['file'])
+        content = b'x' * 100
+        with tempfile.TemporaryDirectory() as root, \
+                self.settings(MEDIA_ROOT=root, RESUMABLE_UPLOADS={'DIR': root}):
+            response = self.client.post('/uploads/', {'filename': 'a.bin', 'length': len(content)})
+            self.assertEqual(response.status_code, 201)
+            url = f"/uploads/{response.json()['id']}/"
+            response = self.client.patch(url, content,
+                                         content_type='application/offset+octet-stream',
+                                         HTTP_UPLOAD_OFFSET='0')
+            self.assertEqual(response.status_code, 204)
+            response = self.client.post(url + 'complete/', {'project': project.pk})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertTrue(Upload.objects.get().completed)
+        self.assertTrue(self.client.get(f'/projects/{project.pk}/').json()['file'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Чтение с реплики (в тестах — зеркало default), закрепление после записи.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        get_api_cache().clear()
+        self.contact = Contact.objects.create(name='a', email='a@example.com',
+                                              subject='a', message='a')
+
+    def queries(self, alias, url, **extra):
+        with CaptureQueriesContext(connections[alias]) as queries:
+            response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_routing(self):
+        self.assertEqual(Contact.objects.all().db, 'replica')
+        self.assertEqual(Contact.objects.db_manager().db, 'replica')
+        token = begin_request(pinned=True)
+        try:
+            self.assertEqual(Contact.objects.all().db, DEFAULT_DB_ALIAS)
+        finally:
+            end_request(token)
+
+    def test_reads_do_not_pin(self):
+        count, response = self.queries('default', '/contacts/')
+        self.assertEqual(count, 0)
+        self.assertNotIn('db_pin', response.cookies)
+
+        # Админка открывает транзакцию на основной базе и для GET.
+        user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.client.force_login(user)
+        response = self.client.get(f'/admin/restapi/contact/{self.contact.pk}/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('db_pin', response.cookies)
+
+    def test_write_pins(self):
+        self.client.get('/contacts/')
+        response = self.client.post('/contacts/', {'name': 'b', 'email': 'b@example.com',
+                                                   'subject': 'b', 'message': 'b'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.cookies['db_pin']['max-age'], 15)
+
+        # Ответ, собранный по реплике, закрепленному клиенту не отдается:
+        # его чтения идут в основную базу.
+        self.client_class().get('/contacts/')
+        # update() не сбрасывает кэш: так выглядит ответ по отставшей реплике.
+        Contact.objects.filter(pk=self.contact.pk).update(name='fresh')
+        count, response = self.queries('replica', '/contacts/')
+        self.assertEqual(count, 0)
+        self.assertEqual(response.json()[-1]['name'], 'fresh')
+        self.assertNotIn('db_pin', response.cookies)
+
+        self.client.cookies.pop('db_pin')
+        get_api_cache().clear()
+        count, _ = self.queries('replica', '/contacts/')
+        self.assertGreater(count, 0)
+
+
+class PricingTotalCostTests(TestCase):
+    """
+    Pricing.total_cost: аннотация _total_cost менеджера и публичное имя
+    total_cost в ?ordering= и фильтрах диапазона.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 1, 'projects': 1, 'skills': 1, 'pricings': 6}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def test_annotation(self):
+        pricing = Pricing.objects.get(pk=1)
+        self.assertIn('_total_cost', pricing.__dict__)
+        with self.assertNumQueries(0):
+            self.assertEqual(pricing.total_cost, pricing.rate_per_hour * pricing.estimated_hours)
+
+        # После изменения ставки аннотация устарела и не используется.
+        pricing.rate_per_hour = Decimal('2.00')
+        self.assertEqual(pricing.total_cost, Decimal('2.00') * pricing.estimated_hours)
+        pricing.refresh_from_db()
+        self.assertEqual(pricing.total_cost, pricing.rate_per_hour * pricing.estimated_hours)
+
+        self.assertEqual(Pricing(rate_per_hour=Decimal('3'), estimated_hours=Decimal('4')).total_cost,
+                         Decimal('12'))
+
+    def test_update(self):
+        url = '/pricings/1/'
+        data = self.client.get(url).json()
+        response = self.client.put(url, {**data, 'rate_per_hour': '2.00', 'estimated_hours': '3.00'},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.json()['total_cost']), Decimal('6'))
+
+    def test_ordering_and_range(self):
+        expected = sorted(Pricing.objects.all(), key=lambda pricing: (-pricing.total_cost, -pricing.pk))
+        response = self.client.get('/pricings/?ordering=-total_cost')
+        self.assertEqual([item['id'] for item in response.json()], [pricing.pk for pricing in expected])
+
+        middle = expected[2].total_cost
+        response = self.client.get(f'/pricings/?total_cost__lte={middle}')
+        self.assertEqual(sorted(item['id'] for item in response.json()),
+                         sorted(pricing.pk for pricing in expected[2:]))
+        response = self.client.get('/pricings/?total_cost__lte=abc')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('total_cost__lte', response.json())
+
+    def test_admin_ordering(self):
+        admin_user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.force_login(admin_user)
+        response = self.client.get('/admin/restapi/pricing/?o=-4')
+        self.assertEqual(response.status_code, 200)
+        expected = sorted(Pricing.objects.all(), key=lambda pricing: (-pricing.total_cost, -pricing.pk))
+        self.assertEqual([pricing.pk for pricing in response.context['cl'].result_list],
+                         [pricing.pk for pricing in expected])
+
+
+class SkillSummaryTests(TestCase):
+    """
+    Сводка навыков по категориям: пересчет после коммита при сохранении,
+    удалении и смене категории, полная пересборка и выдача /skill-summary/.
+    """
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def create(self, category, name, percentage):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Skill.objects.create(category=category, name=name, percentage=percentage)
+
+    def summary(self, category):
+        return SkillCategorySummary.objects.filter(category=category).first()
+
+    @override_settings(SKILL_SUMMARY_TOP=2)
+    def test_save(self):
+        self.create('web', 'css', 50)
+        self.create('web', 'html', 90)
+        skill = self.create('web', 'django', 70)
+
+        summary = self.summary('web')
+        self.assertEqual(summary.count, 3)
+        self.assertEqual(summary.average_percentage, 70)
+        self.assertEqual(summary.max_percentage, 90)
+        self.assertEqual([item['name'] for item in summary.top_skills], ['html', 'django'])
+
+        skill.percentage = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.save()
+        summary = self.summary('web')
+        self.assertEqual(summary.max_percentage, 100)
+        self.assertEqual(summary.top_skills[0], {'id': skill.pk, 'name': 'django', 'percentage': 100})
+
+    def test_delete(self):
+        skill = self.create('web', 'css', 50)
+        self.create('cloud', 'aws', 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.delete()
+        self.assertIsNone(self.summary('web'))
+        self.assertEqual(self.summary('cloud').count, 1)
+
+    def test_category_change(self):
+        self.create('web', 'css', 50)
+        self.create('web', 'html', 90)
+        skill = Skill.objects.get(name='css')
+        skill.category = 'design'
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.save()
+        self.assertEqual(self.summary('web').count, 1)
+        self.assertEqual(self.summary('design').count, 1)
+
+        # Категорию навыка, созданного в этом же процессе, тоже можно сменить.
+        skill = self.create('cloud', 'aws', 60)
+        skill.category = 'devops'
+        with self.captureOnCommitCallbacks(execute=True):
+            skill.save()
+        self.assertIsNone(self.summary('cloud'))
+        self.assertEqual(self.summary('devops').count, 1)
+
+    def test_batched_per_transaction(self):
+        with mock.patch('restapi.summaries.refresh_categories',
+                        wraps=summaries.refresh_categories) as refresh, \
+                self.captureOnCommitCallbacks(execute=True):
+            for index in range(3):
+                Skill.objects.create(category='web', name=f'skill {index}', percentage=index)
+        refresh.assert_called_once_with({'web'}, DEFAULT_DB_ALIAS)
+        self.assertEqual(self.summary('web').count, 3)
+
+    def test_update_bypassing_signals(self):
+        self.create('web', 'css', 50)
+        self.create('web', 'html', 90)
+        # UPDATE и bulk_create не отправляют сигналы: сводка расходится с
+        # навыками, пока очередной пересчет не заметит это по сумме count.
+        Skill.objects.filter(name='css').update(category='design')
+        Skill.objects.bulk_create([Skill(category='cloud', name='aws', percentage=60)])
+        self.assertIsNone(self.summary('design'))
+
+        self.create('web', 'django', 70)
+        self.assertEqual(self.summary('web').count, 2)
+        self.assertEqual(self.summary('design').count, 1)
+        self.assertEqual(self.summary('cloud').count, 1)
+
+    def test_rebuild_command(self):
+        self.create('web', 'css', 50)
+        SkillCategorySummary.objects.all().delete()
+        SkillCategorySummary.objects.create(category='cloud', count=1)
+
+        out = StringIO()
+        call_command('rebuild_skill_summary', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Категорий в сводке: 1')
+        self.assertEqual(list(SkillCategorySummary.objects.values_list('category', 'count')),
+                         [('web', 1)])
+
+    def test_summarize(self):
+        Skill.objects.bulk_create([
+            Skill(category='web', name='css', percentage=50),
+            Skill(category='web', name='html', percentage=50),
+            Skill(category='cloud', name='aws', percentage=61),
+        ])
+        summaries = summarize({'web', 'cloud', 'design'}, DEFAULT_DB_ALIAS)
+        self.assertEqual(set(summaries), {'web', 'cloud'})
+        # При равном проценте лучшие навыки упорядочены по имени.
+        self.assertEqual([item['name'] for item in summaries['web']['top_skills']],
+                         ['css', 'html'])
+        self.assertEqual(summaries['cloud']['average_percentage'], 61)
+
+    def test_api(self):
+        self.create('web', 'css', 50)
+        self.create('cloud', 'aws', 60)
+        response = self.client.get('/skill-summary/')
+        self.assertEqual([item['category'] for item in response.json()], ['cloud', 'web'])
+
+        response = self.client.get('/skill-summary/web/')
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['top_skills'][0]['name'], 'css')
+
+        # Кэш ответа сбрасывается после пересчета сводки.
+        self.create('web', 'html', 90)
+        self.assertEqual(self.client.get('/skill-summary/web/').json()['count'], 2)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Регрессионные тесты планов запросов для основных путей доступа.
+
+    Каждый запрос выполняется, его SQL снимается через
+    CaptureQueriesContext и передается в EXPLAIN QUERY PLAN (SQLite) или
+    EXPLAIN (PostgreSQL). Тест падает, если таблица читается полным
+    сканированием или результат сортируется во временном B-дереве / узле
+    Sort, то есть если нужный индекс пропал или перестал подходить.
+    """
+    # Полное сканирование таблицы и сортировка без индекса.
+    FULL_SCAN = {
+        'sqlite': re.compile(r'^SCAN \S+$'),
+        'postgresql': re.compile(r'\bSeq Scan\b'),
+    }
+    SORT = {
+        'sqlite': re.compile(r'\bUSE TEMP B-TREE\b'),
+        'postgresql': re.compile(r'(^|->\s+)(Incremental )?Sort\b'),
+    }
+    # Первая страница в порядке первичного ключа: SQLite обходит таблицу
+    # по rowid и останавливается на LIMIT, план при этом тоже "SCAN t".
+    PK_PAGE = re.compile(r'ORDER BY "\w+"\."id" (ASC|DESC) LIMIT \d+$')
+
+    @classmethod
+    def setUpTestData(cls):
+        Project.objects.bulk_create([
+            Project(title=f'Проект {i}', description='Описание',
+                    start_data='2024-01-01', end_data='2024-02-01')
+            for i in range(5)
+        ])
+        Contact.objects.bulk_create([
+            Contact(name='Имя', email='name@example.com', subject=f'Тема {i}',
+                    message='Сообщение', is_read=i % 2 == 0)
+            for i in range(5)
+        ])
+        Skill.objects.bulk_create([
+            Skill(category=category, name=f'{category} {i}', percentage=i * 10)
+            for category in ('web', 'cloud') for i in range(5)
+        ])
+        Pricing.objects.bulk_create([
+            Pricing(service=f'Услуга {i}', description='Описание',
+                    rate_per_hour=Decimal('10.00') * (i + 1), estimated_hours=Decimal('2.50'))
+            for i in range(5)
+        ])
+
+    def setUp(self):
+        if connection.vendor not in self.FULL_SCAN:
+            self.skipTest(f'EXPLAIN не разбирается для {connection.vendor}.')
+        # Закэшированный ответ не выполняет запросов.
+        get_api_cache().clear()
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # На маленьких тестовых таблицах Seq Scan дешевле индекса;
+                # запрещаем его, чтобы увидеть, есть ли индексный план вообще.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute(f'EXPLAIN {sql}')
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[3] for row in cursor.fetchall()]
+
+    def assertIndexed(self, run, index=None):
+        """
+        Выполняет run() и проверяет планы всех выполненных SELECT.
+        Если указан index, он должен встречаться хотя бы в одном плане:
+        упорядоченный обход другого индекса с отбрасыванием строк не
+        виден как полное сканирование, но по сути им является.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            run()
+        selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertTrue(selects, 'Не выполнено ни одного SELECT.')
+
+        full_scan = self.FULL_SCAN[connection.vendor]
+        sort = self.SORT[connection.vendor]
+        plans = []
+        for sql in selects:
+            plan = self.explain(sql)
+            plans.append('\n'.join(plan))
+            for line in plan:
+                line = line.strip()
+                if full_scan.search(line) and self.PK_PAGE.search(sql):
+                    continue
+                if full_scan.search(line) or sort.search(line):
+                    self.fail('Запрос без подходящего индекса:\n{}\n\nПлан:\n{}'.format(
+                        sql, plans[-1]))
+        if index is not None:
+            self.assertTrue(any(index in plan for plan in plans),
+                            f'Индекс {index} не используется:\n' + '\n\n'.join(plans))
+
+    def assertIndexedList(self, url):
+        # Первая страница и следующая по курсору.
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        next_url = response.json()['next']
+        self.assertIsNotNone(next_url)
+        get_api_cache().clear()
+        self.assertIndexed(lambda: self.client.get(url))
+        self.assertIndexed(lambda: self.client.get(next_url))
+
+    def test_detects_full_scan_and_sort(self):
+        with self.assertRaises(AssertionError):
+            self.assertIndexed(lambda: list(Contact.objects.order_by('message')))
+
+    def test_project_list(self):
+        self.assertIndexedList('/projects/?page_size=2')
+
+    def test_contact_list(self):
+        self.assertIndexedList('/contacts/?page_size=2')
+
+    def test_skill_list(self):
+        self.assertIndexedList('/skills/?page_size=2')
+
+    def test_project_admin_ordering(self):
+        # Админка дополняет Meta.ordering первичным ключом.
+        ordering = [*Project._meta.ordering, '-pk']
+        self.assertIndexed(lambda: list(Project.objects.order_by(*ordering)[:100]),
+                           index='project_created_id_idx')
+
+    def test_contact_admin_unread(self):
+        self.assertIndexed(lambda: list(
+            Contact.objects.filter(is_read=False).order_by(*ContactAdmin.ordering)[:100]),
+            index='contact_unread_idx')
+
+    def test_skill_admin_category(self):
+        self.assertIndexed(lambda: list(
+            Skill.objects.filter(category='web').order_by(*SkillAdmin.ordering)[:100]),
+            index='skill_category_name_idx')
+
+    def test_pricing_admin_rate(self):
+        self.assertIndexed(lambda: list(
+            Pricing.objects.filter(rate_per_hour=Decimal('10.00')).order_by('-pk')[:100]),
+            index='pricing_rate_idx')
+
+    def test_skill_summary(self):
+        self.assertIndexed(lambda: summarize({'web', 'cloud'}, DEFAULT_DB_ALIAS),
+                           index='skill_category_top_idx')
+
+    def test_skill_summary_needs_top_idx(self):
+        # 0008_query_indexes заменила индекс (category, -percentage) из
+        # 0007 на (category, -percentage, name): лучшие навыки сортируются
+        # еще и по имени, и по старому индексу понадобилась бы сортировка.
+        with connection.cursor() as cursor:
+            indexes = connection.introspection.get_constraints(cursor, Skill._meta.db_table)
+            self.assertNotIn('skill_category_percentage_idx', indexes)
+            cursor.execute('DROP INDEX skill_category_top_idx')
+            cursor.execute('CREATE INDEX skill_category_percentage_idx '
+                           'ON restapi_skill (category, percentage DESC)')
+        with self.assertRaisesMessage(AssertionError, 'Запрос без подходящего индекса'):
+            self.assertIndexed(lambda: summarize({'web', 'cloud'}, DEFAULT_DB_ALIAS))
+
+    def test_expired_uploads(self):
+        Upload.objects.create(filename='file.bin', length=10)
+        Upload.objects.update(updated_at=Upload.objects.get().updated_at - timedelta(days=2))
+        self.assertIndexed(lambda: list(expired_uploads(Upload.objects.all())),
+                           index='upload_pending_idx')
+
+
+class BenchmarkTests(TestCase):
+    """
+    Генератор данных и нагрузочный прогон на маленьком наборе.
+    """
+    sizes = {'contacts': 30, 'projects': 5, 'skills': 20, 'pricings': 5}
+
+    def snapshot(self):
+        return {
+            model.__name__: list(model.objects.order_by('pk').values_list(*fields))
+            for model, fields in [
+                (Contact, ['name', 'email', 'subject', 'message', 'is_read']),
+                (Project, ['title', 'description', 'start_data', 'end_data']),
+                (Skill, ['category', 'name', 'percentage']),
+                (Pricing, ['service', 'rate_per_hour', 'estimated_hours']),
+            ]
+        }
+
+    def test_seed_is_deterministic(self):
+        seed(self.sizes, seed=7, text_size=50)
+        first = self.snapshot()
+        self.assertEqual(len(first['Contact']), 30)
+        self.assertEqual(SkillCategorySummary.objects.aggregate(total=Sum('count'))['total'], 20)
+
+        for model in (Contact, Project, Skill, Pricing):
+            model.objects.all().delete()
+        seed(self.sizes, seed=7, text_size=50)
+        self.assertEqual(self.snapshot(), first)
+
+    def test_flush(self):
+        seed(self.sizes, text_size=50)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with self.settings(MEDIA_ROOT=media_root.name,
+                           RESUMABLE_UPLOADS={'DIR': media_root.name + '/uploads'}):
+            project = Project.objects.order_by('pk').first()
+            for name in ('project_image/a.png', 'project_image/a_32w_0123456789.webp',
+                         'project_file/a.pdf'):
+                default_storage.save(name, ContentFile(b'x'))
+            Project.objects.filter(pk=project.pk).update(
+                image='project_image/a.png', file='project_file/a.pdf',
+                image_derivatives={'source': 'project_image/a.png', 'variants': [
+                    {'name': 'project_image/a_32w_0123456789.webp'}]})
+            response = self.client.post('/uploads/', {'filename': 'b.bin', 'length': 10})
+            Upload.objects.filter(pk=response.json()['id']).update(project=project)
+
+            flush()
+            # Строка Upload ссылалась на проект: ограничения должны сходиться.
+            connection.check_constraints()
+            for model in (Contact, Project, Skill, Pricing, Me, SkillCategorySummary, Upload):
+                self.assertFalse(model.objects.exists(), model.__name__)
+            for directory in ('project_image', 'project_file', 'uploads'):
+                self.assertEqual(os.listdir(f'{media_root.name}/{directory}'), [])
+            self.assertEqual(full_text_search(Project.objects.all(), 'django').count(), 0)
+
+        seed(self.sizes, text_size=50)
+        self.assertEqual(Project.objects.order_by('pk').first().pk, 1)
+
+    def test_report_covers_every_endpoint(self):
+        seed(self.sizes, text_size=50)
+        endpoints = default_endpoints()
+        names = {endpoint.name for endpoint in endpoints}
+        self.assertIn('GET /contacts/', names)
+        self.assertIn('GET /api/contacts/', names)
+        self.assertIn('POST /graphql/ projects', names)
+
+        report = Benchmark(requests=2, warmup=0).run(endpoints)
+        self.assertEqual(set(report['endpoints']), names)
+        for name, result in report['endpoints'].items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(result['errors'], 0)
+                self.assertEqual(result['requests'], 2)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(report['meta']['dataset']['restapi.Contact'], 30)
+        json.loads(dump(report))
+
+
+class ServerTimingTests(TestCase):
+    """
+    Заголовок Server-Timing и журнал restapi.timing.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Skill.objects.bulk_create([
+            Skill(category='web', name=f'Навык {i}', percentage=i) for i in range(3)
+        ])
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def metrics(self, response):
+        self.assertIn('Server-Timing', response)
+        return {metric.split(';')[0]: metric for metric in response['Server-Timing'].split(', ')}
+
+    def test_rest_view(self):
+        with self.assertLogs('restapi.timing', 'INFO') as logs:
+            response = self.client.get('/skills/')
+        self.assertEqual(response.status_code, 200)
+        metrics = self.metrics(response)
+        self.assertEqual(set(metrics), {'db', 'serialize', 'render', 'total'})
+        self.assertRegex(metrics['db'], r'^db;dur=[\d.]+;desc="[1-9]\d* queries"$')
+        self.assertIn('GET /skills/ 200', logs.output[0])
+        self.assertEqual(logs.records[0].timing['status'], 200)
+
+    def test_graphql_view(self):
+        self.client.force_login(get_user_model().objects.create_user('timing'))
+        response = self.client.post('/graphql/', {'query': '{ skills { name } }'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue({'db', 'graphql', 'render', 'total'} <= set(self.metrics(response)))
+
+    def test_other_views_are_not_timed(self):
+        response = self.client.get('/admin/login/')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_TIMING={'NPLUSONE_THRESHOLD': 1})
+    def test_repeated_queries(self):
+        with self.assertLogs('restapi.timing', 'WARNING') as logs:
+            self.client.get('/skills/')
+        self.assertIn('N+1', logs.output[0])
+        self.assertIn('FROM "restapi_skill"', logs.records[0].timing['sql'])
+
+    def test_query_shape(self):
+        timings = timing.RequestTimings()
+        timings.enabled = True
+        token = timing._timings.set(timings)
+        try:
+            for pks in ([1], [1, 2], [1, 2, 3]):
+                list(Skill.objects.filter(pk__in=pks))
+        finally:
+            timing._timings.reset(token)
+        self.assertEqual(timings.queries, 3)
+        self.assertEqual(timings.repeated_queries(3), [(next(iter(timings.shapes)), 3)])
+
+
+class ProfilingTests(TestCase):
+    """
+    Профилировщик запросов и скачивание профилей из админки.
+    """
+
+    def setUp(self):
+        self.staff = get_user_model().objects.create_user('staff', is_staff=True, is_superuser=True)
+
+    def test_sampler(self):
+        sampler = profiling.Sampler(threading.get_ident(), 0.001)
+        sampler.start()
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        sampler.stop()
+        self.assertGreater(sampler.samples, 0)
+        stack = sampler.stacks.most_common(1)[0][0]
+        self.assertTrue(stack.endswith('restapi.tests:ProfilingTests.test_sampler'), stack)
+
+    def test_requires_staff(self):
+        response = self.client.get('/skills/', HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(REQUEST_PROFILING={'KEEP': 2})
+    def test_staff_request(self):
+        self.client.force_login(self.staff)
+        for url in ('/skills/?profile', '/projects/?profile', '/skills/1/?profile'):
+            response = self.client.get(url)
+            profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+            self.assertEqual(profile.reason, RequestProfile.REASON_REQUESTED)
+        self.assertEqual(profile.route, 'skill-detail')
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        # Остальные запросы (и сохранение профиля) не закрепляют чтения за основной базой.
+        self.assertNotIn('db_pin', response.cookies)
+
+    @override_settings(REQUEST_PROFILING={'SAMPLE_RATE': 1.0})
+    def test_sampled_request(self):
+        self.client.force_login(self.staff)
+        self.client.post('/graphql/', {'query': '{ skills { name } }'},
+                         content_type='application/json')
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.route, profile.reason), ('graphql/', RequestProfile.REASON_SAMPLED))
+
+    def test_download(self):
+        for stacks in ('a;b 2\na;c 1\n', 'a;b 3\n'):
+            RequestProfile.objects.create(
+                route='skill-list', method='GET', path='/skills/', status=200,
+                reason=RequestProfile.REASON_SAMPLED, duration_ms=1, interval_ms=1,
+                samples=3, stacks=stacks)
+        self.client.force_login(self.staff)
+        response = self.client.post('/admin/restapi/requestprofile/', {
+            'action': 'download_stacks',
+            '_selected_action': list(RequestProfile.objects.values_list('pk', flat=True)),
+        })
+        self.assertEqual(response.content.decode(), 'GET skill-list;a;b 5\nGET skill-list;a;c 1\n')
+
+
+class MetricsTests(TestCase):
+    """
+    /metrics и сложение значений воркеров через mmap-файлы.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS={'DIR': directory.name, 'BUCKETS': (0.1, 1.0),
+                                              'TOKEN': 'secret'})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        get_api_cache().clear()
+
+    def samples(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines()
+                    if not line.startswith('#'))
+
+    def test_requests(self):
+        self.client.get('/skills/')
+        self.client.get('/skills/')
+        self.client.get('/no-such-page/')
+        samples = self.samples()
+        labels = 'method="GET",route="skill-list"'
+        self.assertEqual(samples[f'portfolio_requests_total{{{labels},status="200"}}'], '2.0')
+        self.assertEqual(samples[f'portfolio_request_duration_seconds_count{{{labels}}}'], '2.0')
+        self.assertEqual(samples[f'portfolio_request_duration_seconds_bucket{{{labels},le="+Inf"}}'],
+                         '2.0')
+        self.assertIn(f'portfolio_request_duration_seconds_bucket{{{labels},le="0.1"}}', samples)
+        self.assertEqual(
+            samples['portfolio_requests_total{method="GET",route="unmatched",status="404"}'], '1.0')
+        # Второй ответ взят из кэша вместе с ETag, без запросов к базе.
+        self.assertGreaterEqual(float(samples['portfolio_db_queries_total{route="skill-list"}']), 1)
+        self.assertEqual(samples['portfolio_cache_hit_ratio{cache="api"}'], '0.5')
+        # Запрос к самому /metrics еще выполняется.
+        self.assertEqual(samples['portfolio_requests_in_flight'], '1.0')
+
+    def test_graphql_operation(self):
+        self.client.force_login(get_user_model().objects.create_user('metrics'))
+        self.client.post('/graphql/', {'query': 'query Skills { skills { name } }'},
+                         content_type='application/json')
+        samples = self.samples()
+        self.assertEqual(
+            samples['portfolio_requests_total{method="POST",route="graphql/ Skills",status="200"}'],
+            '1.0')
+
+    def test_workers(self):
+        def worker():
+            metrics.REQUESTS.inc(2, route='worker')
+            metrics.IN_FLIGHT.inc()
+
+        metrics.REQUESTS.inc(route='worker')
+        process = multiprocessing.get_context('fork').Process(target=worker)
+        process.start()
+        process.join()
+        values = metrics.collect(gauges={metrics.IN_FLIGHT.name})
+        self.assertEqual(values['portfolio_requests_total{route="worker"}'], 3.0)
+        # Gauge завершившегося воркера не учитывается.
+        self.assertNotIn(metrics.IN_FLIGHT.name, values)
+
+    def test_pid_reuse(self):
+        path = f'{self.directory}/99999.db'
+        store = metrics.MmapStore(path)
+        store.add([('portfolio_requests_total{route="old"}', 2), (metrics.IN_FLIGHT.name, 3)])
+        # Новый процесс с тем же PID: счетчики остаются, gauge обнуляются.
+        values = metrics.MmapStore(path, reset={metrics.IN_FLIGHT.name}).read()
+        self.assertEqual(values['portfolio_requests_total{route="old"}'], 2.0)
+        self.assertEqual(values[metrics.IN_FLIGHT.name], 0.0)
+
+    def test_operation_labels_are_shared(self):
+        with self.settings(METRICS={'DIR': self.directory, 'MAX_OPERATIONS': 2}):
+            self.assertEqual(metrics.operation_label('First'), 'First')
+            reader, writer = multiprocessing.get_context('fork').Pipe(duplex=False)
+
+            def worker():
+                writer.send([metrics.operation_label(name) for name in ('Second', 'Third', 'First')])
+
+            process = multiprocessing.get_context('fork').Process(target=worker)
+            process.start()
+            labels = reader.recv()
+            process.join()
+            self.assertEqual(labels, ['Second', 'other', 'First'])
+            # Лимит общий: имя, допущенное другим воркером, занимает место.
+            self.assertEqual(metrics.operation_label('Fourth'), 'other')
+            self.assertEqual(metrics.operation_label('Second'), 'Second')
+
+    def test_access(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        # Не-ASCII заголовок не должен приводить к 500.
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer sécret')
+        self.assertEqual(response.status_code, 401)
+
+        # Без токена /metrics закрыт для всех, кроме сотрудников и ALLOWED_IPS.
+        with self.settings(METRICS={}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.client.force_login(get_user_model().objects.create_user('user'))
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.client.force_login(get_user_model().objects.create_user('staff', is_staff=True))
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+            self.client.logout()
+        with self.settings(METRICS={'ALLOWED_IPS': ['127.0.0.1']}):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class FastReadTests(TestCase):
+    """
+    Быстрый путь list/retrieve отдает те же ответы, что и сериализаторы DRF.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 20, 'projects': 6, 'skills': 30, 'pricings': 8}, text_size=30)
+        name = 'projects/cover.png'
+        Project.objects.filter(pk=1).update(image=name, file='projects/spec.pdf', image_derivatives={
+            'source': name,
+            'placeholder': 'data:image/webp;base64,AAAA',
+            'variants': [{'name': 'projects/cover-320.webp', 'width': 320, 'height': 200,
+                          'format': 'webp'}],
+        })
+        Project.objects.filter(pk=2).update(image='projects/other.png')
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def get_both(self, url):
+        fast = self.client.get(url)
+        get_api_cache().clear()
+        with self.settings(FAST_READ={'ENABLED': False}):
+            slow = self.client.get(url)
+        get_api_cache().clear()
+        self.assertEqual(fast.status_code, slow.status_code)
+        return fast, slow
+
+    def test_plans(self):
+        from .views import (ContactViewSet, MeViewSet, PricingViewSet, ProjectViewSet,
+                            SkillCategorySummaryViewSet, SkillViewSet)
+        for viewset in (ContactViewSet, MeViewSet, PricingViewSet, ProjectViewSet,
+                        SkillCategorySummaryViewSet, SkillViewSet):
+            with self.subTest(viewset=viewset.__name__):
+                self.assertIsNotNone(compile_plan(viewset.serializer_class))
+
+    def test_parity(self):
+        urls = [
+            '/me/', '/me/1/', '/projects/', '/projects/1/', '/projects/2/',
+            '/projects/?page_size=2', '/pricings/', '/pricings/3/',
+            '/pricings/?ordering=-total_cost&page_size=3', '/pricings/?total_cost__lte=5000',
+            '/skills/', '/skills/?page_size=7&ordering=-percentage', '/skills/5/',
+            '/skill-summary/', f'/skill-summary/{Skill.objects.first().category}/',
+            '/contacts/?search=django&page_size=4', '/contacts/?search=django', '/contacts/7/',
+            '/skills/100000/', '/skills/abc/',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                fast, slow = self.get_both(url)
+                self.assertEqual(fast.content, slow.content)
+
+        # Следующие страницы по курсору из быстрого ответа.
+        url = '/pricings/?ordering=-total_cost&page_size=3'
+        pages = 0
+        while url and pages < 5:
+            fast, slow = self.get_both(url)
+            self.assertEqual(fast.content, slow.content)
+            url = fast.json()['next']
+            pages += 1
+        self.assertIsNone(url)
+
+    def test_project_variants(self):
+        data = self.client.get('/projects/1/').json()
+        self.assertEqual(data['image'], 'http://testserver/media/projects/cover.png')
+        self.assertEqual(data['image_variants']['variants'][0]['url'],
+                         'http://testserver/media/projects/cover-320.webp')
+        self.assertEqual(data['total_cost'] if 'total_cost' in data else None, None)
+        self.assertEqual(self.client.get('/pricings/1/').json()['total_cost'],
+                         str((Pricing.objects.get(pk=1).total_cost).quantize(Decimal('0.0001'))))
+
+
+class StreamingTests(TestCase):
+    """
+    Потоковые списки: тот же JSON, что и обычный ответ, и NDJSON.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 25, 'projects': 3, 'skills': 10, 'pricings': 7}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def stream(self, url, **extra):
+        response = self.client.get(url, **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return list(response.streaming_content), response
+
+    def test_json_array(self):
+        for url in ('/contacts/', '/contacts/?search=django', '/pricings/?ordering=-total_cost',
+                    '/projects/', '/skill-summary/'):
+            with self.subTest(url=url):
+                expected = self.client.get(url).content
+                stream_url = url + ('&' if '?' in url else '?') + 'stream=1'
+                for enabled in (True, False):
+                    with self.settings(FAST_READ={'ENABLED': enabled}):
+                        chunks, response = self.stream(stream_url)
+                    self.assertEqual(b''.join(chunks), expected)
+                    self.assertEqual(response['Content-Type'], 'application/json')
+
+        chunks, _ = self.stream('/contacts/?stream=1&search=nothing-matches-this')
+        self.assertEqual(b''.join(chunks), b'[]')
+
+    @override_settings(STREAMING_RESPONSES={'CHUNK_SIZE': 10})
+    def test_ndjson(self):
+        expected = self.client.get('/contacts/').json()
+        chunks, response = self.stream('/contacts/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        # 25 контактов кусками по 10.
+        self.assertEqual(len(chunks), 3)
+        lines = b''.join(chunks).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+
+        chunks, _ = self.stream('/skills/?format=ndjson&page_size=2')
+        self.assertEqual(len(b''.join(chunks).splitlines()), Skill.objects.count())
+
+        detail = self.client.get('/contacts/1/', HTTP_ACCEPT='application/x-ndjson')
+        self.assertFalse(detail.streaming)
+        self.assertEqual(json.loads(detail.content), self.client.get('/contacts/1/').json())
+
+    def test_conditional(self):
+        _, response = self.stream('/contacts/?stream=1')
+        self.assertIn('Accept', response['Vary'])
+        not_modified = self.client.get('/contacts/?stream=1', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertIn('Accept', not_modified['Vary'])
+
+        # Тот же URL в NDJSON — другое представление с другим ETag.
+        _, ndjson = self.stream('/contacts/?stream=1', HTTP_ACCEPT='application/x-ndjson')
+        self.assertNotEqual(ndjson['ETag'], response['ETag'])
+        _, ndjson = self.stream('/contacts/?stream=1', HTTP_ACCEPT='application/x-ndjson',
+                                HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(ndjson['Content-Type'], 'application/x-ndjson')
+
+    def test_metrics(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        key = 'portfolio_db_queries_total{route="contact-list"}'
+        with self.settings(METRICS={'DIR': directory.name}):
+            response = self.client.get('/contacts/?stream=1')
+            # Строки еще не прочитаны.
+            self.assertEqual(metrics.collect().get(key), 0.0)
+            content = b''.join(response.streaming_content)
+            response.close()
+            self.assertEqual(len(json.loads(content)), Contact.objects.count())
+            self.assertGreaterEqual(metrics.collect()[key], 1.0)
+
+
+class SparseFieldsTests(TestCase):
+    """
+    ?fields= / ?omit= сужают ответ и набор колонок в SQL.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed({'contacts': 5, 'projects': 4, 'skills': 5, 'pricings': 5}, text_size=30)
+
+    def setUp(self):
+        get_api_cache().clear()
+
+    def get(self, url):
+        """
+        Ответ быстрым путем и обычным путем DRF и SELECT-запросы обоих.
+        """
+        results = []
+        for enabled in (True, False):
+            get_api_cache().clear()
+            with self.settings(FAST_READ={'ENABLED': enabled}), \
+                    CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            selects = [query['sql'] for query in queries.captured_queries
+                       if query['sql'].startswith('SELECT "restapi_')]
+            results.append((response, selects))
+        (fast, fast_sql), (slow, slow_sql) = results
+        self.assertEqual(fast.content, slow.content)
+        return fast, fast_sql + slow_sql
+
+    def test_fields(self):
+        response, selects = self.get('/projects/?fields=title,image,start_data')
+        self.assertEqual([sorted(item) for item in response.json()],
+                         [['image', 'start_data', 'title']] * Project.objects.count())
+        self.assertTrue(selects)
+        for sql in selects:
+            self.assertNotIn('"description"', sql)
+            self.assertNotIn('"technologies_used"', sql)
+
+        response, selects = self.get('/projects/1/?fields=title,image_variants')
+        self.assertEqual(sorted(response.json()), ['image_variants', 'title'])
+        self.assertIn('"image_derivatives"', selects[-1])
+
+    def test_omit(self):
+        response, selects = self.get('/contacts/?omit=message&page_size=2')
+        self.assertNotIn('message', response.json()['results'][0])
+        self.assertIn('email', response.json()['results'][0])
+        for sql in selects:
+            self.assertNotIn('"message"', sql)
+
+    def test_cursor(self):
+        # Сортировка по total_cost работает и без total_cost в ответе.
+        url = '/pricings/?fields=service&ordering=-total_cost&page_size=2'
+        services = []
+        while url:
+            response, _ = self.get(url)
+            services += [item['service'] for item in response.json()['results']]
+            url = response.json()['next']
+        expected = sorted(Pricing.objects.all(), key=lambda pricing: (-pricing.total_cost, -pricing.pk))
+        self.assertEqual(services, [pricing.service for pricing in expected])
+
+    def test_unknown(self):
+        response = self.client.get('/skills/?fields=name,bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+    def test_writes(self):
+        # На запись сериализатор полный: проверяются все поля и все
+        # возвращаются в ответе.
+        url = f'/skills/{Skill.objects.first().pk}/'
+        data = self.client.get(url).json()
+        response = self.client.put(f'{url}?fields=name', {'name': data['name']},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.put(f'{url}?fields=name', {**data, 'percentage': 50},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['percentage'], 50)
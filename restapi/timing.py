@@ -0,0 +1,166 @@
+"""
+Время обработки запроса по этапам: SQL, сериализация, выполнение GraphQL
+и рендер ответа (ServerTimingMiddleware в restapi/middleware.py).
+
+Счетчики текущего запроса хранятся в ContextVar, поэтому они видны и в
+потоках sync_to_async, и в async представлениях. SQL учитывается обертками
+execute_wrapper, которые ставятся на каждое новое подключение к базе;
+запросы из потока писателя (restapi/writes.py) в счетчики не попадают.
+"""
+
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_timings = ContextVar('request_timings', default=None)
+
+# Разное число параметров в IN (...) и VALUES (...) не меняет форму запроса.
+_PARAMS_RE = re.compile(r'\((?:%s, )*%s\)')
+
+
+def get_timing_settings():
+    options = {
+        'ENABLED': True,
+        'HEADER': True,
+        'LOG': True,
+        'NPLUSONE_THRESHOLD': 10,
+    }
+    options.update(getattr(settings, 'REQUEST_TIMING', {}))
+    return options
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        # enabled выставляет middleware, когда запрос дошел до DRF или GraphQL.
+        self.enabled = False
+        self.queries = 0
+        self.sql = 0.0
+        self.shapes = Counter()
+        self.spans = {}
+        self.active = set()
+        self.render_started = None
+        self.total = None
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+
+    def add(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def repeated_queries(self, threshold):
+        """
+        Формы SQL, выполненные не меньше threshold раз: признак N+1.
+        """
+        if not threshold:
+            return []
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= threshold]
+
+
+def begin_request():
+    return _timings.set(RequestTimings())
+
+
+def current():
+    return _timings.get()
+
+
+def end_request(token):
+    timings = _timings.get()
+    _timings.reset(token)
+    return timings
+
+
+def enable():
+    """
+    Включает учет для текущего запроса (вызывается перед представлением).
+    """
+    timings = _timings.get()
+    if timings is not None:
+        timings.enabled = True
+
+
+def get_timings():
+    timings = _timings.get()
+    if timings is not None and timings.enabled:
+        return timings
+    return None
+
+
+@contextmanager
+def span(name):
+    """
+    Добавляет к этапу name время блока без учета SQL, выполненного внутри.
+    Вложенные блоки с тем же именем (вложенные сериализаторы, элементы
+    списка) считаются один раз.
+    """
+    timings = get_timings()
+    if timings is None or name in timings.active:
+        yield
+        return
+    timings.active.add(name)
+    sql = timings.sql
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.active.discard(name)
+        timings.add(name, time.perf_counter() - started - (timings.sql - sql))
+
+
+def record_query(execute, sql, params, many, context):
+    # SQL считается для всех запросов (метрики /metrics), а заголовок
+    # и журнал — только для включенных.
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.sql += time.perf_counter() - started
+        timings.queries += 1
+        timings.shapes[_PARAMS_RE.sub('(%s...)', sql)] += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    # connection_created приходит и при переподключении того же объекта.
+    # Обертка ставится первой: connection.execute_wrapper() снимает
+    # последнюю из списка, и подключение внутри такого блока не должно
+    # оставить чужую обертку навсегда.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+def timed_view(view):
+    """
+    Отмечает не-DRF представление, время которого нужно учитывать.
+    """
+    view.request_timing = True
+    return view
+
+
+class TimedSerializerMixin:
+    """
+    Время to_representation попадает в этап serialize текущего запроса.
+    """
+
+    def to_representation(self, instance):
+        with span('serialize'):
+            return super().to_representation(instance)
+
+
+def server_timing(timings):
+    """
+    Значение заголовка Server-Timing (длительности в миллисекундах).
+    """
+    metrics = [f'db;dur={timings.sql * 1000:.1f};desc="{timings.queries} queries"']
+    for name, seconds in timings.spans.items():
+        metrics.append(f'{name};dur={seconds * 1000:.1f}')
+    metrics.append(f'total;dur={timings.total * 1000:.1f}')
+    return ', '.join(metrics)
@@ -0,0 +1,258 @@
+import base64
+import binascii
+import errno
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+
+from .writes import run_write
+
+logger = logging.getLogger('restapi.uploads')
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def get_upload_settings():
+    options = {
+        # Каталог частичных файлов. Должен быть на той же файловой системе,
+        # что и MEDIA_ROOT: тогда готовый файл переносится без копирования.
+        # Внутри MEDIA_ROOT его держать не стоит — он бы отдавался публично.
+        'DIR': settings.BASE_DIR / 'uploads',
+        'MAX_SIZE': 5 * 1024 ** 3,
+        # Размер буфера при записи тела PATCH на диск.
+        'BUFFER_SIZE': 1024 * 1024,
+        # Незавершенные загрузки старше этого срока удаляет clean_uploads.
+        'EXPIRE_AFTER': timedelta(days=1),
+    }
+    options.update(getattr(settings, 'RESUMABLE_UPLOADS', {}))
+    return options
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Смещение не совпадает с уже загруженным объемом.'
+    default_code = 'offset_conflict'
+
+
+class ChecksumMismatch(APIException):
+    # Код из расширения checksum протокола tus.
+    status_code = 460
+    default_detail = 'Контрольная сумма фрагмента не совпадает.'
+    default_code = 'checksum_mismatch'
+
+
+class UploadLocked(APIException):
+    status_code = status.HTTP_423_LOCKED
+    default_detail = 'В эту загрузку уже идет запись.'
+    default_code = 'locked'
+
+
+def partial_path(upload):
+    return os.path.join(get_upload_settings()['DIR'], f'{upload.pk}.part')
+
+
+def current_offset(upload):
+    try:
+        return os.path.getsize(partial_path(upload))
+    except FileNotFoundError:
+        return 0
+
+
+def create_partial(upload):
+    path = partial_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'xb').close()
+
+
+@contextmanager
+def locked(file):
+    # Одновременная запись двух фрагментов в одну загрузку недопустима.
+    if fcntl is not None:
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadLocked()
+    try:
+        yield file
+    finally:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def parse_checksum(header):
+    """
+    Upload-Checksum: sha256 <base64> (расширение checksum протокола tus).
+    """
+    if not header:
+        return None
+    algorithm, _, value = header.partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise ValidationError('Поддерживается только контрольная сумма sha256.')
+    try:
+        return base64.b64decode(value.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValidationError('Некорректный заголовок Upload-Checksum.')
+
+
+def write_chunk(upload, offset, stream, length, checksum=None):
+    """
+    Дописывает тело запроса в частичный файл, не буферизуя его в памяти.
+    Возвращает новое смещение. Если клиент оборвал соединение, уже
+    полученные байты сохраняются и загрузку можно продолжить с них.
+    """
+    options = get_upload_settings()
+    if offset + length > upload.length:
+        raise ValidationError('Фрагмент выходит за объявленный размер файла.')
+
+    try:
+        file = open(partial_path(upload), 'r+b')
+    except FileNotFoundError:
+        raise NotFound('Загрузка уже завершена или удалена.')
+    with file, locked(file):
+        file.seek(0, os.SEEK_END)
+        if file.tell() != offset:
+            raise OffsetConflict(f'Ожидалось смещение {file.tell()}.')
+
+        digest = hashlib.sha256()
+        remaining = length
+        try:
+            while remaining > 0:
+                data = stream.read(min(options['BUFFER_SIZE'], remaining))
+                if not data:
+                    break
+                file.write(data)
+                digest.update(data)
+                remaining -= len(data)
+        except OSError:
+            # Соединение оборвалось; проверить сумму неполного фрагмента нельзя.
+            if checksum is not None:
+                file.truncate(offset)
+                return offset
+            file.flush()
+            return file.tell()
+
+        if checksum is not None and (remaining or digest.digest() != checksum):
+            file.truncate(offset)
+            raise ChecksumMismatch()
+        file.flush()
+        os.fsync(file.fileno())
+        return file.tell()
+
+
+def file_sha256(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(1024 * 1024), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def move_to_storage(path, field, instance, filename):
+    """
+    Переносит собранный файл в хранилище поля `field` и возвращает имя.
+
+    Для FileSystemStorage файл жестко связывается с новым путем и удаляется
+    из каталога загрузок, то есть не копируется. link() не перезаписывает
+    существующие файлы, поэтому гонка за свободное имя безопасна.
+    Другие хранилища (и другая файловая система) получают копию.
+    """
+    storage = field.storage
+    name = field.generate_filename(instance, filename)
+    if hasattr(storage, 'path'):
+        while True:
+            name = storage.get_available_name(name, max_length=field.max_length)
+            target = storage.path(name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.link(path, target)
+            except FileExistsError:
+                continue
+            except OSError as error:
+                if error.errno not in (errno.EXDEV, errno.EPERM):
+                    raise
+                break
+            os.unlink(path)
+            if storage.file_permissions_mode is not None:
+                os.chmod(target, storage.file_permissions_mode)
+            return name
+
+    with open(path, 'rb') as file:
+        name = storage.save(name, File(file), max_length=field.max_length)
+    os.unlink(path)
+    return name
+
+
+def complete_upload(upload, project):
+    """
+    Проверяет размер и контрольную сумму и прикрепляет файл к Project.file.
+    """
+    path = partial_path(upload)
+    try:
+        file = open(path, 'rb')
+    except FileNotFoundError:
+        raise ValidationError('Загрузка уже завершена или удалена.')
+    # Блокировка держится до переноса файла, чтобы параллельные
+    # PATCH и повторное завершение не застали его на полпути.
+    with file, locked(file):
+        size = os.fstat(file.fileno()).st_size
+        if size != upload.length:
+            raise ValidationError(
+                f'Загрузка не завершена: получено {size} из {upload.length} байт.')
+        if upload.sha256 and file_sha256(file) != upload.sha256.lower():
+            discard(upload)
+            run_write(upload.delete)
+            raise ValidationError(
+                'Контрольная сумма файла не совпадает, загрузку нужно начать заново.')
+
+        field = project._meta.get_field('file')
+        old_name = project.file.name
+        project.file.name = move_to_storage(path, field, project, upload.filename)
+
+    upload.project = project
+    upload.offset = size
+    upload.completed = True
+
+    def save():
+        # save() отправит post_save: после коммита обновятся поисковый
+        # индекс и кэш ответов.
+        project.save(update_fields=['file', 'updated_at'])
+        upload.save(update_fields=['project', 'offset', 'completed', 'updated_at'])
+        # Прежний файл проекта больше ни на что не ссылается; удаляется
+        # только после коммита, чтобы откат не оставил проект без файла.
+        if old_name and old_name != project.file.name:
+            transaction.on_commit(lambda: delete_file(field.storage, old_name),
+                                  using=router.db_for_write(type(project)))
+
+    run_write(save)
+    return project
+
+
+def delete_file(storage, name):
+    try:
+        storage.delete(name)
+    except OSError:
+        logger.warning('Не удалось удалить %s', name)
+
+
+def discard(upload):
+    try:
+        os.unlink(partial_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def expired_uploads(queryset):
+    expire_after = get_upload_settings()['EXPIRE_AFTER']
+    return queryset.filter(completed=False, updated_at__lt=timezone.now() - expire_after)
@@ -1,19 +1,22 @@
-from rest_framework import routers
-
+from .routers import BulkRouter
 from .views import (
     MeViewSet,
     ProjectViewSet,
     PricingViewSet,
     SkillViewSet,
-    ContactViewSet
+    SkillCategorySummaryViewSet,
+    ContactViewSet,
+    UploadViewSet,
 )
 
-router = routers.DefaultRouter()
+router = BulkRouter()
 
 router.register('api/me', MeViewSet, basename="me")
 router.register('api/projects', ProjectViewSet, basename="projects")
 router.register('api/pricings', PricingViewSet, basename="pricings")
 router.register('api/skills', SkillViewSet, basename="skills")
+router.register('api/skill-summary', SkillCategorySummaryViewSet, basename="skill-summary")
 router.register('api/contacts', ContactViewSet, basename="contacts")
+router.register('api/uploads', UploadViewSet, basename="uploads")
 
 urlpatterns = router.urls
\ No newline at end of file
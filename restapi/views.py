@@ -1,24 +1,48 @@
-from rest_framework import permissions, status, viewsets
-from rest_framework.filters import OrderingFilter, SearchFilter
+import io
+
+from django.utils import timezone
+from rest_framework import exceptions, mixins, permissions, status, viewsets
+from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .models import Me, Project, Pricing, Skill, Contact
+from .bulk import BulkModelMixin
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .fastpath import FastReadMixin
+from .filters import FullTextSearchFilter, RangeFilter, RankedOrderingFilter
+from .models import Me, Project, Pricing, Skill, SkillCategorySummary, Contact, Upload
 from .serializers import (
     MeSerializer,
     ProjectSerializer,
     PricingSerializer,
     SkillSerializer,
+    SkillCategorySummarySerializer,
     ContactSerializer,
+    UploadSerializer,
+)
+from .sparse import SparseFieldsMixin
+from .streaming import StreamingListMixin
+from .uploads import (
+    OffsetConflict,
+    complete_upload,
+    create_partial,
+    current_offset,
+    discard,
+    parse_checksum,
+    write_chunk,
 )
+from .writes import QueuedWriteMixin, run_write
 
 
-class MeViewSet(viewsets.ModelViewSet):
+class MeViewSet(QueuedWriteMixin, BulkModelMixin, ConditionalGetMixin, StreamingListMixin,
+                 CachedResponseMixin, SparseFieldsMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Me.objects.all()
     serializer_class = MeSerializer
     permission_classes = [permissions.AllowAny]
     
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [FullTextSearchFilter, RankedOrderingFilter]
     search_fields = ['first_name', 'last_name', 'email', 'phone']
+    ordering = ['id']
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -29,17 +53,19 @@ class MeViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(QueuedWriteMixin, BulkModelMixin, ConditionalGetMixin, StreamingListMixin,
+                 CachedResponseMixin, SparseFieldsMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
     serializer_class = ProjectSerializer
     permission_classes = [permissions.AllowAny]
     
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [FullTextSearchFilter, RankedOrderingFilter]
     search_fields = ['title', 'description']
+    ordering = ['-created_at', '-id']
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -50,17 +76,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
     
     
-class PricingViewSet(viewsets.ModelViewSet):
+class PricingViewSet(QueuedWriteMixin, BulkModelMixin, ConditionalGetMixin, StreamingListMixin,
+                 CachedResponseMixin, SparseFieldsMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Pricing.objects.all()
     serializer_class = PricingSerializer
     permission_classes = [permissions.AllowAny]
     
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [FullTextSearchFilter, RangeFilter, RankedOrderingFilter]
     search_fields = ['service', 'description']
+    # total_cost — аннотация _total_cost менеджера Pricing, считается в SQL.
+    query_aliases = {'total_cost': '_total_cost'}
+    range_fields = ['total_cost', 'rate_per_hour', 'estimated_hours']
+    ordering_fields = ['id', 'service', 'rate_per_hour', 'estimated_hours', 'total_cost',
+                       'created_at', 'updated_at']
+    ordering = ['id']
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -71,17 +104,19 @@ class PricingViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
     
 
-class SkillViewSet(viewsets.ModelViewSet):
+class SkillViewSet(QueuedWriteMixin, BulkModelMixin, ConditionalGetMixin, StreamingListMixin,
+                 CachedResponseMixin, SparseFieldsMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Skill.objects.all()
     serializer_class = SkillSerializer
     permission_classes = [permissions.AllowAny]
     
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [FullTextSearchFilter, RankedOrderingFilter]
     search_fields = ['name']
+    ordering = ['id']
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -92,17 +127,36 @@ class SkillViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        self.perform_update(serializer)
         return Response(serializer.data)
   
 
-class ContactViewSet(viewsets.ModelViewSet):
+class SkillCategorySummaryViewSet(ConditionalGetMixin, StreamingListMixin, CachedResponseMixin,
+                                  SparseFieldsMixin, FastReadMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Количество, средний и максимальный процент и лучшие навыки по
+    категориям. Данные берутся из таблицы сводки, которую сигналы
+    навыков обновляют для затронутых категорий.
+    """
+    queryset = SkillCategorySummary.objects.all()
+    serializer_class = SkillCategorySummarySerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = 'category'
+
+    filter_backends = [RankedOrderingFilter]
+    ordering_fields = ['category', 'count', 'average_percentage', 'max_percentage']
+    ordering = ['category']
+
+
+class ContactViewSet(QueuedWriteMixin, BulkModelMixin, ConditionalGetMixin, StreamingListMixin,
+                 CachedResponseMixin, SparseFieldsMixin, FastReadMixin, viewsets.ModelViewSet):
     queryset = Contact.objects.all()
     serializer_class = ContactSerializer
     permission_classes = [permissions.AllowAny]
     
-    filter_backends = [SearchFilter, OrderingFilter]
+    filter_backends = [FullTextSearchFilter, RankedOrderingFilter]
     search_fields = ['name', 'email', 'subject']
+    ordering = ['-created_at', '-id']
     
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
@@ -113,5 +167,85 @@ class ContactViewSet(viewsets.ModelViewSet):
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data)
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data)
\ No newline at end of file
+        self.perform_update(serializer)
+        return Response(serializer.data)
+
+
+class UploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin,
+                    mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """
+    Возобновляемая загрузка Project.file по образцу протокола tus:
+
+    * POST   /uploads/ {"filename", "length", "sha256"?}  -> создать загрузку
+    * HEAD   /uploads/<id>/                               -> Upload-Offset
+    * PATCH  /uploads/<id>/  Upload-Offset: N             -> дописать фрагмент
+      (Content-Type: application/offset+octet-stream, необязательный
+      Upload-Checksum: sha256 <base64>)
+    * POST   /uploads/<id>/complete/ {"project": id}      -> прикрепить к проекту
+    * DELETE /uploads/<id>/                               -> отменить загрузку
+    """
+    queryset = Upload.objects.all()
+    serializer_class = UploadSerializer
+    # Загрузка меняет Project.file, поэтому права те же, что у записи проекта.
+    permission_classes = ProjectViewSet.permission_classes
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response['Location'] = request.build_absolute_uri(f'{response.data["id"]}/')
+        response['Upload-Offset'] = '0'
+        return response
+
+    def perform_create(self, serializer):
+        create_partial(run_write(serializer.save))
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['Upload-Offset'] = str(response.data['offset'])
+        response['Upload-Length'] = str(response.data['length'])
+        response['Cache-Control'] = 'no-store'
+        return response
+
+    def get_object(self):
+        upload = super().get_object()
+        if not upload.completed:
+            # Смещение в базе может отставать от файла, если запись оборвалась.
+            upload.offset = current_offset(upload)
+        return upload
+
+    def partial_update(self, request, *args, **kwargs):
+        upload = self.get_object()
+        if upload.completed:
+            raise OffsetConflict('Загрузка уже завершена.')
+        if request.content_type != 'application/offset+octet-stream':
+            raise exceptions.UnsupportedMediaType(request.content_type)
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+        except (KeyError, ValueError):
+            raise exceptions.ValidationError('Нужен заголовок Upload-Offset.')
+
+        # Тело читается из потока запроса напрямую, парсеры DRF не используются.
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        offset = write_chunk(upload, offset, request.stream or io.BytesIO(), length,
+                             parse_checksum(request.META.get('HTTP_UPLOAD_CHECKSUM')))
+        run_write(lambda: Upload.objects.filter(pk=upload.pk).update(
+            offset=offset, updated_at=timezone.now()))
+        return Response(status=status.HTTP_204_NO_CONTENT, headers={'Upload-Offset': str(offset)})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        upload = self.get_object()
+        if upload.completed:
+            raise exceptions.ValidationError('Загрузка уже завершена.')
+        project_id = request.data.get('project') or upload.project_id
+        try:
+            project = Project.objects.get(pk=project_id)
+        except (Project.DoesNotExist, TypeError, ValueError):
+            raise exceptions.ValidationError({'project': ['Проект не найден.']})
+        self.check_object_permissions(request, project)
+        complete_upload(upload, project)
+        serializer = ProjectSerializer(project, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    def perform_destroy(self, instance):
+        discard(instance)
+        run_write(instance.delete)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.permissions import SAFE_METHODS
+
+from .db.routers import pin_primary
+
+logger = logging.getLogger('restapi.writes')
+
+
+class WriteQueue:
+    """
+    Очередь записей с одним потоком-писателем на процесс.
+
+    Писатель забирает все накопившиеся задания (до MAX_BATCH, подождав
+    WINDOW секунд) и выполняет их в одной транзакции, каждое в своем
+    savepoint: ошибка одного задания откатывает только его. Вызывающий
+    поток ждет результата задания после коммита.
+    """
+
+    def __init__(self, using, options):
+        self.using = using
+        self.max_batch = options.get('MAX_BATCH', 100)
+        self.window = options.get('WINDOW', 0)
+        self.queue = queue.SimpleQueue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, func):
+        future = Future()
+        self.queue.put((func, future))
+        self.start()
+        return future
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name=f'db-writer-{self.using}', daemon=True)
+                self.thread.start()
+
+    def is_writer_thread(self):
+        return threading.current_thread() is self.thread
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            try:
+                while len(batch) < self.max_batch:
+                    timeout = deadline - time.monotonic()
+                    batch.append(self.queue.get(timeout=timeout) if timeout > 0
+                                 else self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            self.execute(batch)
+
+    def execute(self, batch):
+        connection = connections[self.using]
+        connection.close_if_unusable_or_obsolete()
+        results = []
+        try:
+            with transaction.atomic(using=self.using):
+                for func, future in batch:
+                    try:
+                        with transaction.atomic(using=self.using):
+                            results.append((future, func(), None))
+                    except Exception as error:
+                        results.append((future, None, error))
+        except Exception as error:
+            # Не удалось зафиксировать транзакцию: ошибка у всех заданий.
+            logger.exception('Не удалось выполнить пакет из %s записей', len(batch))
+            for _, future in batch:
+                future.set_exception(error)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(using=None):
+    """
+    Возвращает очередь записей для базы или None, если очередь
+    не включена в OPTIONS['write_queue'] (см. restapi.db.sqlite3).
+    """
+    using = using or DEFAULT_DB_ALIAS
+    options = getattr(connections[using], 'write_queue', None)
+    if not options:
+        return None
+    with _queues_lock:
+        if using not in _queues:
+            _queues[using] = WriteQueue(using, options if isinstance(options, dict) else {})
+        return _queues[using]
+
+
+def _inline(write_queue, using):
+    # Внутри транзакции вызывающего (ATOMIC_MUTATIONS, админка) и в самом
+    # писателе задание выполняется сразу: иначе оно оказалось бы в другой
+    # транзакции или ждало бы само себя.
+    return write_queue is None or write_queue.is_writer_thread() \
+        or connections[using or DEFAULT_DB_ALIAS].in_atomic_block
+
+
+def run_write(func, using=None):
+    """
+    Выполняет функцию записи через очередь писателя и возвращает ее результат.
+    """
+    # Запись идет в потоке писателя, поэтому закрепляем чтения
+    # за основной базой здесь, в потоке запроса.
+    pin_primary()
+    write_queue = get_write_queue(using)
+    if _inline(write_queue, using):
+        return func()
+    return write_queue.submit(func).result()
+
+
+async def arun_write(func, using=None):
+    """
+    Async вариант run_write: ожидание результата не занимает поток.
+    """
+    pin_primary()
+    write_queue = get_write_queue(using)
+    if write_queue is None:
+        return await sync_to_async(func)()
+    return await asyncio.wrap_future(write_queue.submit(func))
+
+
+class QueuedWriteMixin:
+    """
+    Создание, изменение и удаление в ViewSet выполняются через run_write.
+    Изменяющие запросы читают с основной базы с самого начала, чтобы
+    не обновить объект по устаревшей копии с реплики.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            pin_primary(wrote=False)
+        super().initial(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        run_write(serializer.save)
+
+    def perform_update(self, serializer):
+        run_write(serializer.save)
+
+    def perform_destroy(self, instance):
+        run_write(instance.delete)